@@ -1,20 +1,36 @@
-from abaqus import *
-from abaqusConstants import *
-from part import *
-from material import *
-from section import *
-from assembly import *
-from step import *
-from interaction import *
-from load import *
-from mesh import *
-from optimization import *
-from job import *
-from sketch import *
-from visualization import *
-from connectorBehavior import *
-
-backwardCompatibility.setValues(includeDeprecated=True, reportDeprecated=False)
+import importlib
+import os
+import time
+
+import profiling
+import transducer_design
+from job_scheduler import JobScheduler
+from odb_extractor import OdbResults, extract_odb
+from result_cache import canonical_parameters, parameters_key
+from transducer_design import TransducerDesign
+
+# the modules of abaqus/cae the builders use. they are imported by @load_cae_kernel when a model is first built, so
+# the designs, the caches and the pipelines can be used in plain python without starting abaqus/cae
+CAE_MODULES = ("abaqus", "abaqusConstants", "part", "material", "section", "assembly", "step", "interaction", "load",
+               "mesh", "optimization", "job", "sketch", "visualization", "connectorBehavior")
+
+_cae_kernel_loaded = False
+
+
+# this method imports every module of @CAE_MODULES into this module once, like "from abaqus import *" , without
+# replacing the names this module defines, and sets the compatibility options of the session
+def load_cae_kernel():
+    global _cae_kernel_loaded
+    if _cae_kernel_loaded:
+        return
+    names = globals()
+    for module_name in CAE_MODULES:
+        module = importlib.import_module(module_name)
+        for name in getattr(module, "__all__", [name for name in dir(module) if not name.startswith("_")]):
+            if name not in names:
+                names[name] = getattr(module, name)
+    backwardCompatibility.setValues(includeDeprecated=True, reportDeprecated=False)
+    _cae_kernel_loaded = True
 
 
 # this method creat a section by vertical and horizontal lines in a part model
@@ -27,8 +43,13 @@ backwardCompatibility.setValues(includeDeprecated=True, reportDeprecated=False)
 # results:
 # add @partition_sketch_key and @partition_sketch in part model
 def creat_section(part_model, x_section, y_section, max_x, max_y):
-    part_model.partition_sketch_key = 'sketch_partitions' + "_" + part_model.part_key
-    part_model.partition_sketch = part_model.model.ConstrainedSketch(
+    with profiling.span("partition", part=part_model.part_key, lines=len(x_section) + len(y_section)):
+        _partition(part_model, x_section, y_section, max_x, max_y)
+
+
+def _partition(part_model, x_section, y_section, max_x, max_y):
+    part_model._partition_sketch_key = 'sketch_partitions' + "_" + part_model.part_key
+    part_model._partition_sketch = part_model.model.ConstrainedSketch(
         gridSpacing=1, name=part_model.partition_sketch_key, sheetSize=part_model.sheet_size,
         transform=part_model.part.MakeSketchTransform(sketchPlane=part_model.part.faces[0], sketchPlaneSide=SIDE1,
                                                       sketchOrientation=RIGHT, origin=(0.0, 0.0, 0.0)))
@@ -41,27 +62,41 @@ def creat_section(part_model, x_section, y_section, max_x, max_y):
                                           sketch=part_model.partition_sketch)
 
 
+# the element types of every mesh, quadrilaterals with reduced integration and triangles where a region is not
+# structured
+def _element_types():
+    return (ElemType(elemCode=CAX4R, elemLibrary=STANDARD, secondOrderAccuracy=OFF, hourglassControl=ENHANCED,
+                     distortionControl=DEFAULT), ElemType(elemCode=CAX3, elemLibrary=STANDARD))
+
+
 class ModelMaterialForModalAnalysis:
     __count = 0
 
-    ALUMINIUM_6061_T6 = {"material_name": "AL6061T6", "density": 2.7e-9, "elastic_module": 68900, "poisson_ratio": 0.33}
-    PZT4 = {"material_name": "PZT4", "density": 2.517e-9, "elastic_module": 67400, "poisson_ratio": 0.3}
-    ST37 = {"material_name": "ST37", "density": 7.7e-9, "elastic_module": 200000, "poisson_ratio": 0.29}
-    SCREW_12_9 = {"material_name": "SCREW_12_9", "density": 7.85e-9, "elastic_module": 206000, "poisson_ratio": 0.29}
-    COPPER = {"material_name": "COPPER", "density": 8.93e-9, "elastic_module": 110000, "poisson_ratio": 0.343}
+    ALUMINIUM_6061_T6 = transducer_design.ALUMINIUM_6061_T6
+    PZT4 = transducer_design.PZT4
+    ST37 = transducer_design.ST37
+    SCREW_12_9 = transducer_design.SCREW_12_9
+    COPPER = transducer_design.COPPER
 
+    # this method gives the material of a property table in a model, through the @MaterialRegistry of the model, so
+    # every distinct material and its section are created once per model
     @staticmethod
     def standard_material(model, material):
-        return ModelMaterialForModalAnalysis(model=model, material_name=material["material_name"],
-                                             density=material["density"], elastic_module=material["elastic_module"],
-                                             poisson_ratio=material["poisson_ratio"])
-
-    def __init__(self, model, material_name, density, elastic_module, poisson_ratio):
-        self.__material = model.Material(name=material_name)
-        self.material.Density(table=((density,),))
-        self.material.Elastic(table=((elastic_module, poisson_ratio),))
+        return MaterialRegistry.of(model).material(material)
+
+    # @param create : an instance of @bool . False wraps a material and a section that already exist in the model
+    def __init__(self, model, material_name, density, elastic_module, poisson_ratio, create=True):
+        load_cae_kernel()
         self.__section_name = "section" + "_" + material_name
-        self.__section = model.HomogeneousSolidSection(material=material_name, name=self.section_name, thickness=None)
+        if create:
+            self.__material = model.Material(name=material_name)
+            self.material.Density(table=((density,),))
+            self.material.Elastic(table=((elastic_module, poisson_ratio),))
+            self.__section = model.HomogeneousSolidSection(material=material_name, name=self.section_name,
+                                                           thickness=None)
+        else:
+            self.__material = model.materials[material_name]
+            self.__section = model.sections[self.section_name]
         self.__model = model
         self.__material_name = material_name
         self.__density = density
@@ -101,10 +136,109 @@ class ModelMaterialForModalAnalysis:
         return self.__section_name
 
 
+def _material_table(material):
+    if isinstance(material, dict):
+        return material
+    return {"material_name": material.material_name, "density": material.density,
+            "elastic_module": material.elastic_module, "poisson_ratio": material.poisson_ratio}
+
+
+# this class memoizes the materials and the sections of one model. the parts ask it for a property table, or for a
+# @ModelMaterialForModalAnalysis of any model, and get a shared handle that is created on the first request only.
+# two tables with the same name but other properties get a numbered name instead of replacing each other
+class MaterialRegistry:
+    __registries = {}
+
+    # this method gives the registry of a model, created on the first call. a new model that takes the name of an
+    # older one gets a new registry, since none of the materials of the old model exist in it
+    @staticmethod
+    def of(model):
+        registry = MaterialRegistry.__registries.get(model.name)
+        if registry is None or registry.model is not model:
+            MaterialRegistry.__registries[model.name] = MaterialRegistry(model)
+        return MaterialRegistry.__registries[model.name]
+
+    # this method drops the registry of a model, when the model is deleted or replaced
+    @staticmethod
+    def forget(model):
+        MaterialRegistry.__registries.pop(model.name, None)
+
+    def __init__(self, model):
+        self.__model = model
+        self.__materials = {}
+        self.__names = {}
+
+    @property
+    def model(self):
+        return self.__model
+
+    # the @ModelMaterialForModalAnalysis of every registered table
+    @property
+    def materials(self):
+        return list(self.__materials.values())
+
+    @staticmethod
+    def __key(table):
+        return (table["material_name"], float(table["density"]), float(table["elastic_module"]),
+                float(table["poisson_ratio"]))
+
+    # input parameters:
+    # @param material : a property table like @transducer_design.PZT4 , or an instance of
+    # @ModelMaterialForModalAnalysis of any model
+    # results:
+    # the shared instance of @ModelMaterialForModalAnalysis of the table in this model
+    def material(self, material):
+        table = _material_table(material)
+        key = self.__key(table)
+        if key not in self.__materials:
+            material_name = table["material_name"]
+            if material_name in self.__names:
+                material_name += "_" + str(len(self.__materials) + 1)
+            if isinstance(material, ModelMaterialForModalAnalysis) and material.model is self.model:
+                self.__materials[key] = material
+            elif isinstance(material, ModelMaterialForModalAnalysis) and material_name == material.material_name:
+                self.__materials[key] = self.__copy(material)
+            else:
+                self.__materials[key] = ModelMaterialForModalAnalysis(
+                    model=self.model, material_name=material_name, density=table["density"],
+                    elastic_module=table["elastic_module"], poisson_ratio=table["poisson_ratio"])
+            self.__names[material_name] = key
+        return self.__materials[key]
+
+    def __copy(self, material):
+        self.model.copyMaterials(sourceModel=material.model, materialsToCopy=(material.material_name,))
+        self.model.copySections(sourceModel=material.model, sectionsToCopy=(material.section_name,))
+        return ModelMaterialForModalAnalysis(model=self.model, material_name=material.material_name,
+                                             density=material.density, elastic_module=material.elastic_module,
+                                             poisson_ratio=material.poisson_ratio, create=False)
+
+    # this method copies every material and section of another registry into this model, with one copy command for
+    # all of them instead of defining them again, so a sweep defines its materials once
+    # input parameters:
+    # @param registry : an instance of @MaterialRegistry of another model
+    def reuse(self, registry):
+        missing = [material for material in registry.materials
+                   if self.__key(_material_table(material)) not in self.__materials and
+                   material.material_name not in self.__names]
+        if not missing:
+            return
+        self.model.copyMaterials(sourceModel=registry.model,
+                                 materialsToCopy=tuple([material.material_name for material in missing]))
+        self.model.copySections(sourceModel=registry.model,
+                                sectionsToCopy=tuple([material.section_name for material in missing]))
+        for material in missing:
+            key = self.__key(_material_table(material))
+            self.__materials[key] = ModelMaterialForModalAnalysis(
+                model=self.model, material_name=material.material_name, density=material.density,
+                elastic_module=material.elastic_module, poisson_ratio=material.poisson_ratio, create=False)
+            self.__names[material.material_name] = key
+
+
 class ModelAxiSymmetricPart:
     __count = 0
 
     def __init__(self, model, part_key, sheet_size=200):
+        load_cae_kernel()
         ModelAxiSymmetricPart.__count += 1
         self.__model = model
         self.__part_key = part_key
@@ -215,8 +349,8 @@ class ModelPiezoelectric(ModelDisk):
         ModelDisk.__init__(self, model=model, inner_diameter=inner_diameter, outer_diameter=outer_diameter,
                            thickness=thickness, part_key=part_key)
         if material is None:
-            material = ModelMaterialForModalAnalysis.standard_material(model=model,
-                                                                       material=ModelMaterialForModalAnalysis.PZT4)
+            material = ModelMaterialForModalAnalysis.PZT4
+        material = ModelMaterialForModalAnalysis.standard_material(model=model, material=material)
         self._material = material
         self.part.SectionAssignment(offset=0.0, offsetField='', offsetType=MIDDLE_SURFACE, region=self.all_faces,
                                     sectionName=material.section_name, thicknessAssignment=FROM_SECTION)
@@ -231,13 +365,75 @@ class ModelElectrode(ModelDisk):
         ModelDisk.__init__(self, model=model, inner_diameter=inner_diameter, outer_diameter=outer_diameter,
                            thickness=thickness, part_key=part_key)
         if material is None:
-            material = ModelMaterialForModalAnalysis.standard_material(model=model,
-                                                                       material=ModelMaterialForModalAnalysis.COPPER)
+            material = ModelMaterialForModalAnalysis.COPPER
+        material = ModelMaterialForModalAnalysis.standard_material(model=model, material=material)
         self._material = material
         self.part.SectionAssignment(offset=0.0, offsetField='', offsetType=MIDDLE_SURFACE, region=self.all_faces,
                                     sectionName=material.section_name, thicknessAssignment=FROM_SECTION)
 
 
+# this class builds the piezoelectric rings and the electrodes as one partitioned part, one face per layer from the
+# bottom ring up to the last electrode, with the section of each material assigned to its faces. the layers share
+# the nodes of their interfaces, so the stack needs no ties between its layers
+class ModelStack(ModelDisk):
+    __count = 0
+
+    def __init__(self, model, inner_diameter=15, outer_diameter=45, piezoelectric_thickness=5,
+                 thickness_of_electrode=0.3, number_of_piezoelectrics=2, material_of_piezoelectric=None,
+                 material_of_electrode=None):
+        ModelStack.__count += 1
+        part_key = "Stack" + "_" + str(ModelStack.__count)
+        layer_thickness = piezoelectric_thickness + thickness_of_electrode
+        ModelDisk.__init__(self, model=model, inner_diameter=inner_diameter, outer_diameter=outer_diameter,
+                           thickness=number_of_piezoelectrics * layer_thickness, part_key=part_key)
+        if material_of_piezoelectric is None:
+            material_of_piezoelectric = ModelMaterialForModalAnalysis.PZT4
+        if material_of_electrode is None:
+            material_of_electrode = ModelMaterialForModalAnalysis.COPPER
+        self._material = ModelMaterialForModalAnalysis.standard_material(model=model,
+                                                                          material=material_of_piezoelectric)
+        self.__material_of_electrode = ModelMaterialForModalAnalysis.standard_material(
+            model=model, material=material_of_electrode)
+        self.__number_of_piezoelectrics = number_of_piezoelectrics
+        self.__layer_heights = {
+            "Piezoelectric": [i * layer_thickness + piezoelectric_thickness / 2.
+                              for i in range(number_of_piezoelectrics)],
+            "Electrode": [i * layer_thickness + piezoelectric_thickness + thickness_of_electrode / 2.
+                          for i in range(number_of_piezoelectrics)]}
+        boundaries = []
+        for i in range(number_of_piezoelectrics):
+            boundaries += [i * layer_thickness + piezoelectric_thickness, (i + 1) * layer_thickness]
+        creat_section(part_model=self, y_section=[], x_section=boundaries[:-1], max_x=outer_diameter,
+                      max_y=self.thickness)
+        middle_radius = (inner_diameter + outer_diameter) / 4.
+        for region_key, material in (("Piezoelectric", self.material), ("Electrode", self.material_of_electrode)):
+            faces = self.part.Set(faces=self.part.faces.findAt(*[((middle_radius, y, 0.),)
+                                                                 for y in self.__layer_heights[region_key]]),
+                                  name="faces_" + region_key + "_" + part_key)
+            self.part.SectionAssignment(offset=0.0, offsetField='', offsetType=MIDDLE_SURFACE, region=faces,
+                                        sectionName=material.section_name, thicknessAssignment=FROM_SECTION)
+
+    @property
+    def number_of_piezoelectrics(self):
+        return self.__number_of_piezoelectrics
+
+    # the material of the electrodes, @material is the one of the rings
+    @property
+    def material_of_electrode(self):
+        return self.__material_of_electrode
+
+    # this method finds the edges of an instance of the stack across the thickness of the layers of a region
+    # input parameters:
+    # @param instance : an instance of the stack in the assembly
+    # @param region_key : "Piezoelectric" or "Electrode"
+    # @param offset : an instance of @int or @float . the axial translation of the instance
+    # results:
+    # an instance of @list of the edges
+    def layer_edges(self, instance, region_key, offset=0.):
+        return [instance.edges.findAt(((radius, offset + y, 0.),))[0] for y in self.__layer_heights[region_key]
+                for radius in (self.inner_diameter / 2., self.outer_diameter / 2.)]
+
+
 class ModelBacking(ModelAxiSymmetricPart):
     __count = 0
 
@@ -248,8 +444,8 @@ class ModelBacking(ModelAxiSymmetricPart):
         ModelAxiSymmetricPart.__init__(self, model=model, part_key=part_key,
                                        sheet_size=4 * max(length, outer_diameter))
         if material is None:
-            material = ModelMaterialForModalAnalysis.standard_material(model=model,
-                                                                       material=ModelMaterialForModalAnalysis.ST37)
+            material = ModelMaterialForModalAnalysis.ST37
+        material = ModelMaterialForModalAnalysis.standard_material(model=model, material=material)
         self._material = material
         self.sketch.Line(point1=((screw_diameter / 2.) + 0.1, 0), point2=(outer_diameter / 2., 0))
         self.sketch.Line(point1=(outer_diameter / 2., 0), point2=(outer_diameter / 2., length))
@@ -335,8 +531,8 @@ class ModelMatching(ModelAxiSymmetricPart):
         ModelAxiSymmetricPart.__init__(self, model=model, part_key=part_key,
                                        sheet_size=4 * max(length, diameter, screw_diameter, screw_hole_length))
         if material is None:
-            material = ModelMaterialForModalAnalysis.standard_material(
-                model=model, material=ModelMaterialForModalAnalysis.ALUMINIUM_6061_T6)
+            material = ModelMaterialForModalAnalysis.ALUMINIUM_6061_T6
+        material = ModelMaterialForModalAnalysis.standard_material(model=model, material=material)
         self._material = material
         self.sketch.Line(point1=(0, 0), point2=(diameter / 2., 0))
         self.sketch.Line(point1=(diameter / 2., 0), point2=(diameter / 2., length))
@@ -411,22 +607,12 @@ class ModelScrew(ModelAxiSymmetricPart):
         def __init__(self):
             dict.__init__(self, {})
 
-    SCREW_DIAMETERS = [1.6, 2, 2.5, 3, 4, 5, 6, 8, 10, 12, 14, 16, 20, 24, 30, 36, 42, 48, 56, 64]
-    SCREW_LENGTH = [2.5, 3, 4, 5, 6, 8, 10, 12, 16, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 80, 90, 100, 110, 120,
-                    130, 140, 150, 160, 180, 200, 220, 240, 260, 280, 300]
-    SCREW_LENGTH_LIMIT = {"1.6": (2.5, 16), "2": (3, 20), "2.5": (4, 25), "3": (5, 30), "4": (6, 40), "5": (8, 50),
-                          "6": (10, 60), "8": (12, 80), "10": (16, 100), "12": (20, 120), "14": (25, 140),
-                          "16": (25, 160), "20": (30, 200), "24": (40, 200), "30": (45, 200), "36": (55, 200),
-                          "42": (60, 300), "48": (70, 300), "56": (80, 300), "64": (90, 300)}
-    SCREW_STEP_LENGTH = {"1.6": 0.35, "2": 0.4, "2.5": 0.45, "3": 0.5, "4": 0.7, "5": 0.8, "6": 1, "8": 1.25, "10": 1.5,
-                         "12": 1.75, "14": 2, "16": 2, "20": 2.5, "24": 3, "30": 3.5, "36": 4, "42": 4.5, "48": 5,
-                         "56": 5.5, "64": 6}
-    SCREWDRIVER_DIAMETER = {"1.6": 3, "2": 3.8, "2.5": 4.5, "3": 5.5, "4": 7, "5": 8.5, "6": 10, "8": 13, "10": 16,
-                            "12": 18, "14": 21, "16": 24, "20": 30, "24": 36, "30": 45, "36": 54, "42": 63, "48": 72,
-                            "56": 84, "64": 96}
-    SCREWDRIVER_LENGTH = {"1.6": 1.6, "2": 2, "2.5": 2.5, "3": 3, "4": 4, "5": 5, "6": 6, "8": 8, "10": 10, "12": 12,
-                          "14": 14, "16": 16, "20": 20, "24": 24, "30": 30, "36": 36, "42": 42, "48": 48, "56": 56,
-                          "64": 64}
+    SCREW_DIAMETERS = transducer_design.SCREW_DIAMETERS
+    SCREW_LENGTH = transducer_design.SCREW_LENGTH
+    SCREW_LENGTH_LIMIT = transducer_design.SCREW_LENGTH_LIMIT
+    SCREW_STEP_LENGTH = transducer_design.SCREW_STEP_LENGTH
+    SCREWDRIVER_DIAMETER = transducer_design.SCREWDRIVER_DIAMETER
+    SCREWDRIVER_LENGTH = transducer_design.SCREWDRIVER_LENGTH
 
     def __init__(self, model, screw_diameter=12, screw_length=25, material=None):
         ModelScrew.__count += 1
@@ -436,8 +622,8 @@ class ModelScrew(ModelAxiSymmetricPart):
                                                           ModelScrew.SCREWDRIVER_DIAMETER[str(screw_diameter)],
                                                           ModelScrew.SCREWDRIVER_LENGTH[str(screw_diameter)]))
         if material is None:
-            material = ModelMaterialForModalAnalysis.standard_material(
-                model=model, material=ModelMaterialForModalAnalysis.SCREW_12_9)
+            material = ModelMaterialForModalAnalysis.SCREW_12_9
+        material = ModelMaterialForModalAnalysis.standard_material(model=model, material=material)
         self._material = material
         self.sketch.Line(point1=(0, 0), point2=(screw_diameter / 2., 0))
         self.sketch.Line(point1=(screw_diameter / 2., 0),
@@ -512,55 +698,218 @@ class ModelScrew(ModelAxiSymmetricPart):
         return self.__surface_screw_to_matching_contact
 
 
+# this class follows the solver job of a submitted @ModelTransducer like a future
+# input parameters:
+# @param transducer : an instance of @ModelTransducer
+class TransducerSolve:
+
+    def __init__(self, transducer):
+        load_cae_kernel()
+        self.__transducer = transducer
+        self.__finished = False
+        self.__submitted = time.time()
+
+    @property
+    def transducer(self):
+        return self.__transducer
+
+    def __status_text(self):
+        status_file = os.path.abspath(self.transducer.job_key + ".sta")
+        if not os.path.exists(status_file):
+            return ""
+        with open(status_file) as status:
+            return status.read()
+
+    # this method tells without blocking whether the job has ended, from the status of the job or, when the kernel
+    # has not updated it yet, from the status file and the lock file of the solver
+    def done(self):
+        if not self.__finished:
+            if self.transducer.job.status in (COMPLETED, ABORTED, TERMINATED):
+                self.__finish()
+            elif "THE ANALYSIS HAS" in self.__status_text() and not os.path.exists(
+                    os.path.abspath(self.transducer.job_key + ".lck")):
+                self.__finish()
+        return self.__finished
+
+    def wait(self):
+        if not self.done():
+            self.transducer.job.waitForCompletion()
+            self.__finish()
+        return self
+
+    # the solver runs in its own process, so only the wall time from the submission to the end is measured
+    def __finish(self):
+        self.__finished = True
+        self.transducer.profiler.event("solve", run=self.transducer.model_key,
+                                       wall=time.time() - self.__submitted, status=str(self.transducer.job.status))
+
+    def succeeded(self):
+        self.wait()
+        return self.transducer.job.status not in (ABORTED, TERMINATED) and \
+            "NOT BEEN COMPLETED" not in self.__status_text()
+
+    # this method waits for the job and extracts its results once
+    # input parameters:
+    # @param frame : the frame of @ModelTransducer.extract_results
+    # results:
+    # the @dict of @ModelTransducer.extract_results , or None if the job failed
+    def result(self, frame=2):
+        if not self.succeeded():
+            return None
+        if self.transducer.results is None:
+            self.transducer.extract_results(frame=frame)
+        return self.transducer.results
+
+
+# the extensions of the files of a job that are not needed once its results are extracted, see
+# @ModelTransducer.release
+SCRATCH_EXTENSIONS = (".com", ".dat", ".msg", ".prt", ".sim", ".sta", ".log", ".ipm", ".lck", ".023", ".abq", ".mdl",
+                      ".pac", ".res", ".sel", ".stt")
+
+
+# this class builds, meshes and solves the frequency analysis of a transducer in explicit stages: @build ,
+# @mesh , @write_input , @submit and @extract_results . every stage runs the stages before it when they have not run
+# yet, so a lazy transducer does nothing until a stage is asked for. @release deletes every object of the transducer
+# from the session and keeps its results, and a transducer in a with statement is released when the statement ends,
+# also when a stage fails:
+#     with ModelTransducer(60, 40, lazy=True) as transducer:
+#         transducer.submit()
+#         results = transducer.extract_results()
+# input parameters: the geometry of the stack, the materials as property tables or @ModelMaterialForModalAnalysis ,
+# the @mesh_size and the resources of the job
+# @param mesh_size : the element size, or a @dict of part key, like "Electrode", to element size with an optional
+# "default"
+# @param min_elements : an instance of @int . the smallest number of elements along every edge, like the thickness of
+# the electrodes, whatever the element size
+# @param merged_stack : an instance of @bool . build the rings and the electrodes as one @ModelStack instead of one
+# instance per layer, so only the matching, the backing and the screw are tied. a @dict @mesh_size may still give
+# the "Piezoelectric" and "Electrode" layers their own size
+# @param dependent_rings : an instance of @bool . mesh the part of the rings and the part of the electrodes once, at
+# part level, and place every ring and electrode as a dependent instance of that mesh, so the meshing does not grow
+# with the number of rings
+# @param submit : an instance of @bool . submit the job and extract the results at once, when not @lazy
+# @param materials_from : an instance of @ModelTransducer . its materials and sections are copied into the new model
+# instead of being defined again
+# @param lazy : an instance of @bool . only derive the design, leave every stage for later
+# @param profiler : an instance of @profiling.Profiler . measures every stage, @profiling.PROFILER by default
 class ModelTransducer:
     __count = 0
 
     def __init__(self, length_of_matching, length_of_backing, number_of_piezoelectrics=2,
                  piezoelectric_outer_diameter=45, piezoelectric_inner_diameter=15, piezoelectric_thickness=5,
                  thickness_of_electrode=0.3, material_of_piezoelectric=None, material_of_electrode=None,
-                 material_of_screw=None, material_of_matching=None, material_of_backing=None, mesh_size=1):
+                 material_of_screw=None, material_of_matching=None, material_of_backing=None, mesh_size=1,
+                 num_cpus=1, memory=90, submit=True, materials_from=None, lazy=False, min_elements=1,
+                 merged_stack=False, dependent_rings=False, profiler=None):
         ModelTransducer.__count += 1
         self.__model_key = "Transducer" + "_" + str(ModelTransducer.__count)
-        self.__model = mdb.Model(name=self.model_key)
         self.__number_of_piezoelectrics = number_of_piezoelectrics
-        self.__piezoelectric = ModelPiezoelectric(model=self.model, inner_diameter=piezoelectric_inner_diameter,
-                                                  outer_diameter=piezoelectric_outer_diameter,
-                                                  thickness=piezoelectric_thickness, material=material_of_piezoelectric)
-        self.__electrode = ModelElectrode(model=self.model, inner_diameter=piezoelectric_inner_diameter,
-                                          outer_diameter=piezoelectric_outer_diameter, thickness=thickness_of_electrode,
-                                          material=material_of_electrode)
-        screw_diameter = None
-        for i in ModelScrew.SCREW_DIAMETERS:
-            if i <= piezoelectric_inner_diameter - 2:
-                screw_diameter = i
-            else:
-                break
-        screw_criterion_length = length_of_backing + number_of_piezoelectrics * (
-                piezoelectric_thickness + thickness_of_electrode) + 5 * ModelScrew.SCREW_STEP_LENGTH[
-                                     str(screw_diameter)] - ModelScrew.SCREWDRIVER_LENGTH[str(screw_diameter)]
-        screw_length = None
-        for i in ModelScrew.SCREW_LENGTH:
-            lower_limit, upper_limit = ModelScrew.SCREW_LENGTH_LIMIT[str(screw_diameter)]
-            if upper_limit >= i >= lower_limit:
-                if screw_length is None:
-                    screw_length = i
-                else:
-                    if abs(i - screw_criterion_length) < abs(screw_length - screw_criterion_length):
-                        screw_length = i
-        self.__screw = ModelScrew(model=self.model, screw_diameter=screw_diameter, screw_length=screw_length,
-                                  material=material_of_screw)
-        self.__matching = ModelMatching(model=self.model, length=length_of_matching,
-                                        diameter=piezoelectric_outer_diameter,
-                                        screw_diameter=screw_diameter,
-                                        screw_hole_length=6 * ModelScrew.SCREW_STEP_LENGTH[str(screw_diameter)] + 1,
-                                        material=material_of_matching)
-        self.__backing = ModelBacking(model=self.model, length=length_of_backing,
-                                      outer_diameter=piezoelectric_outer_diameter, screw_diameter=screw_diameter,
-                                      screw_box_length=ModelScrew.SCREWDRIVER_LENGTH[str(screw_diameter)] + (
-                                              screw_criterion_length - screw_length),
-                                      screwdriver_diameter=ModelScrew.SCREWDRIVER_DIAMETER[str(screw_diameter)],
-                                      piezoelectric_inner_diameter=piezoelectric_inner_diameter,
-                                      material=material_of_backing)
+        self.__design = TransducerDesign(length_of_matching=length_of_matching, length_of_backing=length_of_backing,
+                                         number_of_piezoelectrics=number_of_piezoelectrics,
+                                         piezoelectric_outer_diameter=piezoelectric_outer_diameter,
+                                         piezoelectric_inner_diameter=piezoelectric_inner_diameter,
+                                         piezoelectric_thickness=piezoelectric_thickness,
+                                         thickness_of_electrode=thickness_of_electrode)
+        self.__materials = {"piezoelectric": material_of_piezoelectric, "electrode": material_of_electrode,
+                            "screw": material_of_screw, "matching": material_of_matching,
+                            "backing": material_of_backing}
+        self.__materials_from = materials_from
+        self.__mesh_size = mesh_size
+        self.__min_elements = min_elements
+        self.__merged_stack = merged_stack
+        self.__dependent_rings = dependent_rings
+        self.__profiler = profiler if profiler is not None else profiling.PROFILER
+        self.__num_cpus = num_cpus
+        self.__memory = memory
+        self.__model = None
+        self.__piezoelectric = None
+        self.__electrode = None
+        self.__stack = None
+        self.__stack_instance = None
+        self.__screw = None
+        self.__matching = None
+        self.__backing = None
+        self.__matching_instance = None
+        self.__piezoelectric_instances = []
+        self.__electrode_instances = []
+        self.__backing_instance = None
+        self.__screw_instance = None
+        self.__step = None
+        self.__meshed = False
+        self.__step_key = "frequency_step" + "_" + self.model_key
+        self.__job_key = 'Job_' + self.model_key
+        self.__job = None
+        self.__input_file = None
+        self.__solve = None
+        self.__path_key = "path_" + self.model_key
+        self.__path = None
+        self.__xy_data_key = "xy_data_" + self.model_key
+        self.__odb = None
+        self.__results = None
+        self.__released = False
+        if not lazy:
+            self.build()
+            self.mesh()
+            self.__define_job()
+            if submit:
+                self.submit().wait()
+                self.extract_results()
+
+    # this method creates the model, the parts, the assembly, the frequency step and the ties
+    def build(self):
+        if self.__released:
+            raise RuntimeError("the model of " + self.model_key + " was released")
+        if self.model is not None:
+            return self
+        load_cae_kernel()
+        self.__model = mdb.Model(name=self.model_key)
+        MaterialRegistry.forget(self.model)
+        if self.__materials_from is not None:
+            MaterialRegistry.of(self.model).reuse(MaterialRegistry.of(self.__materials_from.build().model))
+        with self.profiler.span("build", run=self.model_key):
+            with self.profiler.span("parts", run=self.model_key):
+                self.__build_parts()
+            with self.profiler.span("assembly", run=self.model_key):
+                self.__build_assembly()
+            with self.profiler.span("ties", run=self.model_key):
+                self.__build_ties()
+        return self
+
+    def __build_parts(self):
+        design = self.design
+        if self.merged_stack:
+            self.__stack = ModelStack(model=self.model, inner_diameter=design.piezoelectric_inner_diameter,
+                                      outer_diameter=design.piezoelectric_outer_diameter,
+                                      piezoelectric_thickness=design.piezoelectric_thickness,
+                                      thickness_of_electrode=design.thickness_of_electrode,
+                                      number_of_piezoelectrics=self.number_of_piezoelectrics,
+                                      material_of_piezoelectric=self.__materials["piezoelectric"],
+                                      material_of_electrode=self.__materials["electrode"])
+        else:
+            self.__piezoelectric = ModelPiezoelectric(
+                model=self.model, inner_diameter=design.piezoelectric_inner_diameter,
+                outer_diameter=design.piezoelectric_outer_diameter, thickness=design.piezoelectric_thickness,
+                material=self.__materials["piezoelectric"])
+            self.__electrode = ModelElectrode(model=self.model, inner_diameter=design.piezoelectric_inner_diameter,
+                                              outer_diameter=design.piezoelectric_outer_diameter,
+                                              thickness=design.thickness_of_electrode,
+                                              material=self.__materials["electrode"])
+        self.__screw = ModelScrew(model=self.model, screw_diameter=design.screw_diameter,
+                                  screw_length=design.screw_length, material=self.__materials["screw"])
+        self.__matching = ModelMatching(model=self.model, length=design.length_of_matching,
+                                        diameter=design.piezoelectric_outer_diameter,
+                                        screw_diameter=design.screw_diameter,
+                                        screw_hole_length=design.screw_hole_length,
+                                        material=self.__materials["matching"])
+        self.__backing = ModelBacking(model=self.model, length=design.length_of_backing,
+                                      outer_diameter=design.piezoelectric_outer_diameter,
+                                      screw_diameter=design.screw_diameter,
+                                      screw_box_length=design.screw_box_length,
+                                      screwdriver_diameter=design.screwdriver_diameter,
+                                      piezoelectric_inner_diameter=design.piezoelectric_inner_diameter,
+                                      material=self.__materials["backing"])
+
+    def __build_assembly(self):
         self.model.rootAssembly.DatumCsysByThreePoints(coordSysType=CYLINDRICAL, origin=(0.0, 0.0, 0.0),
                                                        point1=(1.0, 0.0, 0.0), point2=(0.0, 0.0, -1.0))
         self.__matching_instance = self.model.rootAssembly.Instance(dependent=OFF,
@@ -568,42 +917,39 @@ class ModelTransducer:
                                                                     part=self.matching.part)
         self.__piezoelectric_instances = []
         self.__electrode_instances = []
-        for i in range(self.number_of_piezoelectrics):
+        if self.merged_stack:
+            self.__stack_instance = self.model.rootAssembly.Instance(dependent=OFF,
+                                                                     name="instance_of_" + self.stack.part_key,
+                                                                     part=self.stack.part)
+            self.model.rootAssembly.translate(instanceList=("instance_of_" + self.stack.part_key,),
+                                              vector=(0.0, self.design.length_of_matching, 0.0))
+        for i in range(self.number_of_piezoelectrics if not self.merged_stack else 0):
             self.piezoelectric_instances.append(self.model.rootAssembly.Instance(
-                dependent=OFF, name="instance" + str(i) + "_of_" + self.piezoelectric.part_key,
-                part=self.piezoelectric.part))
+                dependent=ON if self.dependent_rings else OFF,
+                name="instance" + str(i) + "_of_" + self.piezoelectric.part_key, part=self.piezoelectric.part))
             self.model.rootAssembly.translate(
                 instanceList=("instance" + str(i) + "_of_" + self.piezoelectric.part_key,),
-                vector=(0.0, self.matching.length + i * (self.piezoelectric.thickness + self.electrode.thickness), 0.0))
+                vector=(0.0, self.design.piezoelectric_offsets[i], 0.0))
             self.electrode_instances.append(self.model.rootAssembly.Instance(
-                dependent=OFF, name="instance" + str(i) + "_of_" + self.electrode.part_key, part=self.electrode.part))
+                dependent=ON if self.dependent_rings else OFF,
+                name="instance" + str(i) + "_of_" + self.electrode.part_key, part=self.electrode.part))
             self.model.rootAssembly.translate(
                 instanceList=("instance" + str(i) + "_of_" + self.electrode.part_key,),
-                vector=(0.0,
-                        self.matching.length + self.piezoelectric.thickness + i * (
-                                self.piezoelectric.thickness + self.electrode.thickness),
-                        0.0))
+                vector=(0.0, self.design.electrode_offsets[i], 0.0))
         self.__backing_instance = self.model.rootAssembly.Instance(dependent=OFF,
                                                                    name="instance_of_" + self.backing.part_key,
                                                                    part=self.backing.part)
-        self.model.rootAssembly.translate(
-            instanceList=("instance_of_" + self.backing.part_key,),
-            vector=(0.0,
-                    self.matching.length + self.number_of_piezoelectrics * (
-                            self.piezoelectric.thickness + self.electrode.thickness),
-                    0.0))
+        self.model.rootAssembly.translate(instanceList=("instance_of_" + self.backing.part_key,),
+                                          vector=(0.0, self.design.backing_offset, 0.0))
         self.__screw_instance = self.model.rootAssembly.Instance(dependent=OFF,
                                                                  name="instance_of_" + self.screw.part_key,
                                                                  part=self.screw.part)
-        self.model.rootAssembly.translate(
-            instanceList=("instance_of_" + self.screw.part_key,),
-            vector=(0.0, self.matching.length + self.number_of_piezoelectrics * (
-                    self.piezoelectric.thickness + self.electrode.thickness) + self.backing.length - (
-                            self.screw.length + self.backing.screw_box_length),
-                    0.0))
-        self.__step_key = "frequency_step" + "_" + self.model_key
+        self.model.rootAssembly.translate(instanceList=("instance_of_" + self.screw.part_key,),
+                                          vector=(0.0, self.design.screw_offset, 0.0))
         self.__step = self.model.FrequencyStep(maxEigen=30000.0, name=self.step_key, previous='Initial')
         self.model.fieldOutputRequests['F-Output-1'].setValues(variables=('S', 'E', 'U'))
+
+    def __build_ties(self):
         if self.screw.material.elastic_module < self.backing.material.elastic_module:
             master = self.backing_instance.surfaces[self.backing.surface_key_backing_to_screw_contact]
             slave = self.screw_instance.surfaces[self.screw.surface_key_screw_to_backing_contact]
@@ -620,6 +966,8 @@ class ModelTransducer:
             master = self.screw_instance.surfaces[self.screw.surface_key_screw_to_matching_contact]
         self.model.Tie(adjust=ON, master=master, name='screw_matching', positionToleranceMethod=COMPUTED, slave=slave,
                        thickness=ON, tieRotations=ON)
+        if self.merged_stack:
+            return self.__tie_stack()
         if self.backing.material.elastic_module < self.electrode.material.elastic_module:
             master = self.electrode_instances[-1].surfaces[self.electrode.surface_key_top]
             slave = self.backing_instance.surfaces[self.backing.surface_key_backing_to_piezoelectric_contact]
@@ -636,7 +984,7 @@ class ModelTransducer:
             master = self.matching_instance.surfaces[self.matching.surface_key_matching_to_piezoelectric_contact]
         self.model.Tie(adjust=ON, master=master, name='matching_piezoelectric', positionToleranceMethod=COMPUTED,
                        slave=slave, thickness=ON, tieRotations=ON)
-        for i in range(number_of_piezoelectrics - 1):
+        for i in range(self.number_of_piezoelectrics - 1):
             if self.electrode.material.elastic_module < self.piezoelectric.material.elastic_module:
                 master1 = self.piezoelectric_instances[i].surfaces[self.piezoelectric.surface_key_top]
                 slave1 = self.electrode_instances[i].surfaces[self.electrode.surface_key_bottom]
@@ -659,51 +1007,266 @@ class ModelTransducer:
             master = self.electrode_instances[-1].surfaces[self.electrode.surface_key_bottom]
         self.model.Tie(adjust=ON, master=master, name='last_electrode_piezoelectric', positionToleranceMethod=COMPUTED,
                        slave=slave, thickness=ON, tieRotations=ON)
-        self.model.rootAssembly.seedPartInstance(
-            deviationFactor=0.1, minSizeFactor=0.1,
-            regions=tuple([v for k, v in self.model.rootAssembly.instances.items()]), size=mesh_size)
-        self.__mesh_size = mesh_size
+        return self
+
+    # this method ties the merged stack to the backing, through its top electrode, and to the matching, through its
+    # bottom ring
+    def __tie_stack(self):
+        if self.backing.material.elastic_module < self.stack.material_of_electrode.elastic_module:
+            master = self.stack_instance.surfaces[self.stack.surface_key_top]
+            slave = self.backing_instance.surfaces[self.backing.surface_key_backing_to_piezoelectric_contact]
+        else:
+            slave = self.stack_instance.surfaces[self.stack.surface_key_top]
+            master = self.backing_instance.surfaces[self.backing.surface_key_backing_to_piezoelectric_contact]
+        self.model.Tie(adjust=ON, master=master, name='backing_stack', positionToleranceMethod=COMPUTED, slave=slave,
+                       thickness=ON, tieRotations=ON)
+        if self.matching.material.elastic_module < self.stack.material.elastic_module:
+            master = self.stack_instance.surfaces[self.stack.surface_key_bottom]
+            slave = self.matching_instance.surfaces[self.matching.surface_key_matching_to_piezoelectric_contact]
+        else:
+            slave = self.stack_instance.surfaces[self.stack.surface_key_bottom]
+            master = self.matching_instance.surfaces[self.matching.surface_key_matching_to_piezoelectric_contact]
+        self.model.Tie(adjust=ON, master=master, name='matching_stack', positionToleranceMethod=COMPUTED, slave=slave,
+                       thickness=ON, tieRotations=ON)
+        return self
+
+    # this method seeds and meshes every instance of the assembly. the instances of a part are seeded with the size of
+    # the part, and the edges shorter than @min_elements elements of that size are seeded by number
+    def mesh(self):
+        self.build()
+        if self.__meshed:
+            return self
+        with self.profiler.span("mesh", run=self.model_key, mesh_size=self.mesh_size,
+                                min_elements=self.min_elements) as mesh_span:
+            self.__generate_mesh()
+            mesh_span.record(elements=sum([len(instance.elements) for instance in self.__all_instances()]),
+                             nodes=sum([len(instance.nodes) for instance in self.__all_instances()]))
+        self.__meshed = True
+        return self
+
+    def __all_instances(self):
+        return [instance for instance in [self.matching_instance, self.stack_instance, self.backing_instance,
+                                          self.screw_instance] + self.piezoelectric_instances +
+                self.electrode_instances if instance is not None]
+
+    def __generate_mesh(self):
+        for part_key, instances in (("Matching", [self.matching_instance]),
+                                    ("Piezoelectric", self.piezoelectric_instances),
+                                    ("Electrode", self.electrode_instances),
+                                    ("Stack", [self.stack_instance] if self.merged_stack else []),
+                                    ("Backing", [self.backing_instance]), ("Screw", [self.screw_instance])):
+            if not instances:
+                continue
+            size = self.part_mesh_size(part_key)
+            if self.dependent_rings and part_key in ("Piezoelectric", "Electrode"):
+                self.__mesh_part((self.piezoelectric if part_key == "Piezoelectric" else self.electrode).part, size)
+                continue
+            if part_key == "Stack":
+                size = min([size] + [self.__layer_mesh_size(key) for key in ("Piezoelectric", "Electrode")])
+            self.model.rootAssembly.seedPartInstance(deviationFactor=0.1, minSizeFactor=0.1, regions=tuple(instances),
+                                                     size=size)
+            if part_key == "Stack":
+                for region_key in ("Piezoelectric", "Electrode"):
+                    if self.__layer_mesh_size(region_key) != size:
+                        self.model.rootAssembly.seedEdgeBySize(
+                            deviationFactor=0.1, minSizeFactor=0.1, size=self.__layer_mesh_size(region_key),
+                            edges=tuple(self.stack.layer_edges(self.stack_instance, region_key,
+                                                               offset=self.design.length_of_matching)))
+            if self.min_elements > 1:
+                short_edges = [edge for instance in instances for edge in instance.edges
+                               if edge.getSize(printResults=False) < self.min_elements * size]
+                if short_edges:
+                    self.model.rootAssembly.seedEdgeByNumber(constraint=FINER, edges=tuple(short_edges),
+                                                             number=self.min_elements)
         all_root_assembly_regions_temp = None
+        dependent_instances = self.piezoelectric_instances + self.electrode_instances if self.dependent_rings else []
+        dependent_keys = [instance.name for instance in dependent_instances]
         for k, v in self.model.rootAssembly.instances.items():
+            if k in dependent_keys:
+                continue
             if all_root_assembly_regions_temp is None:
                 all_root_assembly_regions_temp = v.faces
             else:
                 all_root_assembly_regions_temp += v.faces
         self.model.rootAssembly.setMeshControls(elemShape=QUAD, regions=all_root_assembly_regions_temp,
                                                 technique=STRUCTURED)
-        self.model.rootAssembly.setElementType(
-            elemTypes=(ElemType(
-                elemCode=CAX4R, elemLibrary=STANDARD, secondOrderAccuracy=OFF, hourglassControl=ENHANCED,
-                distortionControl=DEFAULT), ElemType(elemCode=CAX3, elemLibrary=STANDARD)),
-            regions=(all_root_assembly_regions_temp,))
+        self.model.rootAssembly.setElementType(elemTypes=_element_types(), regions=(all_root_assembly_regions_temp,))
         self.model.rootAssembly.generateMesh(regions=all_root_assembly_regions_temp)
-        self.__job_key = 'Job_' + self.model_key
-        self.__job = mdb.Job(atTime=None, contactPrint=OFF, description='', echoPrint=OFF, explicitPrecision=SINGLE,
-                             getMemoryFromAnalysis=True, historyPrint=OFF, memory=90, memoryUnits=PERCENTAGE,
-                             model=self.model_key, modelPrint=OFF, multiprocessingMode=DEFAULT,
-                             name=self.job_key, nodalOutputPrecision=SINGLE, numCpus=1, numGPUs=0, queue=None,
-                             resultsFormat=ODB, scratch='', type=ANALYSIS, userSubroutine='', waitHours=0,
-                             waitMinutes=0)
-        self.job.submit(consistencyChecking=OFF)
-        self.job.waitForCompletion()
-        print("log")
-        self.__path_key = "path_" + self.model_key
+        if dependent_instances:
+            self.model.rootAssembly.regenerate()
+
+    # this method seeds and meshes a part once for its dependent instances, like @mesh does for the independent
+    # instances in the assembly
+    # input parameters:
+    # @param part : the part of @ModelPiezoelectric or @ModelElectrode
+    # @param size : an instance of @int or @float . the element size
+    def __mesh_part(self, part, size):
+        part.seedPart(deviationFactor=0.1, minSizeFactor=0.1, size=size)
+        if self.min_elements > 1:
+            short_edges = [edge for edge in part.edges if edge.getSize(printResults=False) < self.min_elements * size]
+            if short_edges:
+                part.seedEdgeByNumber(constraint=FINER, edges=tuple(short_edges), number=self.min_elements)
+        part.setMeshControls(elemShape=QUAD, regions=part.faces, technique=STRUCTURED)
+        part.setElementType(elemTypes=_element_types(), regions=(part.faces,))
+        part.generateMesh()
+
+    def __define_job(self):
+        self.mesh()
+        if self.__job is None:
+            self.__job = mdb.Job(atTime=None, contactPrint=OFF, description='', echoPrint=OFF,
+                                 explicitPrecision=SINGLE, getMemoryFromAnalysis=True, historyPrint=OFF,
+                                 memory=self.__memory, memoryUnits=PERCENTAGE, model=self.model_key, modelPrint=OFF,
+                                 multiprocessingMode=DEFAULT, name=self.job_key, nodalOutputPrecision=SINGLE,
+                                 numCpus=self.__num_cpus, numGPUs=0, queue=None, resultsFormat=ODB, scratch='',
+                                 type=ANALYSIS, userSubroutine='', waitHours=0, waitMinutes=0)
+        return self.__job
+
+    # this method writes the input file of the job without submitting it, so an external scheduler can run it
+    # results:
+    # the absolute path of the written input file
+    def write_input(self):
+        if self.__input_file is None:
+            job = self.__define_job()
+            with self.profiler.span("write_input", run=self.model_key):
+                job.writeInput(consistencyChecking=OFF)
+            self.__input_file = os.path.abspath(self.job_key + ".inp")
+        return self.__input_file
+
+    # this method submits the job without waiting for it, so the next transducer can be built while it solves
+    # results:
+    # an instance of @TransducerSolve
+    def submit(self):
+        if self.__solve is None:
+            job = self.__define_job()
+            with self.profiler.span("submit", run=self.model_key):
+                job.submit(consistencyChecking=OFF)
+            self.__solve = TransducerSolve(self)
+        return self.__solve
+
+    # this method opens the odb of the finished job, creates the path and the xy data along the outer radius of the
+    # stack and reads the eigenfrequencies of the frequency step
+    # input parameters:
+    # @param odb_file : an instance of @str . the odb of a job solved elsewhere, like by a @JobScheduler . by default the
+    # job is submitted when it was not yet, like every stage, and "<job_key>.odb" in the working directory is read
+    # @param frame : an instance of @int . the frame of the xy data. None exports the modes with @export_results and
+    # picks the longitudinal mode, see @mode_identification
+    # results:
+    # an instance of @dict with @model_key, @job_key, @eigenfrequencies, @frame and @path_data . @path_data is empty
+    # when no mode is longitudinal
+    def extract_results(self, odb_file=None, frame=2):
+        load_cae_kernel()
+        if odb_file is None:
+            self.submit().wait()
+        with self.profiler.span("extract", run=self.model_key, frame=frame) as extract_span:
+            self.__extract_results(odb_file, frame)
+            extract_span.record(frame=self.results["frame"], path_points=len(self.results["path_data"]))
+        return self.results
+
+    def __extract_results(self, odb_file, frame):
+        if odb_file is None:
+            odb_file = os.path.abspath(self.job_key + ".odb")
+        self.__odb = session.openOdb(name=odb_file)
+        eigenfrequencies = tuple([odb_frame.frequency for odb_frame in self.odb.steps[self.step_key].frames[1:]])
+        if frame is None:
+            frame = self.export_results().longitudinal_frame(design=self.design)
+            if frame is None:
+                self.__results = {"model_key": self.model_key, "job_key": self.job_key,
+                                  "eigenfrequencies": eigenfrequencies, "frame": None, "path_data": ()}
+                return self.results
+        session.viewports[session.currentViewportName].setValues(displayedObject=self.odb)
         self.__path = session.Path(
             name=self.path_key, type=POINT_LIST,
-            expression=((piezoelectric_outer_diameter / 2., 0., 0.),
-                        (piezoelectric_outer_diameter / 2.,
-                         self.matching.length + self.number_of_piezoelectrics * (
-                                 self.piezoelectric.thickness + self.electrode.thickness) + self.backing.length,
-                         0.)))
-        self.__xy_data_key = "xy_data_" + self.model_key
+            expression=((self.design.piezoelectric_outer_diameter / 2., 0., 0.),
+                        (self.design.piezoelectric_outer_diameter / 2., self.design.total_length, 0.)))
         session.XYDataFromPath(path=self.path, name=self.xy_data_key, includeIntersections=True, shape=UNDEFORMED,
-                               pathStyle=PATH_POINTS, labelType=Y_CORD, step=1, frame=2,
+                               pathStyle=PATH_POINTS, labelType=Y_CORD, step=1, frame=frame,
                                variable=('U', NODAL, ((COMPONENT, 'U2'),),))
+        self.__results = {"model_key": self.model_key, "job_key": self.job_key, "eigenfrequencies": eigenfrequencies,
+                          "frame": frame,
+                          "path_data": tuple([tuple(point) for point in session.xyDataObjects[self.xy_data_key].data])}
+        return self.results
+
+    # this method streams every mode of the finished job into a directory of memory mapped arrays, see
+    # @odb_extractor.extract_odb
+    # input parameters:
+    # @param directory : an instance of @str . "<job_key>_results" in the working directory by default
+    # @param fields : an instance of @tuple . the fields to store, U by default and S on request
+    # @param odb_file : an instance of @str . the odb of a job solved elsewhere, see @extract_results
+    # results:
+    # an instance of @OdbResults of the written directory
+    def export_results(self, directory=None, fields=("U",), odb_file=None):
+        load_cae_kernel()
+        if directory is None:
+            directory = os.path.abspath(self.job_key + "_results")
+        if self.odb is None:
+            if odb_file is None:
+                self.submit().wait()
+                odb_file = os.path.abspath(self.job_key + ".odb")
+            self.__odb = session.openOdb(name=odb_file)
+        extract_odb(self.odb, directory, step_key=self.step_key, fields=fields)
+        return OdbResults(directory)
+
+    # this method deletes the model, the job, the path and the xy data of the transducer from the session, closes its
+    # odb and removes the scratch files of its job, so a long sweep in one session does not grow in memory. the
+    # results and the design are kept, every stage that needs the model fails afterwards
+    # input parameters:
+    # @param remove_files : the extensions of the files of the job that are removed, add ".odb" and ".inp" to remove
+    # every file of the job
+    def release(self, remove_files=SCRATCH_EXTENSIONS):
+        if self.__released:
+            return self
+        with self.profiler.span("release", run=self.model_key):
+            if self.odb is not None:
+                if self.path is not None:
+                    session.viewports[session.currentViewportName].setValues(displayedObject=None)
+                self.odb.close()
+            if _cae_kernel_loaded:
+                if self.xy_data_key in session.xyDataObjects.keys():
+                    del session.xyDataObjects[self.xy_data_key]
+                if self.path_key in session.paths.keys():
+                    del session.paths[self.path_key]
+                if self.job_key in mdb.jobs.keys():
+                    del mdb.jobs[self.job_key]
+            if self.model is not None:
+                MaterialRegistry.forget(self.model)
+                if self.model_key in mdb.models.keys():
+                    del mdb.models[self.model_key]
+            for extension in remove_files:
+                job_file = os.path.abspath(self.job_key + extension)
+                if os.path.exists(job_file):
+                    try:
+                        os.remove(job_file)
+                    except OSError:
+                        pass
+            self.__model = None
+            self.__piezoelectric = self.__electrode = self.__stack = self.__screw = None
+            self.__matching = self.__backing = None
+            self.__matching_instance = self.__stack_instance = self.__backing_instance = self.__screw_instance = None
+            self.__piezoelectric_instances = []
+            self.__electrode_instances = []
+            self.__step = self.__job = self.__path = self.__odb = None
+            self.__released = True
+        return self
+
+    @property
+    def released(self):
+        return self.__released
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        self.release()
+        return False
 
     @property
     def model(self):
         return self.__model
 
+    @property
+    def design(self):
+        return self.__design
+
     @property
     def screw(self):
         return self.__screw
@@ -764,6 +1327,45 @@ class ModelTransducer:
     def mesh_size(self):
         return self.__mesh_size
 
+    @property
+    def min_elements(self):
+        return self.__min_elements
+
+    # results:
+    # the element size of the instances of a part, like @AssemblyMesh.part_mesh_size
+    def part_mesh_size(self, part_key):
+        if isinstance(self.mesh_size, dict):
+            return self.mesh_size.get(part_key, self.mesh_size.get("default", 1.))
+        return self.mesh_size
+
+    # the element size of the layers of a region of the merged stack, the size of the stack by default
+    def __layer_mesh_size(self, region_key):
+        if isinstance(self.mesh_size, dict):
+            return self.mesh_size.get(region_key, self.part_mesh_size("Stack"))
+        return self.mesh_size
+
+    @property
+    def profiler(self):
+        return self.__profiler
+
+    @property
+    def merged_stack(self):
+        return self.__merged_stack
+
+    # whether the rings and the electrodes are dependent instances of one mesh each, never with @merged_stack
+    @property
+    def dependent_rings(self):
+        return self.__dependent_rings and not self.merged_stack
+
+    # the @ModelStack of the rings and the electrodes when @merged_stack , else None
+    @property
+    def stack(self):
+        return self.__stack
+
+    @property
+    def stack_instance(self):
+        return self.__stack_instance
+
     @property
     def job(self):
         return self.__job
@@ -783,3 +1385,199 @@ class ModelTransducer:
     @property
     def xy_data_key(self):
         return self.__xy_data_key
+
+    @property
+    def odb(self):
+        return self.__odb
+
+    @property
+    def results(self):
+        return self.__results
+
+
+# this method returns the results of a transducer from a @ResultCache , and builds and solves the model only when the
+# same design with the same materials, mesh size and solver settings was never solved before
+# input parameters:
+# @param cache : an instance of @ResultCache
+# @param arguments : the arguments of @ModelTransducer
+# results:
+# an instance of @dict like @ModelTransducer.extract_results
+def cached_transducer_results(cache, **arguments):
+    return cache.fetch(arguments, transducer_results)
+
+
+# this method solves a transducer and releases it, see @ModelTransducer.release
+# input parameters:
+# @param design : an instance of @dict of the arguments of @ModelTransducer
+# @param frame : the frame of @ModelTransducer.extract_results
+# results:
+# an instance of @dict like @ModelTransducer.extract_results
+def transducer_results(design, frame=2):
+    arguments = dict(design)
+    arguments.update(lazy=True)
+    with ModelTransducer(**arguments) as transducer:
+        transducer.submit()
+        return transducer.extract_results(frame=frame)
+
+
+# this class runs the stages of many transducers so the next model is built and meshed while the previous jobs
+# are solving. the jobs are submitted from abaqus/cae, or written as input files and run by a @JobScheduler
+# input parameters:
+# @param designs : an iterable of @dict of the arguments of @ModelTransducer
+# @param max_in_flight : an instance of @int . the number of jobs submitted from abaqus/cae that solve at the same
+# time, not used with a @scheduler
+# @param scheduler : an instance of @JobScheduler . runs the written input files instead of abaqus/cae. the next model
+# is built only while at most one written job waits for a free slot, so the session holds about
+# @JobScheduler.max_concurrent_jobs models, not every design of the sweep
+# @param frame : the frame of @ModelTransducer.extract_results , None picks the longitudinal mode
+# @param release : an instance of @bool . release every transducer once the loop over @iter_results takes the next
+# item, and the first transducer, whose materials the others copy, when the loop ends, so the session stays flat
+# @param catch_errors : an instance of @bool . a design that fails to build, mesh, write its input or submit is yielded
+# with no results, and its error is kept by @error , instead of ending the loop
+class TransducerPipeline:
+
+    def __init__(self, designs, max_in_flight=1, scheduler=None, frame=2, release=False, catch_errors=False):
+        self.__designs = designs
+        self.__max_in_flight = max(1, int(max_in_flight))
+        self.__scheduler = scheduler
+        self.__frame = frame
+        self.__release = release
+        self.__catch_errors = catch_errors
+        self.__errors = {}
+        self.__first_transducer = None
+
+    @property
+    def designs(self):
+        return self.__designs
+
+    # this method gives the error caught for a design of @designs with @catch_errors , None when it built and
+    # submitted, also when its job failed later
+    def error(self, design):
+        return self.__errors.get(id(design))
+
+    @property
+    def max_in_flight(self):
+        return self.__max_in_flight
+
+    @property
+    def scheduler(self):
+        return self.__scheduler
+
+    def __finished(self, in_flight, block):
+        if self.scheduler is not None:
+            job_results = self.scheduler.poll()
+            while block and not job_results and (self.scheduler.pending_jobs or self.scheduler.running_jobs):
+                time.sleep(self.scheduler.poll_interval)
+                job_results = self.scheduler.poll()
+            finished = []
+            for job_result in job_results:
+                design, transducer = job_result.payload
+                results = None
+                if job_result.succeeded:
+                    results = transducer.extract_results(odb_file=job_result.odb_file, frame=self.__frame)
+                finished.append((design, transducer, results))
+            return finished
+        done = [item for item in in_flight if item[1].submit().done()]
+        if block and not done and in_flight:
+            done = [in_flight[0]]
+        for item in done:
+            in_flight.remove(item)
+        return [(design, transducer, transducer.submit().result(frame=self.__frame)) for design, transducer in done]
+
+    # this method yields (design, @ModelTransducer , results) in order of completion. results is None when the job
+    # failed
+    def iter_results(self):
+        try:
+            for design, transducer, results in self.__iter_results():
+                try:
+                    yield design, transducer, results
+                finally:
+                    if self.__release and transducer is not None and transducer is not self.__first_transducer:
+                        transducer.release()
+        finally:
+            if self.__release and self.__first_transducer is not None:
+                self.__first_transducer.release()
+
+    def __iter_results(self):
+        in_flight = []
+        self.__first_transducer = None
+        for design in self.designs:
+            while self.scheduler is not None and len(self.scheduler.pending_jobs) + len(
+                    self.scheduler.running_jobs) > self.scheduler.max_concurrent_jobs:
+                for item in self.__finished(in_flight, block=True):
+                    yield item
+            transducer = None
+            try:
+                transducer = ModelTransducer(lazy=True, materials_from=self.__first_transducer, **design)
+                transducer.mesh()
+                input_file = transducer.write_input() if self.scheduler is not None else None
+            except Exception as error:
+                if not self.__catch_errors:
+                    raise
+                self.__errors[id(design)] = error
+                yield design, transducer, None
+                continue
+            if self.__first_transducer is None:
+                self.__first_transducer = transducer
+            for item in self.__finished(in_flight, block=False):
+                yield item
+            if self.scheduler is not None:
+                self.scheduler.add(job_name=transducer.job_key, input_file=input_file, payload=(design, transducer))
+                continue
+            while len(in_flight) >= self.max_in_flight:
+                for item in self.__finished(in_flight, block=True):
+                    yield item
+            try:
+                transducer.submit()
+            except Exception as error:
+                if not self.__catch_errors:
+                    raise
+                self.__errors[id(design)] = error
+                yield design, transducer, None
+                continue
+            in_flight.append((design, transducer))
+        while in_flight or (self.scheduler is not None and (self.scheduler.pending_jobs or
+                                                            self.scheduler.running_jobs)):
+            for item in self.__finished(in_flight, block=True):
+                yield item
+
+
+# this method builds many transducers and keeps several solver jobs running at once instead of waiting for each one.
+# the next model is built while the earlier jobs are solving
+# input parameters:
+# @param designs : an instance of @list . every item is a @dict of the arguments of @ModelTransducer
+# @param max_concurrent_jobs : an instance of @int . the number of solver jobs running at the same time
+# @param cpu_budget : an instance of @int . the number of cpus shared by the running jobs, all cpus by default
+# @param memory_budget : an instance of @int . the percentage of the memory shared by the running jobs
+# @param solver_command : an instance of @list . the command line template of @JobScheduler
+# @param on_result : a callable . called with the @ModelTransducer and its results (None if the job failed) as soon
+# as each job finishes. the @ModelTransducer is None for the results found in @cache
+# @param cache : an instance of @ResultCache . designs found in it are not built, new results are stored in it
+# @param release : an instance of @bool . release every transducer after @on_result , see @TransducerPipeline
+# results:
+# an instance of @list of (@ModelTransducer, results) in order of completion
+def run_transducers_concurrently(designs, max_concurrent_jobs=2, cpu_budget=None, memory_budget=90,
+                                 solver_command=None, on_result=None, cache=None, release=False):
+    scheduler = JobScheduler(max_concurrent_jobs=max_concurrent_jobs, cpu_budget=cpu_budget,
+                             memory_budget=memory_budget, solver_command=solver_command)
+    finished = []
+    missing = []
+    for design in designs:
+        entry = None
+        if cache is not None:
+            entry = cache.get(parameters_key(canonical_parameters(design)))
+        if entry is None:
+            missing.append(design)
+            continue
+        if on_result is not None:
+            on_result(None, entry["result"])
+        finished.append((None, entry["result"]))
+    for design, transducer, results in TransducerPipeline(missing, scheduler=scheduler,
+                                                          release=release).iter_results():
+        if cache is not None and results is not None:
+            parameters = canonical_parameters(design)
+            cache.put(parameters_key(parameters), parameters, results)
+        if on_result is not None:
+            on_result(transducer, results)
+        finished.append((transducer, results))
+    return finished
@@ -0,0 +1,75 @@
+import collections
+
+# the number of calls into the api of abaqus/cae by the kind of the called object and the method, like
+# "Model.Part" or "Assembly.seedPartInstance" . reset it with @CALLS.clear() between two measures
+CALLS = collections.Counter()
+
+# the kinds of the objects that abaqus/cae gives by a call of a method, or by an attribute for the assembly, so the
+# calls of their methods are counted by the kind, like "Model.Part" and "Assembly.Instance" , whatever the name of
+# the model
+_KINDS = {"Part": "Part", "Model": "Model", "Instance": "Instance", "Job": "Job", "openOdb": "Odb", "Path": "Path",
+          "ConstrainedSketch": "Sketch"}
+_ATTRIBUTE_KINDS = {"rootAssembly": "Assembly"}
+
+
+# this class stands for every object of abaqus/cae. every attribute is a new stand-in, every call is counted in
+# @CALLS and gives a new stand-in, and a call with a @name keeps its result in the repository of the plural name of
+# the method, like mdb.Model(name=...) in mdb.models , so the code can find its objects again
+class Recorder(object):
+
+    def __init__(self, kind, name=None, parent=None):
+        self._kind = kind
+        self._parent = parent
+        self._items = collections.OrderedDict()
+        if name is not None:
+            self.name = name
+
+    def __getattr__(self, attribute):
+        if attribute.startswith("_"):
+            raise AttributeError(attribute)
+        child = Recorder(_ATTRIBUTE_KINDS.get(attribute, self._kind + "." + attribute), parent=self)
+        setattr(self, attribute, child)
+        return child
+
+    def __call__(self, *arguments, **keywords):
+        CALLS[self._kind] += 1
+        method = self._kind.split(".")[-1]
+        name = keywords.get("name")
+        result = Recorder(_KINDS.get(method, method), name=name)
+        if name is not None and self._parent is not None:
+            getattr(self._parent, method[:1].lower() + method[1:] + "s")[name] = result
+        return result
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self._items.values())[key]
+        if key not in self._items:
+            self._items[key] = Recorder(self._kind + "[]", parent=self)
+        return self._items[key]
+
+    def __setitem__(self, key, value):
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        self._items.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __iter__(self):
+        return iter(list(self._items.values()))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __add__(self, other):
+        return self
+
+    def keys(self):
+        return list(self._items.keys())
+
+    def values(self):
+        return list(self._items.values())
+
+    def items(self):
+        return list(self._items.items())
@@ -0,0 +1,8 @@
+# the stand-in of the abaqus module of abaqus/cae, see @_recorder
+from _recorder import Recorder
+
+mdb = Recorder("mdb")
+session = Recorder("session")
+backwardCompatibility = Recorder("backwardCompatibility")
+
+__all__ = ["mdb", "session", "backwardCompatibility"]
@@ -0,0 +1,21 @@
+# the stand-in of the abaqusConstants module of abaqus/cae. every symbolic constant is its own name
+
+
+class SymbolicConstant(str):
+
+    def __repr__(self):
+        return str(self)
+
+
+ON = True
+OFF = False
+
+_NAMES = ("ABORTED", "ANALYSIS", "AXISYM", "AXISYMMETRIC", "CAX3", "CAX4R", "COMPLETED", "COMPONENT", "COMPUTED",
+          "COPLANAR_EDGES", "CYLINDRICAL", "DEFAULT", "DEFORMABLE_BODY", "ENHANCED", "FINER", "FROM_SECTION",
+          "MIDDLE_SURFACE", "NODAL", "ODB", "PATH_POINTS", "PERCENTAGE", "POINT_LIST", "QUAD", "RIGHT", "RUNNING",
+          "SIDE1", "SINGLE", "STANDARD", "STRUCTURED", "SUBMITTED", "TERMINATED", "UNDEFORMED", "Y_CORD")
+
+for _name in _NAMES:
+    globals()[_name] = SymbolicConstant(_name)
+
+__all__ = ["ON", "OFF"] + list(_NAMES)
@@ -0,0 +1,3 @@
+# the stand-in of the load module of abaqus/cae. the objects of the module are reached through mdb and session
+
+__all__ = []
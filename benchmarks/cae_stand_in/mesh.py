@@ -0,0 +1,6 @@
+# the stand-in of the mesh module of abaqus/cae, see @_recorder
+from _recorder import Recorder
+
+ElemType = Recorder("ElemType")
+
+__all__ = ["ElemType"]
@@ -0,0 +1,6 @@
+# the stand-in of the odbAccess module of abaqus, see @_recorder
+from _recorder import Recorder
+
+openOdb = Recorder("openOdb")
+
+__all__ = ["openOdb"]
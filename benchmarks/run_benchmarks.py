@@ -0,0 +1,153 @@
+# the benchmarks of the model build. the modules of abaqus/cae are replaced by the recording stand-ins of
+# cae_stand_in , so @ModelTransducer and every part class run in plain python, the calls into the api are counted and
+# the stages are timed by @profiling . the measures are compared with the stored baselines:
+#   python benchmarks/run_benchmarks.py              compare with baselines.json , exit with 1 on a regression
+#   python benchmarks/run_benchmarks.py --update     store the measures as the new baselines
+import argparse
+import json
+import os
+import sys
+import time
+
+BENCHMARKS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIRECTORY))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIRECTORY, "cae_stand_in"))
+
+from _recorder import CALLS
+from abaqus import mdb
+import automated_transducer_disigner as designer
+import profiling
+
+BASELINES_FILE = os.path.join(BENCHMARKS_DIRECTORY, "baselines.json")
+
+
+# this method gives a case that builds, meshes and writes the input of one transducer
+# input parameters: the arguments of @ModelTransducer
+def transducer_case(**arguments):
+    def run(profiler):
+        designer.ModelTransducer(lazy=True, profiler=profiler, **arguments).write_input()
+
+    return run
+
+
+# this method gives a case that creates one part in a new model
+# input parameters:
+# @param part_class : a part class of @automated_transducer_disigner , like @ModelScrew
+# @param arguments : the arguments of @part_class without the model
+def part_case(part_class, **arguments):
+    def run(profiler):
+        with profiler.span("part"):
+            part_class(model=mdb.Model(name="benchmark_" + part_class.__name__), **arguments)
+
+    return run
+
+
+# the benchmarked cases by name: piezoelectric counts, screw sizes through the inner diameter, mesh sizes, the stack
+# options, and every part class on its own
+CASES = {
+    "transducer_n2": transducer_case(length_of_matching=60, length_of_backing=40),
+    "transducer_n8": transducer_case(length_of_matching=60, length_of_backing=40, number_of_piezoelectrics=8),
+    "transducer_n16": transducer_case(length_of_matching=60, length_of_backing=40, number_of_piezoelectrics=16),
+    "transducer_n16_merged": transducer_case(length_of_matching=60, length_of_backing=40, number_of_piezoelectrics=16,
+                                             merged_stack=True),
+    "transducer_n16_dependent": transducer_case(length_of_matching=60, length_of_backing=40,
+                                                number_of_piezoelectrics=16, dependent_rings=True),
+    "transducer_screw_m8": transducer_case(length_of_matching=60, length_of_backing=40,
+                                           piezoelectric_inner_diameter=10),
+    "transducer_screw_m20": transducer_case(length_of_matching=80, length_of_backing=50,
+                                            piezoelectric_outer_diameter=60, piezoelectric_inner_diameter=25),
+    "transducer_mesh_0.5": transducer_case(length_of_matching=60, length_of_backing=40, mesh_size=0.5,
+                                           min_elements=2),
+    "transducer_mesh_regions": transducer_case(length_of_matching=60, length_of_backing=40,
+                                               mesh_size={"default": 2., "Electrode": 0.15}, min_elements=2),
+    "part_screw": part_case(designer.ModelScrew, screw_diameter=12, screw_length=90),
+    "part_matching": part_case(designer.ModelMatching, length=60, diameter=45, screw_diameter=12,
+                               screw_hole_length=30),
+    "part_backing": part_case(designer.ModelBacking, length=40, outer_diameter=45, screw_diameter=12,
+                              screw_box_length=12, screwdriver_diameter=18, piezoelectric_inner_diameter=15),
+    "part_piezoelectric": part_case(designer.ModelPiezoelectric),
+    "part_electrode": part_case(designer.ModelElectrode),
+    "part_stack": part_case(designer.ModelStack, number_of_piezoelectrics=8),
+}
+
+
+# this method measures one case
+# input parameters:
+# @param run : a callable of a @profiling.Profiler
+# @param repeats : an instance of @int . the wall time is the best of the repeats, the calls are the same every time
+# results:
+# an instance of @dict with @wall , the best wall time in seconds, @calls , the number of calls into the api,
+# @api , the calls by method, and @stages , the best wall time of every span
+def measure(run, repeats=5):
+    best = None
+    stages = {}
+    for repeat in range(repeats):
+        sink = profiling.ListSink()
+        CALLS.clear()
+        start = time.time()
+        run(profiling.Profiler([sink]))
+        wall = time.time() - start
+        best = wall if best is None else min(best, wall)
+        for name, summary in profiling.summarize(sink.events).items():
+            stages[name] = min(stages.get(name, summary["total"]), summary["total"])
+    return {"wall": best, "calls": sum(CALLS.values()), "api": dict(CALLS), "stages": stages}
+
+
+# this method compares the measures with the baselines. more calls into the api than the baseline is a regression,
+# since the calls do not depend on the machine, while the wall time may grow by @time_tolerance and by @time_floor
+# seconds, so the cases of a few milliseconds do not fail on the noise of the timer
+# results:
+# an instance of @list of @str , one line for every regression
+def regressions(measures, baselines, time_tolerance=1., time_floor=0.01):
+    found = []
+    for name, measure in sorted(measures.items()):
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        if measure["calls"] > baseline["calls"]:
+            methods = sorted([method for method, count in measure["api"].items()
+                              if count > baseline.get("api", {}).get(method, 0)])
+            found.append("{0}: {1} calls into the api, baseline {2} ({3})".format(
+                name, measure["calls"], baseline["calls"], ", ".join(methods)))
+        if measure["wall"] > baseline["wall"] * (1. + time_tolerance) + time_floor:
+            found.append("{0}: {1:.4f} s, baseline {2:.4f} s".format(name, measure["wall"], baseline["wall"]))
+    return found
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="benchmarks of the model build with the stand-in of abaqus/cae")
+    parser.add_argument("cases", nargs="*", help="the names of the cases, every case by default")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--time-tolerance", type=float, default=1.,
+                        help="the allowed relative growth of the wall time over the baseline")
+    parser.add_argument("--time-floor", type=float, default=0.01,
+                        help="the allowed absolute growth of the wall time in seconds")
+    parser.add_argument("--baselines", default=BASELINES_FILE)
+    parser.add_argument("--update", action="store_true", help="store the measures as the baselines")
+    arguments = parser.parse_args(arguments)
+    names = arguments.cases or sorted(CASES)
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error("unknown cases: " + ", ".join(unknown))
+    measures = {}
+    for name in names:
+        measures[name] = measure(CASES[name], repeats=arguments.repeats)
+        print("{0:<28} {1:>9.4f} s {2:>7} calls".format(name, measures[name]["wall"], measures[name]["calls"]))
+    baselines = {}
+    if os.path.exists(arguments.baselines):
+        with open(arguments.baselines) as baselines_file:
+            baselines = json.load(baselines_file)
+    if arguments.update:
+        baselines.update(measures)
+        with open(arguments.baselines, "w") as baselines_file:
+            json.dump(baselines, baselines_file, indent=1, sort_keys=True)
+        return 0
+    found = regressions(measures, baselines, time_tolerance=arguments.time_tolerance,
+                        time_floor=arguments.time_floor)
+    for line in found:
+        print("regression " + line)
+    return 1 if found else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+# the component mode synthesis of the transducer. every part of the merged stack geometry, the matching, the stack of
+# the rings and the electrodes, the backing and the screw, is reduced on its own by the method of craig and bampton:
+# the nodes of its tied surfaces are kept, and its interior moves with the static response to those nodes and with the
+# modes of the part held at those nodes, up to a cutoff frequency. the reduced parts are kept by the key of their
+# geometry, materials and mesh in a @ComponentLibrary , and the ties couple the kept nodes, so a sweep that changes
+# one part reduces that part again and solves a small eigenproblem of the coupled components
+import errno
+import os
+import tempfile
+import time
+
+import numpy as np
+import scipy.linalg
+import scipy.sparse.linalg
+
+from modal_solver import assemble_matrices, normalize_shapes, path_data, solve_modes, tie_constraints
+from mode_identification import classify_modes, modal_solver_shapes
+from profiling import span
+from result_cache import canonical_value, parameters_key
+from transducer_design import TransducerDesign
+from transducer_geometry import TransducerGeometry
+from transducer_mesh import FACE_NODES, AssemblyMesh, PartMesh, cell_mesh_size, mesh_part
+
+# a change of the reduction makes every stored component a miss
+REDUCTION_VERSION = 1
+
+
+# this class is a part reduced by @reduce_component . the reduced coordinates are the amplitudes of the fixed
+# interface modes first, then u1 and u2 of every node of @boundary_nodes in turn
+class ReducedComponent:
+
+    def __init__(self, part_mesh, boundary_nodes, stiffness, mass, transformation, modal_frequencies):
+        self.__part_mesh = part_mesh
+        self.__boundary_nodes = boundary_nodes
+        self.__stiffness = stiffness
+        self.__mass = mass
+        self.__transformation = transformation
+        self.__modal_frequencies = modal_frequencies
+
+    @property
+    def part_mesh(self):
+        return self.__part_mesh
+
+    # the nodes of the tied surfaces of the part, in the numbering of @part_mesh
+    @property
+    def boundary_nodes(self):
+        return self.__boundary_nodes
+
+    # the dense stiffness matrix of the reduced coordinates
+    @property
+    def stiffness(self):
+        return self.__stiffness
+
+    @property
+    def mass(self):
+        return self.__mass
+
+    # the matrix that maps the reduced coordinates to u1 and u2 of every node of @part_mesh
+    @property
+    def transformation(self):
+        return self.__transformation
+
+    # the eigenfrequencies in Hz of the fixed interface modes that are kept
+    @property
+    def modal_frequencies(self):
+        return self.__modal_frequencies
+
+    @property
+    def size(self):
+        return self.stiffness.shape[0]
+
+    # the reduced coordinate of u1 of every node of @boundary_nodes , u2 is the next one
+    @property
+    def boundary_offset(self):
+        return len(self.modal_frequencies)
+
+
+# this method reduces a part by the method of craig and bampton
+# input parameters:
+# @param part : an instance of @PartGeometry
+# @param mesh_size, conforming, min_elements : the arguments of @mesh_part
+# @param cutoff_frequency : an instance of @float . the fixed interface modes up to this frequency in Hz are kept
+# results:
+# an instance of @ReducedComponent
+def reduce_component(part, mesh_size=1, conforming=False, min_elements=1, cutoff_frequency=60000.):
+    part_mesh = mesh_part(part, mesh_size, conforming=conforming, min_elements=min_elements)
+    stiffness, mass = assemble_matrices(part_mesh.nodes, part_mesh.elements,
+                                        [part.cell_material(cell) for cell in part_mesh.element_cells])
+    boundary_nodes = []
+    for surface_key in part.surfaces:
+        elements, faces = part_mesh.surface_faces(surface_key)
+        for element, face in zip(elements, faces):
+            boundary_nodes += [part_mesh.elements[element, i] for i in FACE_NODES[face]]
+    boundary_nodes = np.unique(np.array(boundary_nodes, dtype=int))
+    boundary = np.stack([2 * boundary_nodes, 2 * boundary_nodes + 1], axis=1).ravel()
+    interior = np.setdiff1d(np.arange(stiffness.shape[0]), boundary)
+    interior_stiffness = stiffness[interior][:, interior].tocsc()
+    constraint_modes = -scipy.sparse.linalg.splu(interior_stiffness).solve(
+        stiffness[interior][:, boundary].toarray())
+    if len(interior) > 2:
+        modal_frequencies, modes = solve_modes(interior_stiffness, mass[interior][:, interior].tocsc(),
+                                               max_frequency=cutoff_frequency)
+    else:
+        modal_frequencies, modes = np.zeros(0), np.zeros((len(interior), 0))
+    transformation = np.zeros((stiffness.shape[0], len(modal_frequencies) + len(boundary)))
+    transformation[interior, :len(modal_frequencies)] = modes
+    transformation[interior, len(modal_frequencies):] = constraint_modes
+    transformation[boundary, len(modal_frequencies) + np.arange(len(boundary))] = 1.
+    reduced_stiffness = transformation.T.dot(stiffness.dot(transformation))
+    reduced_mass = transformation.T.dot(mass.dot(transformation))
+    return ReducedComponent(part_mesh=part_mesh, boundary_nodes=boundary_nodes,
+                            stiffness=(reduced_stiffness + reduced_stiffness.T) / 2.,
+                            mass=(reduced_mass + reduced_mass.T) / 2., transformation=transformation,
+                            modal_frequencies=modal_frequencies)
+
+
+# this method hashes everything a reduced part depends on. the position of the part in the assembly is not part of
+# the key, so a part that only moves, like the backing behind a longer matching, is found again
+# results:
+# an instance of @str
+def component_key(part, mesh_size=1, conforming=False, min_elements=1, cutoff_frequency=60000.):
+    return parameters_key(canonical_value({
+        "part_key": part.part_key, "r_lines": part.r_lines, "y_lines": part.y_lines, "cells": part.cells,
+        "surfaces": part.surfaces, "materials": [part.cell_material(cell) for cell in part.cells],
+        "regions": [part.cell_region(cell) for cell in part.cells],
+        "mesh_size": sorted(canonical_value(mesh_size).items()) if isinstance(mesh_size, dict) else mesh_size,
+        "conforming": conforming, "min_elements": min_elements, "cutoff_frequency": cutoff_frequency,
+        "version": REDUCTION_VERSION}))
+
+
+def _replace(source, destination):
+    if hasattr(os, "replace"):
+        os.replace(source, destination)
+    else:
+        os.rename(source, destination)
+
+
+# this class keeps the reduced parts by @component_key , in memory and, when a directory is given, as one npz file per
+# part, so the worker processes of a sweep share the reductions. files are written to a temporary file and renamed,
+# like the entries of @ResultCache
+# input parameters:
+# @param directory : an instance of @str . the directory of the files, None keeps the parts in memory only
+# @param memory_components : an instance of @int . the number of parts kept in memory, the least recently used go first
+class ComponentLibrary:
+
+    def __init__(self, directory=None, memory_components=64):
+        self.__directory = os.path.abspath(directory) if directory is not None else None
+        self.__memory_components = memory_components
+        self.__memory = {}
+        self.__hits = 0
+        self.__misses = 0
+        if self.directory is not None:
+            try:
+                os.makedirs(self.directory)
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    # the number of parts reduced by this library
+    @property
+    def misses(self):
+        return self.__misses
+
+    def component_file(self, key):
+        return os.path.join(self.directory, key + ".npz")
+
+    def __remember(self, key, component):
+        if len(self.__memory) >= self.__memory_components:
+            self.__memory.pop(min(self.__memory, key=lambda i: self.__memory[i][0]))
+        self.__memory[key] = (time.time(), component)
+
+    def __load(self, key, part):
+        try:
+            with np.load(self.component_file(key)) as arrays:
+                return ReducedComponent(
+                    part_mesh=PartMesh(part=part, nodes=arrays["nodes"], elements=arrays["elements"],
+                                       element_cells=arrays["element_cells"]),
+                    boundary_nodes=arrays["boundary_nodes"], stiffness=arrays["stiffness"], mass=arrays["mass"],
+                    transformation=arrays["transformation"], modal_frequencies=arrays["modal_frequencies"])
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+    def __store(self, key, component):
+        handle, temporary_file = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        try:
+            with os.fdopen(handle, "wb") as component_file:
+                np.savez(component_file, nodes=component.part_mesh.nodes, elements=component.part_mesh.elements,
+                         element_cells=component.part_mesh.element_cells, boundary_nodes=component.boundary_nodes,
+                         stiffness=component.stiffness, mass=component.mass,
+                         transformation=component.transformation, modal_frequencies=component.modal_frequencies)
+            _replace(temporary_file, self.component_file(key))
+        except BaseException:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise
+
+    # this method finds a reduced part, and reduces it on a miss
+    # input parameters: the arguments of @reduce_component
+    # results:
+    # an instance of @ReducedComponent
+    def component(self, part, mesh_size=1, conforming=False, min_elements=1, cutoff_frequency=60000.):
+        key = component_key(part, mesh_size=mesh_size, conforming=conforming, min_elements=min_elements,
+                            cutoff_frequency=cutoff_frequency)
+        if key in self.__memory:
+            self.__hits += 1
+            self.__memory[key] = (time.time(), self.__memory[key][1])
+            return self.__memory[key][1]
+        component = self.__load(key, part) if self.directory is not None else None
+        if component is not None:
+            self.__hits += 1
+        else:
+            self.__misses += 1
+            with span("reduce", part_key=part.part_key) as reduction:
+                component = reduce_component(part, mesh_size=mesh_size, conforming=conforming,
+                                             min_elements=min_elements, cutoff_frequency=cutoff_frequency)
+                reduction.record(dofs=int(component.transformation.shape[0]), reduced_dofs=int(component.size),
+                                 modes=len(component.modal_frequencies))
+            if self.directory is not None:
+                self.__store(key, component)
+        self.__remember(key, component)
+        return component
+
+    def clear(self):
+        self.__memory.clear()
+
+
+# the library of @SynthesizedTransducer when none is given, shared by the designs solved in a process
+LIBRARY = ComponentLibrary()
+
+
+# this class solves the free vibration of a transducer like @AxisymmetricTransducer with the merged stack, from the
+# reduced parts of a @ComponentLibrary . the kept nodes of the tied surfaces are tied like @tie_constraints does
+# input parameters: the arguments of @AxisymmetricTransducer , and
+# @param conforming : an instance of @bool . mesh the parts with the partition lines of @mesh_part , so the tied
+# surfaces get coincident nodes. the nodes are still tied, not merged, since every part is reduced on its own
+# @param cutoff_frequency : an instance of @float . the cutoff of the fixed interface modes in Hz, four times
+# @max_frequency by default
+# @param library : an instance of @ComponentLibrary , @LIBRARY by default
+class SynthesizedTransducer:
+    __count = 0
+
+    def __init__(self, length_of_matching, length_of_backing, number_of_piezoelectrics=2,
+                 piezoelectric_outer_diameter=45, piezoelectric_inner_diameter=15, piezoelectric_thickness=5,
+                 thickness_of_electrode=0.3, material_of_piezoelectric=None, material_of_electrode=None,
+                 material_of_screw=None, material_of_matching=None, material_of_backing=None, mesh_size=1,
+                 max_frequency=30000., conforming=False, min_elements=1, cutoff_frequency=None, library=None):
+        SynthesizedTransducer.__count += 1
+        self.__model_key = "Transducer" + "_" + str(SynthesizedTransducer.__count)
+        self.__design = TransducerDesign(length_of_matching=length_of_matching, length_of_backing=length_of_backing,
+                                         number_of_piezoelectrics=number_of_piezoelectrics,
+                                         piezoelectric_outer_diameter=piezoelectric_outer_diameter,
+                                         piezoelectric_inner_diameter=piezoelectric_inner_diameter,
+                                         piezoelectric_thickness=piezoelectric_thickness,
+                                         thickness_of_electrode=thickness_of_electrode,
+                                         material_of_piezoelectric=material_of_piezoelectric,
+                                         material_of_electrode=material_of_electrode,
+                                         material_of_screw=material_of_screw,
+                                         material_of_matching=material_of_matching,
+                                         material_of_backing=material_of_backing)
+        self.__geometry = TransducerGeometry(self.design, merged_stack=True)
+        self.__mesh_size = mesh_size
+        self.__max_frequency = max_frequency
+        self.__cutoff_frequency = 4. * max_frequency if cutoff_frequency is None else cutoff_frequency
+        library = LIBRARY if library is None else library
+        self.__components = dict([(part.part_key, library.component(part, cell_mesh_size(mesh_size, part),
+                                                                    conforming=conforming,
+                                                                    min_elements=min_elements,
+                                                                    cutoff_frequency=self.cutoff_frequency))
+                                  for part in self.geometry.parts])
+        self.__mesh = AssemblyMesh(self.geometry, mesh_size, min_elements=min_elements,
+                                   part_meshes=dict([(key, component.part_mesh)
+                                                     for key, component in self.components.items()]))
+        with span("couple", model_key=self.model_key) as coupling:
+            self.__couple()
+            coupling.record(reduced_dofs=int(self.__reduced_size))
+
+    def __couple(self):
+        components = [self.components[instance.part.part_key] for instance in self.geometry.instances]
+        sizes = [component.size for component in components]
+        offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+        node_offsets = np.concatenate([[0], np.cumsum([len(component.part_mesh.nodes)
+                                                       for component in components])]).astype(int)
+        reduced_dof = -np.ones(2 * node_offsets[-1], dtype=int)
+        for component, offset, node_offset in zip(components, offsets, node_offsets):
+            nodes = node_offset + component.boundary_nodes
+            first = offset + component.boundary_offset + 2 * np.arange(len(nodes))
+            reduced_dof[2 * nodes] = first
+            reduced_dof[2 * nodes + 1] = first + 1
+        self.__constraints = tie_constraints(self.mesh, self.geometry.ties)
+        slaves = np.array(sorted(self.constraints), dtype=int)
+        independent = np.setdiff1d(np.arange(offsets[-1]), np.concatenate([reduced_dof[2 * slaves],
+                                                                            reduced_dof[2 * slaves + 1]]))
+        numbers = -np.ones(offsets[-1], dtype=int)
+        numbers[independent] = np.arange(len(independent))
+        transformation = np.zeros((offsets[-1], len(independent)))
+        transformation[independent, numbers[independent]] = 1.
+        for slave in slaves:
+            for master, weight in self.constraints[slave]:
+                for direction in (0, 1):
+                    transformation[reduced_dof[2 * slave + direction],
+                                   numbers[reduced_dof[2 * master + direction]]] += weight
+        stiffness = scipy.linalg.block_diag(*[component.stiffness for component in components])
+        mass = scipy.linalg.block_diag(*[component.mass for component in components])
+        eigenvalues, vectors = scipy.linalg.eigh(transformation.T.dot(stiffness).dot(transformation),
+                                                 transformation.T.dot(mass).dot(transformation))
+        frequencies = np.sqrt(np.maximum(eigenvalues, 0.)) / (2 * np.pi)
+        selected = frequencies <= self.max_frequency
+        coordinates = transformation.dot(vectors[:, selected])
+        self.__reduced_size = len(independent)
+        self.__eigenfrequencies = frequencies[selected]
+        self.__mode_shapes = normalize_shapes(np.concatenate([
+            component.transformation.dot(coordinates[offset:offset + component.size])
+            for component, offset in zip(components, offsets)]))
+
+    @property
+    def model_key(self):
+        return self.__model_key
+
+    @property
+    def design(self):
+        return self.__design
+
+    @property
+    def geometry(self):
+        return self.__geometry
+
+    @property
+    def mesh_size(self):
+        return self.__mesh_size
+
+    @property
+    def max_frequency(self):
+        return self.__max_frequency
+
+    @property
+    def cutoff_frequency(self):
+        return self.__cutoff_frequency
+
+    # an instance of @dict of part key to @ReducedComponent
+    @property
+    def components(self):
+        return self.__components
+
+    # the parts placed in the assembly, every part with its own nodes
+    @property
+    def mesh(self):
+        return self.__mesh
+
+    @property
+    def constraints(self):
+        return self.__constraints
+
+    # the number of coordinates of the coupled eigenproblem
+    @property
+    def reduced_size(self):
+        return self.__reduced_size
+
+    @property
+    def eigenfrequencies(self):
+        return self.__eigenfrequencies
+
+    # the displacements of every mode, one column per mode, u1 and u2 of every node of @mesh in turn
+    @property
+    def mode_shapes(self):
+        return self.__mode_shapes
+
+    # see @AxisymmetricTransducer.path_data
+    def path_data(self, frame=2):
+        return path_data(self.mesh.nodes, self.mode_shapes, self.design.piezoelectric_outer_diameter / 2., frame)
+
+    def classify_modes(self, **thresholds):
+        return classify_modes(self.eigenfrequencies, modal_solver_shapes(self), self.mesh.nodes, design=self.design,
+                              **thresholds)
+
+    # see @AxisymmetricTransducer.extract_results
+    def extract_results(self, frame=2):
+        if frame is None:
+            frame = self.classify_modes().frame
+        return {"model_key": self.model_key, "job_key": "Job_" + self.model_key,
+                "eigenfrequencies": tuple([float(i) for i in self.eigenfrequencies]), "frame": frame,
+                "path_data": self.path_data(frame=frame) if frame is not None else ()}
@@ -0,0 +1,137 @@
+from transducer_design import TransducerDesign
+from transducer_geometry import TransducerGeometry
+from transducer_mesh import AssemblyMesh
+
+# the deck is written with a fixed layout and repr() of every float, so the same design always gives the same bytes
+# and a deck can be compared with a golden file line by line
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def _numbers_per_line(values, count=16):
+    values = list(values)
+    return [", ".join([str(i) for i in values[start:start + count]]) for start in range(0, len(values), count)]
+
+
+def _material_key(material):
+    return (material["material_name"], float(material["density"]), float(material["elastic_module"]),
+            float(material["poisson_ratio"]))
+
+
+# this method names the distinct property tables of the parts like @MaterialRegistry does, so two different tables
+# with the same material name do not share one *Material . a table whose name is taken by another table gets the
+# name followed by its number
+# results:
+# an instance of @list of (property table, name) in the order of the parts, and an instance of @dict of the key of
+# every table to its name
+def material_names(geometry):
+    materials = []
+    names = {}
+    for part in geometry.parts:
+        for material in part.materials:
+            key = _material_key(material)
+            if key not in names:
+                name = material["material_name"]
+                if name in names.values():
+                    name += "_" + str(len(materials) + 1)
+                names[key] = name
+                materials.append((material, name))
+    return materials, names
+
+
+def _part_lines(part_mesh, names):
+    part = part_mesh.part
+    lines = ["*Part, name=" + part.part_key, "*Node"]
+    for number, (r, y) in enumerate(part_mesh.nodes):
+        lines.append("%7d, %s, %s" % (number + 1, _number(r), _number(y)))
+    lines.append("*Element, type=CAX4R")
+    for number, element in enumerate(part_mesh.elements):
+        lines.append("%d, %s" % (number + 1, ", ".join([str(node + 1) for node in element])))
+    lines += ["*Nset, nset=all_faces, generate", "1, %d, 1" % len(part_mesh.nodes),
+              "*Elset, elset=all_faces, generate", "1, %d, 1" % len(part_mesh.elements)]
+    materials = []
+    for material in part.materials:
+        if names[_material_key(material)] not in materials:
+            materials.append(names[_material_key(material)])
+    if len(materials) > 1:
+        element_materials = [names[_material_key(part.cell_material(cell))] for cell in part_mesh.element_cells]
+        for material in materials:
+            lines.append("*Elset, elset=faces_" + material)
+            lines += _numbers_per_line([number + 1 for number, name in enumerate(element_materials)
+                                        if name == material])
+    for surface_key in sorted(part.surfaces.keys()):
+        elements, faces = part_mesh.surface_faces(surface_key)
+        face = part.surfaces[surface_key][0]
+        lines.append("*Elset, elset=_" + surface_key + "_" + face + ", internal")
+        lines += _numbers_per_line([element + 1 for element in elements])
+        lines += ["*Surface, type=ELEMENT, name=" + surface_key, "_" + surface_key + "_" + face + ", " + face]
+    for material in materials:
+        elset = "all_faces" if len(materials) == 1 else "faces_" + material
+        lines += ["** Section: section_" + material,
+                  "*Solid Section, elset=" + elset + ", controls=EC-1, material=" + material, ","]
+    lines += ["*End Part", "**"]
+    return lines
+
+
+# this method writes the lines of a complete abaqus input deck of the frequency analysis of a transducer
+# input parameters:
+# @param mesh : an instance of @AssemblyMesh
+# @param model_key : an instance of @str . the name of the model, used for the step name like @ModelTransducer
+# @param max_frequency : an instance of @int or @float . the maxEigen of the frequency step
+# results:
+# an instance of @list of @str
+def input_deck_lines(mesh, model_key, max_frequency=30000.):
+    geometry = mesh.geometry
+    lines = ["*Heading", "** Job name: Job_" + model_key + " Model name: " + model_key,
+             "*Preprint, echo=NO, model=NO, history=NO, contact=NO", "**", "** PARTS", "**"]
+    materials, names = material_names(geometry)
+    for part in geometry.parts:
+        lines += _part_lines(mesh.part_meshes[part.part_key], names)
+    lines += ["**", "** ASSEMBLY", "**", "*Assembly, name=Assembly", "**"]
+    for instance in geometry.instances:
+        lines.append("*Instance, name=" + instance.name + ", part=" + instance.part.part_key)
+        if instance.offset != 0:
+            lines.append("0., " + _number(instance.offset) + ", 0.")
+        lines.append("*End Instance")
+    for tie in geometry.ties:
+        lines += ["** Constraint: " + tie.name, "*Tie, name=" + tie.name + ", adjust=yes",
+                  tie.slave_instance + "." + tie.slave_surface + ", " + tie.master_instance + "." + tie.master_surface]
+    lines += ["*End Assembly", "**", "** ELEMENT CONTROLS", "**", "*Section Controls, name=EC-1, hourglass=ENHANCED",
+              "1., 1., 1.", "**", "** MATERIALS", "**"]
+    for material, name in materials:
+        lines += ["*Material, name=" + name, "*Density", _number(material["density"]) + ",",
+                  "*Elastic", _number(material["elastic_module"]) + ", " + _number(material["poisson_ratio"])]
+    lines += ["** ----------------------------------------------------------------", "**",
+              "** STEP: frequency_step_" + model_key, "**",
+              "*Step, name=frequency_step_" + model_key + ", nlgeom=NO, perturbation",
+              "*Frequency, eigensolver=Lanczos, normalization=displacement",
+              ", , " + _number(max_frequency) + ", , ,",
+              "*Output, field", "*Node Output", "U,", "*Element Output, directions=YES", "E, S", "*End Step"]
+    return lines
+
+
+# this method writes the input deck of a transducer straight from its design parameters, without abaqus/cae
+# input parameters: @file_path of the deck, the arguments of @ModelTransducer with the materials as property tables,
+# and @model_key and @max_frequency of @input_deck_lines
+# results:
+# the path of the written input file
+def write_input_deck(file_path, length_of_matching, length_of_backing, number_of_piezoelectrics=2,
+                     piezoelectric_outer_diameter=45, piezoelectric_inner_diameter=15, piezoelectric_thickness=5,
+                     thickness_of_electrode=0.3, material_of_piezoelectric=None, material_of_electrode=None,
+                     material_of_screw=None, material_of_matching=None, material_of_backing=None, mesh_size=1,
+                     model_key="Transducer", max_frequency=30000., min_elements=1, merged_stack=False):
+    design = TransducerDesign(length_of_matching=length_of_matching, length_of_backing=length_of_backing,
+                              number_of_piezoelectrics=number_of_piezoelectrics,
+                              piezoelectric_outer_diameter=piezoelectric_outer_diameter,
+                              piezoelectric_inner_diameter=piezoelectric_inner_diameter,
+                              piezoelectric_thickness=piezoelectric_thickness,
+                              thickness_of_electrode=thickness_of_electrode,
+                              material_of_piezoelectric=material_of_piezoelectric,
+                              material_of_electrode=material_of_electrode, material_of_screw=material_of_screw,
+                              material_of_matching=material_of_matching, material_of_backing=material_of_backing)
+    mesh = AssemblyMesh(TransducerGeometry(design, merged_stack=merged_stack), mesh_size, min_elements=min_elements)
+    with open(file_path, "w") as input_file:
+        input_file.write("\n".join(input_deck_lines(mesh, model_key, max_frequency=max_frequency)) + "\n")
+    return file_path
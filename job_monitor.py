@@ -0,0 +1,309 @@
+# coding=utf-8
+# this module follows many running analyses from one controller process with asyncio, instead of blocking on
+# job.waitForCompletion() for each of them. a job is followed through the files the solver writes in its working
+# directory (.sta for progress and completion, .msg for errors, .lck while it runs) and, when the monitor launched
+# it, through its process handle. asyncio needs python 3, so this module is used by the controller process, not
+# inside abaqus/cae
+import asyncio
+import os
+import time
+
+# the kinds of @JobEvent
+STARTED = "started"
+PROGRESS = "progress"
+COMPLETED = "completed"
+FAILED = "failed"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"
+
+FINAL_EVENTS = (COMPLETED, FAILED, TIMEOUT, CANCELLED)
+
+# the command that stops a job the monitor did not launch. every item is formatted with the key @job
+ABAQUS_TERMINATE_COMMAND = ["abaqus", "terminate", "job={job}"]
+
+
+class JobEvent:
+
+    def __init__(self, job_name, kind, elapsed, progress=None, message=None, return_code=None):
+        self.__job_name = job_name
+        self.__kind = kind
+        self.__elapsed = elapsed
+        self.__progress = progress
+        self.__message = message
+        self.__return_code = return_code
+
+    @property
+    def job_name(self):
+        return self.__job_name
+
+    # one of @STARTED , @PROGRESS , @COMPLETED , @FAILED , @TIMEOUT and @CANCELLED
+    @property
+    def kind(self):
+        return self.__kind
+
+    # seconds since the job was watched
+    @property
+    def elapsed(self):
+        return self.__elapsed
+
+    # the step time of the last increment in the .sta file, from 0 to 1
+    @property
+    def progress(self):
+        return self.__progress
+
+    # the status line or the first error of the .msg file that ended the job
+    @property
+    def message(self):
+        return self.__message
+
+    @property
+    def return_code(self):
+        return self.__return_code
+
+    @property
+    def final(self):
+        return self.kind in FINAL_EVENTS
+
+    def __repr__(self):
+        return "JobEvent({0}, {1}, progress={2})".format(self.job_name, self.kind, self.progress)
+
+
+class MonitoredJob:
+
+    def __init__(self, job_name, working_directory, timeout=None, process=None):
+        self.__job_name = job_name
+        self.__working_directory = os.path.abspath(working_directory)
+        self.__timeout = timeout
+        self.__process = process
+        self.__start = time.time()
+        self.__status_offset = 0
+        self.__status_buffer = ""
+        self.__progress = None
+        self.__started = False
+        self.__final_event = None
+        self.__cancel_requested = None
+        self.__status_line = None
+
+    @property
+    def job_name(self):
+        return self.__job_name
+
+    @property
+    def working_directory(self):
+        return self.__working_directory
+
+    @property
+    def timeout(self):
+        return self.__timeout
+
+    # an instance of @asyncio.subprocess.Process when the monitor launched the job, else None
+    @property
+    def process(self):
+        return self.__process
+
+    @property
+    def elapsed(self):
+        return time.time() - self.__start
+
+    @property
+    def progress(self):
+        return self.__progress
+
+    @property
+    def final_event(self):
+        return self.__final_event
+
+    @property
+    def finished(self):
+        return self.__final_event is not None
+
+    def file(self, extension):
+        return os.path.join(self.working_directory, self.job_name + extension)
+
+    def __event(self, kind, message=None):
+        return_code = self.process.returncode if self.process is not None else None
+        event = JobEvent(job_name=self.job_name, kind=kind, elapsed=self.elapsed, progress=self.progress,
+                         message=message, return_code=return_code)
+        if event.final:
+            self.__final_event = event
+        return event
+
+    def __read_status_lines(self):
+        try:
+            with open(self.file(".sta")) as status_file:
+                status_file.seek(self.__status_offset)
+                text = status_file.read()
+                self.__status_offset = status_file.tell()
+        except (IOError, OSError):
+            return []
+        lines = (self.__status_buffer + text).split("\n")
+        self.__status_buffer = lines.pop()
+        return lines
+
+    def __first_error(self):
+        try:
+            with open(self.file(".msg")) as message_file:
+                for line in message_file:
+                    if "***ERROR" in line:
+                        return line.strip()
+        except (IOError, OSError):
+            pass
+        return None
+
+    def request_cancel(self, kind=CANCELLED):
+        if self.__cancel_requested is None:
+            self.__cancel_requested = kind
+
+    # this method reads what the solver wrote since the last call and gives the new events of the job
+    # results:
+    # an instance of @list of @JobEvent
+    def update(self):
+        if self.finished:
+            return []
+        events = []
+        if not self.__started and (self.process is not None or os.path.exists(self.file(".lck")) or
+                                   os.path.exists(self.file(".sta"))):
+            self.__started = True
+            events.append(self.__event(STARTED))
+        progress = self.__progress
+        for line in self.__read_status_lines():
+            if "THE ANALYSIS HAS" in line:
+                self.__status_line = line.strip()
+                continue
+            columns = line.split()
+            if len(columns) >= 8 and columns[0].isdigit() and columns[1].isdigit():
+                try:
+                    progress = float(columns[7])
+                except ValueError:
+                    pass
+        if progress != self.__progress:
+            self.__progress = progress
+            events.append(self.__event(PROGRESS))
+        status_line = self.__status_line
+        if self.__cancel_requested is not None:
+            events.append(self.__event(self.__cancel_requested, message=status_line))
+            return events
+        exited = self.process is not None and self.process.returncode is not None
+        if status_line is not None and (self.process is None or exited):
+            if "NOT BEEN COMPLETED" in status_line or (exited and self.process.returncode != 0):
+                events.append(self.__event(FAILED, message=self.__first_error() or status_line))
+            else:
+                events.append(self.__event(COMPLETED, message=status_line))
+        elif exited:
+            events.append(self.__event(COMPLETED if self.process.returncode == 0 else FAILED,
+                                       message=self.__first_error()))
+        elif self.process is None and self.__started and not os.path.exists(self.file(".lck")) and \
+                os.path.exists(self.file(".sta")) and self.elapsed > 60.:
+            events.append(self.__event(FAILED, message=self.__first_error() or "the lock file is gone"))
+        elif self.timeout is not None and self.elapsed > self.timeout:
+            self.request_cancel(TIMEOUT)
+            events.append(self.__event(TIMEOUT, message="no result after " + str(self.timeout) + " seconds"))
+        return events
+
+
+# this class watches many solver jobs at once and streams their events. every @poll_interval it stats and tails the
+# files of all unfinished jobs in one pass, so hundreds of jobs cost one coroutine, not one thread or task each
+# input parameters:
+# @param poll_interval : an instance of @int or @float . seconds between two passes over the jobs
+# @param terminate_command : an instance of @list . stops a job the monitor did not launch, @ABAQUS_TERMINATE_COMMAND
+# by default
+class JobMonitor:
+
+    def __init__(self, poll_interval=0.5, terminate_command=None):
+        if terminate_command is None:
+            terminate_command = ABAQUS_TERMINATE_COMMAND
+        self.__poll_interval = poll_interval
+        self.__terminate_command = list(terminate_command)
+        self.__jobs = {}
+
+    @property
+    def poll_interval(self):
+        return self.__poll_interval
+
+    @property
+    def jobs(self):
+        return dict(self.__jobs)
+
+    @property
+    def active_jobs(self):
+        return [job for job in self.__jobs.values() if not job.finished]
+
+    # this method follows a job that is already running, or is about to be started by someone else
+    # input parameters:
+    # @param job_name : an instance of @str . the name of the job, like "Job_Transducer_1"
+    # @param working_directory : an instance of @str . the directory of the files of the job
+    # @param timeout : an instance of @int or @float . seconds before the job is cancelled, no limit by default
+    # @param process : an instance of @asyncio.subprocess.Process of the solver, if any
+    def watch(self, job_name, working_directory=".", timeout=None, process=None):
+        self.__jobs[job_name] = MonitoredJob(job_name=job_name, working_directory=working_directory,
+                                             timeout=timeout, process=process)
+        return self.__jobs[job_name]
+
+    # this method starts a solver process and follows it
+    # input parameters:
+    # @param command : an instance of @list . the command line, every item is formatted with the key @job , like
+    # @job_scheduler.STAND_IN_SOLVER_COMMAND with its other keys already filled
+    async def launch(self, job_name, command, working_directory=".", timeout=None):
+        with open(os.path.join(working_directory, job_name + ".monitor.log"), "w") as log:
+            process = await asyncio.create_subprocess_exec(*[item.format(job=job_name) for item in command],
+                                                           cwd=working_directory, stdout=log,
+                                                           stderr=asyncio.subprocess.STDOUT)
+        return self.watch(job_name, working_directory=working_directory, timeout=timeout, process=process)
+
+    # this method asks a job to stop. its @CANCELLED event comes with the next pass
+    async def cancel(self, job_name):
+        job = self.__jobs[job_name]
+        job.request_cancel()
+        await self.__stop(job)
+
+    async def __stop(self, job):
+        if job.process is not None:
+            if job.process.returncode is None:
+                job.process.terminate()
+                await job.process.wait()
+        else:
+            process = await asyncio.create_subprocess_exec(
+                *[item.format(job=job.job_name) for item in self.__terminate_command], cwd=job.working_directory,
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            await process.wait()
+
+    # this method yields the events of all jobs until every watched job has a final event. jobs watched while it
+    # runs are followed too
+    async def events(self):
+        while self.active_jobs:
+            for job in self.active_jobs:
+                for event in job.update():
+                    if event.kind == TIMEOUT:
+                        await self.__stop(job)
+                    yield event
+            if self.active_jobs:
+                await asyncio.sleep(self.poll_interval)
+
+    # this method follows every job to its end
+    # input parameters:
+    # @param on_event : a callable . called with every @JobEvent
+    # results:
+    # an instance of @dict of job name to its final @JobEvent
+    async def run(self, on_event=None):
+        async for event in self.events():
+            if on_event is not None:
+                on_event(event)
+        return dict([(name, job.final_event) for name, job in self.__jobs.items()])
+
+
+# this method runs the solver of every job with a @JobMonitor and waits for all of them, for callers without an event
+# loop
+# input parameters:
+# @param jobs : an instance of @list of (job name, command, working directory)
+# @param timeout : an instance of @int or @float . the timeout of every job in seconds
+# @param on_event : a callable . called with every @JobEvent
+# results:
+# an instance of @dict of job name to its final @JobEvent
+def monitor_jobs(jobs, timeout=None, on_event=None, poll_interval=0.5):
+    async def main():
+        monitor = JobMonitor(poll_interval=poll_interval)
+        for job_name, command, working_directory in jobs:
+            await monitor.launch(job_name, command, working_directory=working_directory, timeout=timeout)
+        return await monitor.run(on_event=on_event)
+
+    return asyncio.run(main())
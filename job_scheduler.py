@@ -0,0 +1,216 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+# the command line used to run one analysis. every item is formatted with the keys @job, @input, @cpus and @memory
+ABAQUS_SOLVER_COMMAND = ["abaqus", "job={job}", "input={input}", "cpus={cpus}", "memory={memory} %", "interactive"]
+
+# the same command line for the local stand-in solver, so the scheduler can be exercised without an abaqus license
+STAND_IN_SOLVER_COMMAND = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                        "stand_in_solver.py"),
+                           "job={job}", "input={input}", "cpus={cpus}", "memory={memory} %", "interactive"]
+
+
+class SolverJob:
+
+    def __init__(self, job_name, input_file, working_directory=None, payload=None):
+        self.__job_name = job_name
+        self.__input_file = os.path.abspath(input_file)
+        if working_directory is None:
+            working_directory = os.path.dirname(self.input_file)
+        self.__working_directory = working_directory
+        self.__payload = payload
+
+    @property
+    def job_name(self):
+        return self.__job_name
+
+    @property
+    def input_file(self):
+        return self.__input_file
+
+    @property
+    def working_directory(self):
+        return self.__working_directory
+
+    @property
+    def payload(self):
+        return self.__payload
+
+    @property
+    def odb_file(self):
+        return os.path.join(self.working_directory, self.job_name + ".odb")
+
+    @property
+    def status_file(self):
+        return os.path.join(self.working_directory, self.job_name + ".sta")
+
+
+class JobResult:
+
+    def __init__(self, job, return_code, cpus, memory, elapsed):
+        self.__job = job
+        self.__return_code = return_code
+        self.__cpus = cpus
+        self.__memory = memory
+        self.__elapsed = elapsed
+
+    @property
+    def job(self):
+        return self.__job
+
+    @property
+    def job_name(self):
+        return self.job.job_name
+
+    @property
+    def payload(self):
+        return self.job.payload
+
+    @property
+    def odb_file(self):
+        return self.job.odb_file
+
+    @property
+    def return_code(self):
+        return self.__return_code
+
+    @property
+    def cpus(self):
+        return self.__cpus
+
+    @property
+    def memory(self):
+        return self.__memory
+
+    @property
+    def elapsed(self):
+        return self.__elapsed
+
+    @property
+    def succeeded(self):
+        if self.return_code != 0:
+            return False
+        if os.path.exists(self.job.status_file):
+            with open(self.job.status_file) as status_file:
+                return "NOT BEEN COMPLETED" not in status_file.read()
+        return True
+
+
+# this class keeps up to @max_concurrent_jobs solver processes running at once and reports each one as it finishes
+# input parameters:
+# @param max_concurrent_jobs : an instance of @int . the number of solver processes allowed to run at the same time
+# @param cpu_budget : an instance of @int . the number of cpus shared by all running jobs, all cpus by default. every
+# job gets @cpus_per_job of them
+# @param memory_budget : an instance of @int . the percentage of the memory shared by all running jobs
+# @param solver_command : an instance of @list . the command line template, @ABAQUS_SOLVER_COMMAND by default
+# @param poll_interval : an instance of @int or @float . seconds between two checks of the running processes
+class JobScheduler:
+
+    def __init__(self, max_concurrent_jobs=2, cpu_budget=None, memory_budget=90, solver_command=None,
+                 poll_interval=1.0):
+        if cpu_budget is None:
+            cpu_budget = multiprocessing.cpu_count()
+        if solver_command is None:
+            solver_command = ABAQUS_SOLVER_COMMAND
+        self.__max_concurrent_jobs = max(1, int(max_concurrent_jobs))
+        self.__cpu_budget = max(1, int(cpu_budget))
+        self.__memory_budget = memory_budget
+        self.__solver_command = list(solver_command)
+        self.__poll_interval = poll_interval
+        self.__pending = []
+        self.__running = []
+
+    @property
+    def max_concurrent_jobs(self):
+        return self.__max_concurrent_jobs
+
+    @property
+    def cpu_budget(self):
+        return self.__cpu_budget
+
+    @property
+    def memory_budget(self):
+        return self.__memory_budget
+
+    @property
+    def solver_command(self):
+        return self.__solver_command
+
+    @property
+    def poll_interval(self):
+        return self.__poll_interval
+
+    @property
+    def pending_jobs(self):
+        return list(self.__pending)
+
+    @property
+    def running_jobs(self):
+        return [job for job, process, cpus, memory, start in self.__running]
+
+    def add(self, job_name, input_file, working_directory=None, payload=None):
+        job = SolverJob(job_name=job_name, input_file=input_file, working_directory=working_directory,
+                        payload=payload)
+        self.__pending.append(job)
+        return job
+
+    # the cpus of every job, an even share of @cpu_budget reserved for each of the @max_concurrent_jobs slots, so the
+    # jobs added one at a time, like those of @TransducerPipeline , do not oversubscribe the machine
+    @property
+    def cpus_per_job(self):
+        return max(1, self.cpu_budget // self.max_concurrent_jobs)
+
+    def __launch(self):
+        while self.__pending and len(self.__running) < self.max_concurrent_jobs:
+            cpus = self.cpus_per_job
+            memory = max(1, int(self.memory_budget) // self.max_concurrent_jobs)
+            job = self.__pending.pop(0)
+            command = [item.format(job=job.job_name, input=job.input_file, cpus=cpus, memory=memory)
+                       for item in self.solver_command]
+            with open(os.path.join(job.working_directory, job.job_name + ".scheduler.log"), "w") as log:
+                process = subprocess.Popen(command, cwd=job.working_directory, stdout=log,
+                                           stderr=subprocess.STDOUT)
+            self.__running.append((job, process, cpus, memory, time.time()))
+
+    # this method launches the pending jobs that fit and collects the finished ones without waiting
+    # results:
+    # an instance of @list of @JobResult of the processes that exited since the last call
+    def poll(self):
+        self.__launch()
+        finished = [item for item in self.__running if item[1].poll() is not None]
+        for item in finished:
+            self.__running.remove(item)
+        self.__launch()
+        return [JobResult(job=job, return_code=process.returncode, cpus=cpus, memory=memory,
+                          elapsed=time.time() - start) for job, process, cpus, memory, start in finished]
+
+    # this method runs every added job and yields a @JobResult as soon as its process exits
+    def iter_results(self):
+        self.__launch()
+        while self.__running:
+            results = self.poll()
+            if not results:
+                time.sleep(self.poll_interval)
+                continue
+            for result in results:
+                yield result
+
+    # this method runs every added job and calls @on_result with each @JobResult as soon as its process exits
+    # results:
+    # the @list of all @JobResult in order of completion
+    def run(self, on_result=None):
+        results = []
+        for result in self.iter_results():
+            if on_result is not None:
+                on_result(result)
+            results.append(result)
+        return results
+
+    def terminate(self):
+        for job, process, cpus, memory, start in self.__running:
+            if process.poll() is None:
+                process.terminate()
+        self.__pending = []
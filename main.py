@@ -1,17 +1,262 @@
 # coding=utf-8
-# This is a sample Python script.
+# the command line of the sweeps. it reads the arguments of @ModelTransducer from a csv file, one design per row
+# and one argument per column, or from a jsonl file, one json object per line, and solves them with a bounded number
+# of jobs at once. every result is appended to the output jsonl file as soon as it is known, so the output file is also
+# the checkpoint of the sweep: a sweep that is started again only solves the designs that have no row yet, or only
+# rows with an error. the row of a design solved again follows its failed row, so the last row of a key is its result
+#   abaqus cae noGUI=main.py -- designs.csv -o results.jsonl -j 4
+#   python main.py designs.jsonl --solver modal -j 8
+#   python main.py designs.jsonl --solver synthesis --components reduced_parts
+import argparse
+import csv
+import json
+import os
+import sys
+import time
 
-# Press Shift+F10 to execute it or replace it with your code.
-# Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
+from result_cache import ResultCache, canonical_parameters, parameters_key
 
+# the solvers of a sweep: abaqus through @TransducerPipeline , the in-process @AxisymmetricTransducer , or
+# @SynthesizedTransducer , which reuses the reduced parts that did not change from one design to the next
+SOLVERS = ("abaqus", "modal", "synthesis")
 
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print("Hi, {0}".format(name))  # Press Ctrl+F8 to toggle the breakpoint.
 
+def _cell(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+# this method reads the designs of a sweep
+# input parameters:
+# @param file_name : an instance of @str . a csv file with a header of argument names, or a jsonl file. the cells of
+# a csv file are read as json when they can be, like 60 , 0.3 , true or a material table, and empty cells are left
+# to the defaults of @ModelTransducer
+# results:
+# an instance of @list of @dict
+def read_designs(file_name):
+    with open(file_name) as designs_file:
+        if os.path.splitext(file_name)[1].lower() == ".csv":
+            return [dict([(key.strip(), _cell(value.strip())) for key, value in row.items() if value and value.strip()])
+                    for row in csv.DictReader(designs_file)]
+        return [json.loads(line) for line in designs_file if line.strip()]
+
+
+# this method reads the keys of the designs that already have a row without an error in the output file, so the
+# designs that failed, like on a license or a disk error, are solved again. a last line cut by a killed sweep is
+# removed, so the rows appended by the next run start on a line of their own
+# results:
+# an instance of @set of the keys of @parameters_key
+def completed_keys(output_file):
+    if not os.path.exists(output_file):
+        return set()
+    keys = set()
+    complete_bytes = 0
+    with open(output_file, "rb") as rows:
+        for line in rows:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                row = json.loads(line.decode("utf-8"))
+                if row.get("error") is None:
+                    keys.add(row["key"])
+            except (ValueError, KeyError, AttributeError):
+                pass
+            complete_bytes += len(line)
+    if complete_bytes < os.path.getsize(output_file):
+        with open(output_file, "rb+") as rows:
+            rows.truncate(complete_bytes)
+    return keys
+
+
+# this class reports the throughput of a sweep and the time left, from the designs solved by this run. the designs
+# that failed are counted apart, so a run of quick failures does not shorten the time left
+class SweepProgress:
+
+    def __init__(self, total, skipped=0, stream=None):
+        self.__total = total
+        self.__skipped = skipped
+        self.__stream = stream
+        self.__start = time.time()
+        self.__solved = 0
+        self.__failed = 0
+
+    @property
+    def solved(self):
+        return self.__solved
+
+    @property
+    def failed(self):
+        return self.__failed
+
+    # an instance of @float . the designs solved without an error by hour
+    @property
+    def throughput(self):
+        return 3600. * self.solved / max(time.time() - self.__start, 1e-9)
+
+    # an instance of @float . the seconds left, None before the first design is solved
+    @property
+    def eta(self):
+        if not self.solved:
+            return None
+        return (self.__total - self.__skipped - self.solved - self.failed) * (time.time() - self.__start) / self.solved
+
+    def update(self, failed=False):
+        if failed:
+            self.__failed += 1
+        else:
+            self.__solved += 1
+        if self.__stream is not None:
+            self.__stream.write(str(self) + "\n")
+            self.__stream.flush()
+
+    def __str__(self):
+        eta = self.eta
+        if eta is None:
+            eta_text = "-"
+        else:
+            eta_text = "{0}:{1:02d}:{2:02d}".format(int(eta) // 3600, int(eta) % 3600 // 60, int(eta) % 60)
+        return "{0}/{1} designs, {2} failed, {3:.1f} designs/h, eta {4}".format(
+            self.__skipped + self.solved + self.failed, self.__total, self.failed, self.throughput, eta_text)
+
+
+def _modal_solve(item):
+    key, design, frame, solver, components = item
+    try:
+        if solver == "synthesis":
+            from component_synthesis import ComponentLibrary, SynthesizedTransducer
+            if components not in _LIBRARIES:
+                _LIBRARIES[components] = ComponentLibrary(components)
+            return key, design, SynthesizedTransducer(library=_LIBRARIES[components], **design).extract_results(
+                frame=frame), None
+        from modal_solver import AxisymmetricTransducer
+        return key, design, AxisymmetricTransducer(**design).extract_results(frame=frame), None
+    except Exception as error:
+        return key, design, None, repr(error)
 
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
 
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+# the @ComponentLibrary of every directory of reduced parts, kept by each worker process for the whole sweep
+_LIBRARIES = {}
+
+
+# this method yields (key, design, results, error) of every design in order of completion with
+# @AxisymmetricTransducer , or with @SynthesizedTransducer when @solver is "synthesis" , in @parallel worker
+# processes. the reduced parts are shared through the directory @components when given, and kept by every worker
+# process otherwise
+def modal_results(items, parallel=1, frame=2, solver="modal", components=None):
+    items = [(key, design, frame, solver, components) for key, design in items]
+    if parallel <= 1:
+        for item in items:
+            yield _modal_solve(item)
+        return
+    import multiprocessing
+    pool = multiprocessing.Pool(parallel)
+    try:
+        for result in pool.imap_unordered(_modal_solve, items):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+# this method yields (key, design, results, error) of every design in order of completion with @ModelTransducer .
+# the models are built in this session and released once their row is written, while @parallel jobs solve at once.
+# a design that fails to build or to write its input gets its error, like a failed job, and the sweep goes on
+def abaqus_results(items, parallel=1, frame=2):
+    from automated_transducer_disigner import TransducerPipeline
+    from job_scheduler import JobScheduler
+    keys = dict([(id(design), key) for key, design in items])
+    pipeline = TransducerPipeline([design for key, design in items], frame=frame, release=True,
+                                  scheduler=JobScheduler(max_concurrent_jobs=parallel), catch_errors=True)
+    for design, transducer, results in pipeline.iter_results():
+        error = None
+        if pipeline.error(design) is not None:
+            error = repr(pipeline.error(design))
+        elif results is None:
+            error = "the job of " + transducer.job_key + " failed"
+        yield keys[id(design)], design, results, error
+
+
+# this method runs a sweep and appends a row of json to @output_file for every design, with @key , @design ,
+# @result and @error , flushed to the disk before the next design is reported. the designs that already have a row
+# are skipped
+# input parameters:
+# @param designs : an instance of @list of @dict of the arguments of @ModelTransducer
+# @param output_file : an instance of @str . the jsonl file of the results
+# @param solver : an item of @SOLVERS
+# @param parallel : an instance of @int . the number of designs solved at once
+# @param frame : the frame of the results, None picks the longitudinal mode
+# @param cache : an instance of @ResultCache . designs found in it are not solved again
+# @param stream : the stream of the progress, like @sys.stderr
+# @param components : an instance of @str . the directory of the reduced parts of the "synthesis" solver
+# results:
+# an instance of @SweepProgress
+def run_sweep(designs, output_file, solver="abaqus", parallel=2, frame=2, cache=None, stream=None, components=None):
+    solver_settings = {"path_frame": frame}
+    if solver != "abaqus":
+        solver_settings["solver"] = solver
+    done = completed_keys(output_file)
+    items = []
+    for design in designs:
+        key = parameters_key(canonical_parameters(design, solver_settings))
+        if key not in done:
+            done.add(key)
+            items.append((key, design))
+    progress = SweepProgress(total=len(designs), skipped=len(designs) - len(items), stream=stream)
+    with open(output_file, "a") as rows:
+
+        def write(key, design, result, error):
+            rows.write(json.dumps({"key": key, "design": design, "result": result, "error": error},
+                                  sort_keys=True) + "\n")
+            rows.flush()
+            os.fsync(rows.fileno())
+            progress.update(failed=error is not None)
+
+        missing = []
+        for key, design in items:
+            entry = cache.get(key) if cache is not None else None
+            if entry is None:
+                missing.append((key, design))
+            else:
+                write(key, design, entry["result"], None)
+        if solver == "abaqus":
+            results = abaqus_results(missing, parallel=parallel, frame=frame)
+        else:
+            results = modal_results(missing, parallel=parallel, frame=frame, solver=solver, components=components)
+        for key, design, result, error in results:
+            if cache is not None and result is not None:
+                cache.put(key, canonical_parameters(design, solver_settings), result)
+            write(key, design, result, error)
+    return progress
+
+
+def _frame(text):
+    return None if text == "auto" else int(text)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="solve a sweep of transducer designs")
+    parser.add_argument("designs", help="a csv or jsonl file of the arguments of ModelTransducer")
+    parser.add_argument("-o", "--output", help="the jsonl file of the results, <designs>_results.jsonl by default")
+    parser.add_argument("-s", "--solver", choices=SOLVERS, default="abaqus")
+    parser.add_argument("-j", "--parallel", type=int, default=2, help="the number of designs solved at once")
+    parser.add_argument("--frame", type=_frame, default=2, help="the frame of the path data, or auto")
+    parser.add_argument("--cache", help="the directory of a result cache shared by sweeps")
+    parser.add_argument("--restart", action="store_true", help="solve every design again")
+    parser.add_argument("--components", help="the directory of the reduced parts of the synthesis solver")
+    parser.add_argument("-q", "--quiet", action="store_true")
+    arguments = parser.parse_args(arguments)
+    output_file = arguments.output or os.path.splitext(arguments.designs)[0] + "_results.jsonl"
+    if arguments.restart and os.path.exists(output_file):
+        os.remove(output_file)
+    progress = run_sweep(read_designs(arguments.designs), output_file, solver=arguments.solver,
+                         parallel=arguments.parallel, frame=arguments.frame,
+                         cache=ResultCache(arguments.cache) if arguments.cache else None,
+                         stream=None if arguments.quiet else sys.stderr, components=arguments.components)
+    return 1 if progress.failed else 0
+
+
+# abaqus cae passes the arguments of a script after "--"
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]))
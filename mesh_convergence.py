@@ -0,0 +1,127 @@
+import numpy as np
+
+from multi_fidelity import element_count, modal_solver_runner
+from surrogate import design_targets
+
+# the part keys of the regions that get their own element size
+REGIONS = ("Matching", "Piezoelectric", "Electrode", "Backing", "Screw")
+
+# the global element sizes of @mesh_convergence , coarse first
+MESH_SIZES = (8., 4., 2., 1., 0.5, 0.25)
+
+
+# this method finds the largest relative change of the elastic eigenfrequencies between two runs
+# input parameters:
+# @param results, reference : instances of @dict like @ModelTransducer.extract_results
+# @param modes : an instance of @int . the number of elastic modes compared, every mode found in both runs by default
+# results:
+# an instance of @float . the largest relative change of the first modes and of the longitudinal mode
+def frequency_change(results, reference, modes=None, min_frequency=1.):
+    frequencies = np.array([i for i in results["eigenfrequencies"] if i > min_frequency])
+    reference_frequencies = np.array([i for i in reference["eigenfrequencies"] if i > min_frequency])
+    count = min(len(frequencies), len(reference_frequencies))
+    if modes is not None:
+        count = min(count, modes)
+    changes = list(np.abs(frequencies[:count] - reference_frequencies[:count]) / reference_frequencies[:count])
+    targets = design_targets(results)
+    reference_targets = design_targets(reference)
+    if targets is not None and reference_targets is not None:
+        changes.append(abs(targets["frequency"] - reference_targets["frequency"]) / reference_targets["frequency"])
+    return float(max(changes)) if changes else float("inf")
+
+
+class ConvergenceStudy:
+
+    def __init__(self, design, tolerance, levels, converged, cheapest, cheapest_elements):
+        self.__design = design
+        self.__tolerance = tolerance
+        self.__levels = levels
+        self.__converged = converged
+        self.__cheapest = cheapest
+        self.__cheapest_elements = cheapest_elements
+
+    @property
+    def design(self):
+        return self.__design
+
+    @property
+    def tolerance(self):
+        return self.__tolerance
+
+    # an instance of @list of @dict with @mesh_size , @min_elements , @elements , @results and @change , the
+    # @frequency_change from the level before, of every solved mesh in order
+    @property
+    def levels(self):
+        return self.__levels
+
+    @property
+    def converged(self):
+        return self.__converged
+
+    # an instance of @dict with the @mesh_size and @min_elements of the cheapest mesh within @tolerance of the finer
+    # mesh, ready to update the arguments of @ModelTransducer
+    @property
+    def cheapest(self):
+        return self.__cheapest
+
+    @property
+    def cheapest_elements(self):
+        return self.__cheapest_elements
+
+    def __repr__(self):
+        return "ConvergenceStudy(cheapest={0}, elements={1}, converged={2}, solves={3})".format(
+            self.cheapest, self.cheapest_elements, self.converged, len(self.levels))
+
+
+# this method refines the mesh of a design until its eigenfrequencies change by less than @tolerance , then
+# coarsens every region of the converged mesh on its own while the eigenfrequencies stay within @tolerance of the
+# finest solved mesh, so thin layers keep fine elements and long parts get coarse ones
+# input parameters:
+# @param design : an instance of @dict of the arguments of @ModelTransducer , without @mesh_size
+# @param run : a callable of a @list of designs that returns their results in the same order, like
+# @multi_fidelity.transducer_runner . solves with @AxisymmetricTransducer by default
+# @param tolerance : an instance of @float . the allowed relative change of the eigenfrequencies
+# @param mesh_sizes : the global element sizes that are tried, coarse first
+# @param min_elements : an instance of @int . the smallest number of elements through every layer
+# @param per_region : an instance of @bool . coarsen the regions of the converged mesh one by one
+# @param coarsening : an instance of @float . the factor of the element size of a coarsened region
+# results:
+# an instance of @ConvergenceStudy
+def mesh_convergence(design, run=None, tolerance=1e-3, mesh_sizes=MESH_SIZES, min_elements=2, modes=None,
+                     per_region=True, coarsening=2.):
+    if run is None:
+        run = modal_solver_runner()
+    design = dict(design)
+    levels = []
+
+    def solve(mesh_size):
+        arguments = dict(design, mesh_size=mesh_size, min_elements=min_elements)
+        level = {"mesh_size": mesh_size, "min_elements": min_elements, "elements": element_count(arguments, mesh_size),
+                 "results": run([arguments])[0], "change": None}
+        levels.append(level)
+        return level
+
+    previous = solve(mesh_sizes[0])
+    converged = False
+    for mesh_size in mesh_sizes[1:]:
+        level = solve(mesh_size)
+        level["change"] = frequency_change(previous["results"], level["results"], modes=modes)
+        if level["change"] <= tolerance:
+            converged = True
+            break
+        previous = level
+    reference = levels[-1]
+    cheapest = previous if converged else reference
+    if converged and per_region:
+        sizes = dict([(region, float(cheapest["mesh_size"])) for region in REGIONS])
+        for region in REGIONS:
+            trial = dict(sizes)
+            trial[region] = sizes[region] * coarsening
+            level = solve(trial)
+            level["change"] = frequency_change(level["results"], reference["results"], modes=modes)
+            if level["change"] <= tolerance and level["elements"] < cheapest["elements"]:
+                sizes = trial
+                cheapest = level
+    return ConvergenceStudy(design=design, tolerance=tolerance, levels=levels, converged=converged,
+                            cheapest={"mesh_size": cheapest["mesh_size"], "min_elements": min_elements},
+                            cheapest_elements=cheapest["elements"])
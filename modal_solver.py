@@ -0,0 +1,307 @@
+import math
+
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+from mode_identification import classify_modes, modal_solver_shapes
+from transducer_design import TransducerDesign
+from transducer_geometry import TransducerGeometry
+from transducer_mesh import AssemblyMesh
+
+_GAUSS_POINTS = [(-1. / math.sqrt(3.), -1. / math.sqrt(3.)), (1. / math.sqrt(3.), -1. / math.sqrt(3.)),
+                 (1. / math.sqrt(3.), 1. / math.sqrt(3.)), (-1. / math.sqrt(3.), 1. / math.sqrt(3.))]
+
+
+def _material_columns(materials, key):
+    return np.array([material[key] for material in materials], dtype=float)
+
+
+# this method integrates the stiffness and the consistent mass matrices of full integration CAX4 elements
+# results:
+# two instances of @numpy.ndarray of shape (elements, 8, 8), degrees of freedom ordered u1, u2 per node
+def element_matrices(coordinates, elastic_module, poisson_ratio, density):
+    count = len(coordinates)
+    lame = elastic_module * poisson_ratio / ((1 + poisson_ratio) * (1 - 2 * poisson_ratio))
+    shear = elastic_module / (2 * (1 + poisson_ratio))
+    elasticity = np.zeros((count, 4, 4))
+    for i in range(3):
+        for j in range(3):
+            elasticity[:, i, j] = lame
+        elasticity[:, i, i] = lame + 2 * shear
+    elasticity[:, 3, 3] = shear
+    corners = np.array([(-1., -1.), (1., -1.), (1., 1.), (-1., 1.)])
+    stiffness = np.zeros((count, 8, 8))
+    mass = np.zeros((count, 8, 8))
+    for xi, eta in _GAUSS_POINTS:
+        shape = (1 + corners[:, 0] * xi) * (1 + corners[:, 1] * eta) / 4.
+        derivatives = np.array([corners[:, 0] * (1 + corners[:, 1] * eta) / 4.,
+                                corners[:, 1] * (1 + corners[:, 0] * xi) / 4.])
+        jacobian = np.einsum("ak,ekc->eac", derivatives, coordinates)
+        determinant = jacobian[:, 0, 0] * jacobian[:, 1, 1] - jacobian[:, 0, 1] * jacobian[:, 1, 0]
+        inverse = np.empty_like(jacobian)
+        inverse[:, 0, 0] = jacobian[:, 1, 1] / determinant
+        inverse[:, 0, 1] = -jacobian[:, 0, 1] / determinant
+        inverse[:, 1, 0] = -jacobian[:, 1, 0] / determinant
+        inverse[:, 1, 1] = jacobian[:, 0, 0] / determinant
+        gradient = np.einsum("eca,ak->eck", inverse, derivatives)
+        radius = coordinates[:, :, 0].dot(shape)
+        strain = np.zeros((count, 4, 8))
+        strain[:, 0, 0::2] = gradient[:, 0, :]
+        strain[:, 1, 1::2] = gradient[:, 1, :]
+        strain[:, 2, 0::2] = shape[np.newaxis, :] / radius[:, np.newaxis]
+        strain[:, 3, 0::2] = gradient[:, 1, :]
+        strain[:, 3, 1::2] = gradient[:, 0, :]
+        volume = 2 * np.pi * radius * determinant
+        stiffness += np.einsum("e,eji,ejk,ekl->eil", volume, strain, elasticity, strain)
+        nodal_mass = np.einsum("e,i,j->eij", density * volume, shape, shape)
+        mass[:, 0::2, 0::2] += nodal_mass
+        mass[:, 1::2, 1::2] += nodal_mass
+    return stiffness, mass
+
+
+# this method assembles the sparse stiffness and mass matrices of a mesh
+def assemble(mesh):
+    return assemble_matrices(mesh.nodes, mesh.elements, mesh.element_materials)
+
+
+# this method assembles the sparse stiffness and mass matrices of elements with one property table each
+def assemble_matrices(nodes, elements, element_materials):
+    stiffness, mass = element_matrices(nodes[elements],
+                                       _material_columns(element_materials, "elastic_module"),
+                                       _material_columns(element_materials, "poisson_ratio"),
+                                       _material_columns(element_materials, "density"))
+    dofs = np.empty((len(elements), 8), dtype=int)
+    dofs[:, 0::2] = 2 * elements
+    dofs[:, 1::2] = 2 * elements + 1
+    rows = np.repeat(dofs, 8, axis=1).ravel()
+    columns = np.tile(dofs, (1, 8)).ravel()
+    size = 2 * len(nodes)
+    return (scipy.sparse.coo_matrix((stiffness.ravel(), (rows, columns)), shape=(size, size)).tocsr(),
+            scipy.sparse.coo_matrix((mass.ravel(), (rows, columns)), shape=(size, size)).tocsr())
+
+
+# this method ties the slave nodes of every tie to the faces of its master surface, like *TIE with the default
+# position tolerance. slave nodes outside of the master surface are left free, and slave nodes merged with a master
+# node by a conforming mesh need no constraint. when the master surface has more faces than the slave surface, the
+# roles are swapped for the constraint, so the nodes of a finer master mesh cannot move between the slave nodes
+# results:
+# an instance of @dict of slave node to @list of (master node, weight)
+def tie_constraints(mesh, ties):
+    constraints = {}
+    for tie in ties:
+        master_instance, master_surface = tie.master_instance, tie.master_surface
+        slave_instance, slave_surface = tie.slave_instance, tie.slave_surface
+        if len(mesh.surface_nodes(master_instance, master_surface)) > len(
+                mesh.surface_nodes(slave_instance, slave_surface)):
+            master_instance, master_surface, slave_instance, slave_surface = (slave_instance, slave_surface,
+                                                                              master_instance, master_surface)
+        master = mesh.surface_nodes(master_instance, master_surface)
+        slave_nodes = np.setdiff1d(mesh.surface_nodes(slave_instance, slave_surface), master)
+        face = mesh.instance(master_instance).part.surfaces[master_surface][0]
+        normal_axis, tangent_axis = (1, 0) if face in ("S1", "S3") else (0, 1)
+        start = mesh.nodes[master[:, 0]]
+        end = mesh.nodes[master[:, 1]]
+        lower = np.minimum(start[:, tangent_axis], end[:, tangent_axis])
+        upper = np.maximum(start[:, tangent_axis], end[:, tangent_axis])
+        tolerance = 0.05 * np.mean(upper - lower)
+        position = mesh.nodes[slave_nodes]
+        inside = (np.abs(position[:, normal_axis, np.newaxis] - start[np.newaxis, :, normal_axis]) <= tolerance) & (
+                position[:, tangent_axis, np.newaxis] >= lower[np.newaxis, :] - 1e-9) & (
+                         position[:, tangent_axis, np.newaxis] <= upper[np.newaxis, :] + 1e-9)
+        for slave, segments in zip(slave_nodes, inside):
+            if slave in constraints or not segments.any():
+                continue
+            segment = np.nonzero(segments)[0][0]
+            weight = (mesh.nodes[slave, tangent_axis] - start[segment, tangent_axis]) / (
+                    end[segment, tangent_axis] - start[segment, tangent_axis])
+            constraints[slave] = [(master[segment, 0], 1. - weight), (master[segment, 1], weight)]
+    for slave in constraints:
+        resolved = constraints[slave]
+        for depth in range(len(constraints)):
+            if not any([node in constraints for node, weight in resolved]):
+                break
+            expanded = []
+            for node, weight in resolved:
+                if node in constraints and node != slave:
+                    expanded += [(master_node, weight * master_weight)
+                                 for master_node, master_weight in constraints[node]]
+                elif node != slave:
+                    expanded.append((node, weight))
+            resolved = expanded
+        constraints[slave] = resolved
+    return constraints
+
+
+# this method builds the matrix that maps the independent degrees of freedom to all of them
+def constraint_matrix(node_count, constraints):
+    independent = np.array([node for node in range(node_count) if node not in constraints], dtype=int)
+    numbers = -np.ones(node_count, dtype=int)
+    numbers[independent] = np.arange(len(independent))
+    rows = []
+    columns = []
+    values = []
+    for node in independent:
+        rows.append(node)
+        columns.append(numbers[node])
+        values.append(1.)
+    for slave, masters in constraints.items():
+        for master, weight in masters:
+            rows.append(slave)
+            columns.append(numbers[master])
+            values.append(weight)
+    rows = np.array(rows, dtype=int)
+    columns = np.array(columns, dtype=int)
+    values = np.array(values, dtype=float)
+    size = (2 * node_count, 2 * len(independent))
+    return scipy.sparse.coo_matrix((np.concatenate([values, values]),
+                                    (np.concatenate([2 * rows, 2 * rows + 1]),
+                                     np.concatenate([2 * columns, 2 * columns + 1]))), shape=size).tocsr()
+
+
+# this method solves the generalized eigenproblem with shift-invert lanczos for every mode below @max_frequency
+# results:
+# the eigenfrequencies in Hz and the mode shapes, one column per mode, normalized to a largest displacement of 1
+def solve_modes(stiffness, mass, max_frequency=30000., initial_modes=20):
+    size = stiffness.shape[0]
+    shift = -(2 * np.pi * max_frequency / 1000.) ** 2
+    modes = min(initial_modes, size - 2)
+    while True:
+        eigenvalues, vectors = scipy.sparse.linalg.eigsh(stiffness, k=modes, M=mass, sigma=shift, which="LM")
+        order = np.argsort(eigenvalues)
+        eigenvalues, vectors = eigenvalues[order], vectors[:, order]
+        frequencies = np.sqrt(np.maximum(eigenvalues, 0.)) / (2 * np.pi)
+        if frequencies[-1] > max_frequency or modes >= size - 2:
+            break
+        modes = min(2 * modes, size - 2)
+    selected = frequencies <= max_frequency
+    return frequencies[selected], vectors[:, selected]
+
+
+def normalize_shapes(shapes):
+    largest = np.argmax(np.abs(shapes), axis=0)
+    return shapes / shapes[largest, np.arange(shapes.shape[1])]
+
+
+# this method reads U2 of a mode along a radius, one value per height, like the xy data of @ModelTransducer
+# input parameters:
+# @param nodes : an instance of @numpy.ndarray of shape (nodes, 2)
+# @param mode_shapes : an instance of @numpy.ndarray of the displacements, one column per mode
+# @param radius : an instance of @float . the radius of the path
+# @param frame : an instance of @int . the frame of the frequency step, the first mode is frame 1
+# results:
+# an instance of @tuple of (y, U2) ordered by y
+def path_data(nodes, mode_shapes, radius, frame=2):
+    on_path = np.nonzero(np.abs(nodes[:, 0] - radius) < 1e-6 * radius)[0]
+    on_path = on_path[np.argsort(nodes[on_path, 1], kind="mergesort")]
+    heights = nodes[on_path, 1]
+    keep = np.concatenate([[True], np.diff(heights) > 1e-9])
+    values = mode_shapes[2 * on_path + 1, frame - 1]
+    return tuple([(float(y), float(u)) for y, u in zip(heights[keep], values[keep])])
+
+
+# this class is the built-in backend of the modal analysis of @ModelTransducer . it meshes the same stacked geometry
+# with CAX4 elements, ties the parts like the abaqus model and solves the free vibration without abaqus
+# input parameters: the arguments of @ModelTransducer with the materials as property tables, and
+# @param mesh_size : the element size, or per part and per cell sizes as accepted by @AssemblyMesh
+# @param max_frequency : an instance of @int or @float . the maxEigen of the frequency step in Hz
+# @param conforming : an instance of @bool . merge the coincident nodes of the tied surfaces instead of tying them
+# @param min_elements : an instance of @int . the smallest number of elements through every region, see @mesh_part
+# @param merged_stack : an instance of @bool . mesh the rings and the electrodes as one part, see @stack_geometry
+class AxisymmetricTransducer:
+    __count = 0
+
+    def __init__(self, length_of_matching, length_of_backing, number_of_piezoelectrics=2,
+                 piezoelectric_outer_diameter=45, piezoelectric_inner_diameter=15, piezoelectric_thickness=5,
+                 thickness_of_electrode=0.3, material_of_piezoelectric=None, material_of_electrode=None,
+                 material_of_screw=None, material_of_matching=None, material_of_backing=None, mesh_size=1,
+                 max_frequency=30000., conforming=False, min_elements=1, merged_stack=False):
+        AxisymmetricTransducer.__count += 1
+        self.__model_key = "Transducer" + "_" + str(AxisymmetricTransducer.__count)
+        self.__design = TransducerDesign(length_of_matching=length_of_matching, length_of_backing=length_of_backing,
+                                         number_of_piezoelectrics=number_of_piezoelectrics,
+                                         piezoelectric_outer_diameter=piezoelectric_outer_diameter,
+                                         piezoelectric_inner_diameter=piezoelectric_inner_diameter,
+                                         piezoelectric_thickness=piezoelectric_thickness,
+                                         thickness_of_electrode=thickness_of_electrode,
+                                         material_of_piezoelectric=material_of_piezoelectric,
+                                         material_of_electrode=material_of_electrode,
+                                         material_of_screw=material_of_screw,
+                                         material_of_matching=material_of_matching,
+                                         material_of_backing=material_of_backing)
+        self.__geometry = TransducerGeometry(self.design, merged_stack=merged_stack)
+        self.__mesh_size = mesh_size
+        self.__max_frequency = max_frequency
+        self.__mesh = AssemblyMesh(self.geometry, mesh_size, conforming=conforming, min_elements=min_elements)
+        stiffness, mass = assemble(self.mesh)
+        self.__constraints = tie_constraints(self.mesh, self.geometry.ties)
+        transformation = constraint_matrix(len(self.mesh.nodes), self.constraints)
+        frequencies, reduced_shapes = solve_modes((transformation.T * stiffness * transformation).tocsc(),
+                                                  (transformation.T * mass * transformation).tocsc(),
+                                                  max_frequency=max_frequency)
+        self.__eigenfrequencies = frequencies
+        self.__mode_shapes = normalize_shapes(transformation * reduced_shapes)
+
+    @property
+    def model_key(self):
+        return self.__model_key
+
+    @property
+    def design(self):
+        return self.__design
+
+    @property
+    def geometry(self):
+        return self.__geometry
+
+    @property
+    def mesh_size(self):
+        return self.__mesh_size
+
+    @property
+    def max_frequency(self):
+        return self.__max_frequency
+
+    @property
+    def mesh(self):
+        return self.__mesh
+
+    @property
+    def constraints(self):
+        return self.__constraints
+
+    @property
+    def eigenfrequencies(self):
+        return self.__eigenfrequencies
+
+    # the displacements of every mode, one column per mode, u1 and u2 of every node of @mesh in turn
+    @property
+    def mode_shapes(self):
+        return self.__mode_shapes
+
+    # this method reads U2 of a mode along the outer radius of the stack, like the xy data of @ModelTransducer
+    # input parameters:
+    # @param frame : an instance of @int . the frame of the frequency step, the first mode is frame 1
+    # results:
+    # an instance of @tuple of (y, U2) ordered by y
+    def path_data(self, frame=2):
+        return path_data(self.mesh.nodes, self.mode_shapes, self.design.piezoelectric_outer_diameter / 2., frame)
+
+    # this method classifies every mode, see @mode_identification.classify_modes
+    # results:
+    # an instance of @ModeClassification
+    def classify_modes(self, **thresholds):
+        return classify_modes(self.eigenfrequencies, modal_solver_shapes(self), self.mesh.nodes, design=self.design,
+                              **thresholds)
+
+    # input parameters:
+    # @param frame : an instance of @int . the frame of the path data, None picks the longitudinal mode
+    # results:
+    # an instance of @dict with @model_key, @job_key, @eigenfrequencies, @frame and @path_data like
+    # @ModelTransducer.extract_results . @path_data is empty when no mode is longitudinal
+    def extract_results(self, frame=2):
+        if frame is None:
+            frame = self.classify_modes().frame
+        return {"model_key": self.model_key, "job_key": "Job_" + self.model_key,
+                "eigenfrequencies": tuple([float(i) for i in self.eigenfrequencies]), "frame": frame,
+                "path_data": self.path_data(frame=frame) if frame is not None else ()}
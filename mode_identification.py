@@ -0,0 +1,203 @@
+import numpy as np
+
+from transfer_matrix import longitudinal_mode_shape, longitudinal_resonances
+
+# every function works on the mode shapes of all frames at once, as an array of shape (modes, nodes, 2) of U1 and U2,
+# like @OdbResults.field("U") , with the (r, y) coordinates of the nodes. the first mode is frame 1
+
+
+# this method reshapes the mode shapes of @AxisymmetricTransducer to (modes, nodes, 2)
+def modal_solver_shapes(transducer):
+    shapes = np.asarray(transducer.mode_shapes)
+    return shapes.T.reshape(shapes.shape[1], -1, 2)
+
+
+def _weights(coordinates, weights):
+    if weights is None:
+        return np.asarray(coordinates, dtype=float)[:, 0]
+    return np.asarray(weights, dtype=float)
+
+
+# this method finds the part of the kinetic energy of every mode that moves along the axis
+# input parameters:
+# @param shapes : an instance of @numpy.ndarray of shape (modes, nodes, 2)
+# @param coordinates : an instance of @numpy.ndarray of shape (nodes, 2)
+# @param weights : an instance of @numpy.ndarray of the mass of every node, the radius by default, which is the
+# weight of a node of a uniform axisymmetric mesh
+# results:
+# an instance of @numpy.ndarray of the ratio of every mode, 1 for a pure axial mode and 0 for a pure radial one
+def axial_energy_ratio(shapes, coordinates, weights=None):
+    shapes = np.asarray(shapes, dtype=float)
+    weights = _weights(coordinates, weights)
+    axial = np.einsum("n,mn->m", weights, shapes[:, :, 1] ** 2)
+    total = np.einsum("n,mnc->m", weights, shapes ** 2)
+    return axial / np.where(total > 0, total, 1.)
+
+
+# this method gives the weighted modal assurance criterion of every mode against every reference shape
+# input parameters:
+# @param shapes : an instance of @numpy.ndarray of shape (modes, nodes, 2)
+# @param references : an instance of @numpy.ndarray of shape (references, nodes, 2) or (nodes, 2)
+# results:
+# an instance of @numpy.ndarray of shape (modes, references) , or (modes,) for one reference
+def modal_assurance_criterion(shapes, references, weights=None, coordinates=None):
+    shapes = np.asarray(shapes, dtype=float)
+    references = np.asarray(references, dtype=float)
+    single = references.ndim == 2
+    if single:
+        references = references[np.newaxis]
+    if weights is None:
+        weights = np.ones(shapes.shape[1]) if coordinates is None else _weights(coordinates, None)
+    weights = np.asarray(weights, dtype=float)
+    cross = np.einsum("n,mnc,rnc->mr", weights, shapes, references)
+    own = np.einsum("n,mnc->m", weights, shapes ** 2)
+    reference_own = np.einsum("n,rnc->r", weights, references ** 2)
+    mac = cross ** 2 / np.maximum(np.outer(own, reference_own), 1e-300)
+    if single:
+        return mac[:, 0]
+    return mac
+
+
+# this method builds the reference longitudinal shape at the nodes: the axial displacement of the first resonance of
+# the one dimensional model of a design, or the half wave cos(pi y / L) of a uniform bar without a design
+# input parameters:
+# @param coordinates : an instance of @numpy.ndarray of shape (nodes, 2)
+# @param design : an instance of @TransducerDesign
+# results:
+# an instance of @numpy.ndarray of shape (nodes, 2)
+def reference_longitudinal_shape(coordinates, design=None):
+    coordinates = np.asarray(coordinates, dtype=float)
+    heights = coordinates[:, 1]
+    reference = np.zeros(coordinates.shape)
+    if design is not None:
+        resonances = longitudinal_resonances(design)[0]
+        resonances = resonances[~np.isnan(resonances)]
+        if len(resonances):
+            samples = np.linspace(heights.min(), heights.max(), 512)
+            reference[:, 1] = np.interp(heights, samples, longitudinal_mode_shape(design, resonances[0], samples))
+            return reference
+    length = heights.max() - heights.min()
+    reference[:, 1] = np.cos(np.pi * (heights - heights.min()) / length)
+    return reference
+
+
+class ModeClassification:
+
+    def __init__(self, frequencies, axial_ratio, mac, longitudinal):
+        self.__frequencies = frequencies
+        self.__axial_ratio = axial_ratio
+        self.__mac = mac
+        self.__longitudinal = longitudinal
+
+    @property
+    def frequencies(self):
+        return self.__frequencies
+
+    @property
+    def axial_ratio(self):
+        return self.__axial_ratio
+
+    # the modal assurance criterion of every mode against the reference longitudinal shape
+    @property
+    def mac(self):
+        return self.__mac
+
+    # an instance of @numpy.ndarray of @bool . the modes that pass both thresholds
+    @property
+    def longitudinal(self):
+        return self.__longitudinal
+
+    # the frame of the longitudinal mode that looks most like the reference, None when no mode passes
+    @property
+    def frame(self):
+        if not self.longitudinal.any():
+            return None
+        return int(np.argmax(np.where(self.longitudinal, self.mac, -1.))) + 1
+
+    @property
+    def frequency(self):
+        if self.frame is None:
+            return None
+        return float(self.frequencies[self.frame - 1])
+
+
+# this method classifies every mode of one result
+# input parameters:
+# @param frequencies : the frequency of every mode in Hz
+# @param shapes : an instance of @numpy.ndarray of shape (modes, nodes, 2)
+# @param coordinates : an instance of @numpy.ndarray of shape (nodes, 2)
+# @param design : an instance of @TransducerDesign . gives the reference shape of @reference_longitudinal_shape
+# @param axial_threshold, mac_threshold : the smallest axial energy ratio and mac of a longitudinal mode
+# @param min_frequency : modes below it are rigid body modes and never longitudinal
+# results:
+# an instance of @ModeClassification
+def classify_modes(frequencies, shapes, coordinates, design=None, weights=None, axial_threshold=0.7,
+                   mac_threshold=0.7, min_frequency=1.):
+    frequencies = np.asarray(frequencies, dtype=float)
+    axial_ratio = axial_energy_ratio(shapes, coordinates, weights)
+    mac = modal_assurance_criterion(shapes, reference_longitudinal_shape(coordinates, design),
+                                    weights=_weights(coordinates, weights))
+    elastic = frequencies > min_frequency
+    mac = np.where(elastic, mac, 0.)
+    return ModeClassification(frequencies=frequencies, axial_ratio=axial_ratio, mac=mac,
+                              longitudinal=elastic & (axial_ratio >= axial_threshold) & (mac >= mac_threshold))
+
+
+# this method samples every mode along the outer radius at @samples heights scaled by the length of the stack, so
+# modes of designs with other meshes and lengths can be compared
+# results:
+# an instance of @numpy.ndarray of shape (modes, samples, 2)
+def path_signature(shapes, coordinates, samples=64, radius=None):
+    shapes = np.asarray(shapes, dtype=float)
+    coordinates = np.asarray(coordinates, dtype=float)
+    if radius is None:
+        radius = coordinates[:, 0].max()
+    on_path = np.nonzero(np.abs(coordinates[:, 0] - radius) <= 1e-6 * max(1., abs(radius)))[0]
+    on_path = on_path[np.argsort(coordinates[on_path, 1], kind="mergesort")]
+    heights = coordinates[on_path, 1]
+    heights = (heights - heights.min()) / (heights.max() - heights.min())
+    grid = np.linspace(0., 1., samples)
+    signature = np.zeros((shapes.shape[0], samples, 2))
+    for component in range(2):
+        values = shapes[:, on_path, component]
+        index = np.clip(np.searchsorted(heights, grid, side="right") - 1, 0, len(heights) - 2)
+        span = np.maximum(heights[index + 1] - heights[index], 1e-12)
+        fraction = np.clip((grid - heights[index]) / span, 0., 1.)
+        signature[:, :, component] = values[:, index] * (1 - fraction) + values[:, index + 1] * fraction
+    return signature
+
+
+# this class follows one mode through a sweep. every new result is matched to the mode of the previous one with the
+# largest mac between their @path_signature , so the longitudinal mode keeps its identity when other modes cross it
+# input parameters:
+# @param samples : an instance of @int . the length of the signatures
+# @param min_mac : an instance of @float . a match below it is replaced by the classification of the new result
+class ModeTracker:
+
+    def __init__(self, samples=64, min_mac=0.6):
+        self.__samples = samples
+        self.__min_mac = min_mac
+        self.__signature = None
+        self.__frames = []
+
+    # the tracked frame of every result so far
+    @property
+    def frames(self):
+        return list(self.__frames)
+
+    # input parameters: the arguments of @classify_modes
+    # results:
+    # the frame of the tracked mode in this result, None when it is not found
+    def update(self, frequencies, shapes, coordinates, design=None, weights=None):
+        classification = classify_modes(frequencies, shapes, coordinates, design=design, weights=weights)
+        signatures = path_signature(shapes, coordinates, samples=self.__samples)
+        frame = classification.frame
+        if self.__signature is not None:
+            mac = np.where(classification.frequencies > 1.,
+                           modal_assurance_criterion(signatures, self.__signature), 0.)
+            if mac.max() >= self.__min_mac:
+                frame = int(np.argmax(mac)) + 1
+        if frame is not None:
+            self.__signature = signatures[frame - 1]
+        self.__frames.append(frame)
+        return frame
@@ -0,0 +1,211 @@
+import math
+
+import numpy as np
+
+from surrogate import design_targets
+from transducer_design import TransducerDesign
+from transducer_geometry import TransducerGeometry
+from transducer_mesh import AssemblyMesh
+
+# the arguments of @TransducerDesign , the other arguments of a design only change the solve
+_DESIGN_KEYS = ("length_of_matching", "length_of_backing", "number_of_piezoelectrics", "piezoelectric_outer_diameter",
+                "piezoelectric_inner_diameter", "piezoelectric_thickness", "thickness_of_electrode")
+
+
+# this method counts the elements of a design at a mesh size with the mesher of @transducer_mesh , which seeds the
+# instances like @ModelTransducer.mesh
+# results:
+# an instance of @int
+def element_count(design, mesh_size):
+    geometry = TransducerGeometry(TransducerDesign(**dict([(key, value) for key, value in design.items()
+                                                           if key in _DESIGN_KEYS])),
+                                  merged_stack=design.get("merged_stack", False))
+    return int(len(AssemblyMesh(geometry, mesh_size, min_elements=design.get("min_elements", 1)).elements))
+
+
+# this method gives the objective of @multi_fidelity_sweep that ranks designs by the distance of their longitudinal
+# mode from a target frequency
+# input parameters:
+# @param target_frequency : an instance of @int or @float . in Hz
+# @param gain_weight : an instance of @int or @float . a larger amplitude gain lowers the objective by
+# @gain_weight times its logarithm
+# results:
+# a callable of the results of a run, the relative frequency error, infinite for results without a longitudinal mode
+def frequency_objective(target_frequency, gain_weight=0.):
+    def objective(results):
+        targets = design_targets(results) if results is not None else None
+        if targets is None:
+            return float("inf")
+        return (abs(targets["frequency"] - target_frequency) / float(target_frequency) -
+                gain_weight * math.log(max(targets["gain"], 1e-12)))
+
+    return objective
+
+
+# this method gives the runner of @multi_fidelity_sweep that solves with @AxisymmetricTransducer
+# input parameters:
+# @param options : other arguments of @AxisymmetricTransducer , like @max_frequency
+def modal_solver_runner(**options):
+    from modal_solver import AxisymmetricTransducer
+
+    def run(designs):
+        results = []
+        for design in designs:
+            arguments = dict(options)
+            arguments.update(design)
+            results.append(AxisymmetricTransducer(**arguments).extract_results(frame=None))
+        return results
+
+    return run
+
+
+# this method gives the runner of @multi_fidelity_sweep that solves with @ModelTransducer through a
+# @TransducerPipeline , and through a @ResultCache when given, like @run_transducers_concurrently
+# input parameters:
+# @param frame : the frame of @ModelTransducer.extract_results , None picks the longitudinal mode
+# @param options : the arguments of @JobScheduler
+def transducer_runner(cache=None, frame=None, **options):
+    from automated_transducer_disigner import TransducerPipeline
+    from job_scheduler import JobScheduler
+    from result_cache import canonical_parameters, parameters_key
+
+    solver_settings = {"path_frame": frame}
+
+    def run(designs):
+        results = [None] * len(designs)
+        missing = []
+        for index, design in enumerate(designs):
+            entry = None
+            if cache is not None:
+                entry = cache.get(parameters_key(canonical_parameters(design, solver_settings)))
+            if entry is None:
+                missing.append(index)
+            else:
+                results[index] = entry["result"]
+        pipeline = TransducerPipeline([dict(designs[index]) for index in missing], scheduler=JobScheduler(**options),
+                                      frame=frame, release=True)
+        positions = dict([(id(design), index) for design, index in zip(pipeline.designs, missing)])
+        for design, transducer, result in pipeline.iter_results():
+            index = positions[id(design)]
+            results[index] = result
+            if cache is not None and result is not None:
+                parameters = canonical_parameters(designs[index], solver_settings)
+                cache.put(parameters_key(parameters), parameters, result)
+        return results
+
+    return run
+
+
+class SweepResult:
+
+    def __init__(self, designs, coarse, fine, refined, coarse_mesh_size, fine_mesh_size, element_solves):
+        self.__designs = designs
+        self.__coarse = coarse
+        self.__fine = fine
+        self.__refined = refined
+        self.__coarse_mesh_size = coarse_mesh_size
+        self.__fine_mesh_size = fine_mesh_size
+        self.__element_solves = element_solves
+
+    @property
+    def designs(self):
+        return self.__designs
+
+    # an instance of @list of (results, objective) of every design at the coarse mesh size, in order of @designs
+    @property
+    def coarse(self):
+        return self.__coarse
+
+    # an instance of @dict of the index of a refined design to its (results, objective) at the fine mesh size
+    @property
+    def fine(self):
+        return self.__fine
+
+    # the indices of the refined designs, best coarse objective first
+    @property
+    def refined(self):
+        return self.__refined
+
+    @property
+    def coarse_mesh_size(self):
+        return self.__coarse_mesh_size
+
+    @property
+    def fine_mesh_size(self):
+        return self.__fine_mesh_size
+
+    # an instance of @dict with the elements of the @coarse and @fine solves, and of @all_fine , the cost of solving
+    # every design at the fine mesh size
+    @property
+    def element_solves(self):
+        return self.__element_solves
+
+    # the ratio of the elements of a plain fine sweep to the elements of this sweep
+    @property
+    def savings(self):
+        return self.element_solves["all_fine"] / float(max(1, self.element_solves["coarse"] +
+                                                            self.element_solves["fine"]))
+
+    # results:
+    # an instance of @tuple of (index, design, fine results, fine objective) of the best refined design
+    @property
+    def best(self):
+        index = min(self.refined, key=lambda i: self.fine[i][1])
+        return index, self.designs[index], self.fine[index][0], self.fine[index][1]
+
+    # this method compares the coarse and the fine runs of the refined designs
+    # results:
+    # an instance of @dict with the largest and the mean relative error of the frequency and of the gain, the largest
+    # error of the objective, and @rank_agreement , the fraction of the refined designs whose fine rank is within one
+    # of their coarse rank
+    def errors(self):
+        pairs = []
+        for index in self.refined:
+            coarse_targets = design_targets(self.coarse[index][0]) if self.coarse[index][0] is not None else None
+            fine_targets = design_targets(self.fine[index][0]) if self.fine[index][0] is not None else None
+            if coarse_targets is not None and fine_targets is not None:
+                pairs.append((index, coarse_targets, fine_targets))
+        if not pairs:
+            return {}
+        frequency = np.array([abs(coarse["frequency"] - fine["frequency"]) / fine["frequency"]
+                              for index, coarse, fine in pairs])
+        gain = np.array([abs(coarse["gain"] - fine["gain"]) / fine["gain"] for index, coarse, fine in pairs])
+        objective = np.array([abs(self.coarse[index][1] - self.fine[index][1]) for index, coarse, fine in pairs])
+        fine_order = sorted(self.refined, key=lambda i: self.fine[i][1])
+        agreement = np.mean([abs(rank - fine_order.index(index)) <= 1 for rank, index in enumerate(self.refined)])
+        return {"max_frequency_error": float(frequency.max()), "mean_frequency_error": float(frequency.mean()),
+                "max_gain_error": float(gain.max()), "mean_gain_error": float(gain.mean()),
+                "max_objective_error": float(objective.max()), "rank_agreement": float(agreement),
+                "compared": len(pairs)}
+
+
+# this method sweeps designs in two fidelities. every design is solved at @coarse_mesh_size and ranked by
+# @objective , then only the best @fraction of them is solved again at @fine_mesh_size , and the coarse error is
+# measured on them
+# input parameters:
+# @param designs : an instance of @list of @dict of the arguments of @ModelTransducer , without @mesh_size
+# @param objective : a callable of the results of a run, lower is better, like @frequency_objective
+# @param run : a callable of a @list of designs that returns their results in the same order, like
+# @modal_solver_runner and @transducer_runner . solves with @ModelTransducer by default
+# @param fraction : an instance of @float . the part of the designs that is refined
+# @param min_refined : an instance of @int . the smallest number of refined designs
+# results:
+# an instance of @SweepResult
+def multi_fidelity_sweep(designs, objective, run=None, coarse_mesh_size=4., fine_mesh_size=1., fraction=0.1,
+                         min_refined=1):
+    if run is None:
+        run = transducer_runner()
+    designs = [dict(design) for design in designs]
+    coarse_results = run([dict(design, mesh_size=coarse_mesh_size) for design in designs])
+    coarse = [(results, objective(results) if results is not None else float("inf")) for results in coarse_results]
+    order = sorted(range(len(designs)), key=lambda i: coarse[i][1])
+    count = min(len(designs), max(min_refined, int(math.ceil(fraction * len(designs)))))
+    refined = [index for index in order[:count] if not math.isinf(coarse[index][1])]
+    fine_results = run([dict(designs[index], mesh_size=fine_mesh_size) for index in refined])
+    fine = dict([(index, (results, objective(results) if results is not None else float("inf")))
+                 for index, results in zip(refined, fine_results)])
+    fine_elements = [element_count(design, fine_mesh_size) for design in designs]
+    element_solves = {"coarse": sum([element_count(design, coarse_mesh_size) for design in designs]),
+                      "fine": sum([fine_elements[index] for index in refined]), "all_fine": sum(fine_elements)}
+    return SweepResult(designs=designs, coarse=coarse, fine=fine, refined=refined, coarse_mesh_size=coarse_mesh_size,
+                       fine_mesh_size=fine_mesh_size, element_solves=element_solves)
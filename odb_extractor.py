@@ -0,0 +1,216 @@
+import json
+import os
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from mode_identification import classify_modes
+
+# the components of the fields of an axisymmetric model with CAX4R elements
+FIELD_COMPONENTS = {"U": ("U1", "U2"), "S": ("S11", "S22", "S33", "S12")}
+
+METADATA_FILE = "metadata.json"
+
+# every field is stored as one .npy file of shape (frames, values, components) in the precision of the odb, next to
+# the labels of its nodes (or elements and integration points) and the index of their instance in the metadata. the
+# frames are written one by one into memory mapped files, so only one frame of one field is in memory at a time, and
+# the files are read back with numpy.load(mmap_mode="r") without copying and without abaqus
+
+
+def _open_odb(odb):
+    if not hasattr(odb, "steps"):
+        from odbAccess import openOdb
+        return openOdb(path=odb, readOnly=True), True
+    return odb, False
+
+
+def _block_layout(blocks, instances):
+    labels = []
+    instance_indices = []
+    points = []
+    for block in blocks:
+        instance_name = block.instance.name if block.instance is not None else ""
+        if instance_name not in instances:
+            instances.append(instance_name)
+        if block.nodeLabels is not None and len(block.nodeLabels):
+            labels.append(np.asarray(block.nodeLabels, dtype=np.int32))
+        else:
+            labels.append(np.asarray(block.elementLabels, dtype=np.int32))
+            points.append(np.asarray(block.integrationPoints, dtype=np.int32))
+        instance_indices.append(np.full(len(labels[-1]), instances.index(instance_name), dtype=np.int16))
+    layout = {"labels": np.concatenate(labels), "instances": np.concatenate(instance_indices)}
+    if points:
+        layout["integration_points"] = np.concatenate(points)
+    return layout
+
+
+def _node_coordinates(odb, instances, labels, instance_indices):
+    coordinates = np.zeros((len(labels), 2), dtype=np.float64)
+    for index, instance_name in enumerate(instances):
+        selected = np.nonzero(instance_indices == index)[0]
+        if not len(selected):
+            continue
+        nodes = odb.rootAssembly.instances[instance_name].nodes
+        node_labels = np.array([node.label for node in nodes], dtype=np.int32)
+        node_coordinates = np.array([tuple(node.coordinates)[:2] for node in nodes], dtype=np.float64)
+        order = np.argsort(node_labels)
+        coordinates[selected] = node_coordinates[order[np.searchsorted(node_labels[order], labels[selected])]]
+    return coordinates
+
+
+# this method streams the eigenvalues and the fields of every frame of a frequency step into a directory of .npy
+# files, frame by frame
+# input parameters:
+# @param odb : an instance of @Odb , or the path of the odb file that is opened read only and closed at the end
+# @param directory : an instance of @str . the directory of the files, created if needed
+# @param step_key : an instance of @str . the frequency step, the last step by default
+# @param fields : an instance of @tuple of the keys of @FIELD_COMPONENTS to store
+# @param first_frame : an instance of @int . the first frame to store, 1 skips the base state frame
+# results:
+# an instance of @dict . the metadata written to @METADATA_FILE
+def extract_odb(odb, directory, step_key=None, fields=("U",), first_frame=1):
+    odb, opened = _open_odb(odb)
+    try:
+        if step_key is None:
+            step_key = list(odb.steps.keys())[-1]
+        frames = odb.steps[step_key].frames
+        count = max(0, len(frames) - first_frame)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        frequencies = np.zeros(count, dtype=np.float64)
+        modes = np.zeros(count, dtype=np.int32)
+        instances = []
+        layouts = {}
+        values = {}
+        for index in range(count):
+            frame = frames[first_frame + index]
+            frequencies[index] = frame.frequency
+            modes[index] = frame.mode
+            for field_key in fields:
+                blocks = frame.fieldOutputs[field_key].bulkDataBlocks
+                if field_key not in layouts:
+                    layouts[field_key] = _block_layout(blocks, instances)
+                    values[field_key] = open_memmap(
+                        os.path.join(directory, field_key + ".npy"), mode="w+", dtype=blocks[0].data.dtype,
+                        shape=(count, len(layouts[field_key]["labels"]), len(FIELD_COMPONENTS[field_key])))
+                start = 0
+                for block in blocks:
+                    data = block.data
+                    values[field_key][index, start:start + len(data)] = data
+                    start += len(data)
+                if start != values[field_key].shape[1]:
+                    raise ValueError("frame " + str(first_frame + index) + " of " + field_key +
+                                     " has another layout than the first frame")
+        for field_key in values:
+            values[field_key].flush()
+            for key, array in layouts[field_key].items():
+                np.save(os.path.join(directory, field_key + "_" + key + ".npy"), array)
+        if "U" in layouts:
+            np.save(os.path.join(directory, "U_coordinates.npy"),
+                    _node_coordinates(odb, instances, layouts["U"]["labels"], layouts["U"]["instances"]))
+        np.save(os.path.join(directory, "frequencies.npy"), frequencies)
+        np.save(os.path.join(directory, "modes.npy"), modes)
+        metadata = {"odb": getattr(odb, "path", ""), "step": step_key, "first_frame": first_frame,
+                    "frames": count, "instances": instances,
+                    "fields": dict([(field_key, {"components": list(FIELD_COMPONENTS[field_key]),
+                                                 "shape": list(values[field_key].shape),
+                                                 "dtype": str(values[field_key].dtype)})
+                                    for field_key in values])}
+        with open(os.path.join(directory, METADATA_FILE), "w") as metadata_file:
+            json.dump(metadata, metadata_file, indent=1, sort_keys=True)
+        for field_key in list(values.keys()):
+            del values[field_key]
+        return metadata
+    finally:
+        if opened:
+            odb.close()
+
+
+# this class reads a directory written by @extract_odb . every array is memory mapped on first use, so nothing is
+# read or copied until it is indexed
+# input parameters:
+# @param directory : an instance of @str . the directory written by @extract_odb
+# @param mmap_mode : an instance of @str . the mmap_mode of numpy.load
+class OdbResults:
+
+    def __init__(self, directory, mmap_mode="r"):
+        self.__directory = directory
+        self.__mmap_mode = mmap_mode
+        with open(os.path.join(directory, METADATA_FILE)) as metadata_file:
+            self.__metadata = json.load(metadata_file)
+        self.__arrays = {}
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    @property
+    def metadata(self):
+        return self.__metadata
+
+    def array(self, name):
+        if name not in self.__arrays:
+            self.__arrays[name] = np.load(os.path.join(self.directory, name + ".npy"), mmap_mode=self.__mmap_mode)
+        return self.__arrays[name]
+
+    # the frequencies of the stored frames in Hz
+    @property
+    def frequencies(self):
+        return self.array("frequencies")
+
+    @property
+    def eigenvalues(self):
+        return (2 * np.pi * self.frequencies) ** 2
+
+    @property
+    def modes(self):
+        return self.array("modes")
+
+    # input parameters:
+    # @param field_key : an instance of @str . a key of @FIELD_COMPONENTS
+    # results:
+    # an instance of @numpy.memmap of shape (frames, values, components)
+    def field(self, field_key):
+        return self.array(field_key)
+
+    def component(self, field_key, component, frame):
+        index = self.metadata["fields"][field_key]["components"].index(component)
+        return self.field(field_key)[frame - self.metadata["first_frame"], :, index]
+
+    # this method samples a displacement component along the axial line at @radius , like @XYDataFromPath with
+    # PATH_POINTS and Y_CORD labels, from the nodes that lie on the line. coincident nodes of tied instances give one
+    # point
+    # input parameters:
+    # @param frame : an instance of @int . the frame of the odb, 2 is the frame of @ModelTransducer.extract_results
+    # @param radius : an instance of @int or @float . the radius of the line, the largest radius by default
+    # @param component : an instance of @str . U1 or U2
+    # results:
+    # an instance of @tuple of (y, value) sorted by y
+    def path_data(self, frame=2, radius=None, component="U2", tolerance=1e-6):
+        coordinates = self.array("U_coordinates")
+        if radius is None:
+            radius = coordinates[:, 0].max()
+        selected = np.nonzero(np.abs(coordinates[:, 0] - radius) <= tolerance * max(1., abs(radius)))[0]
+        selected = selected[np.argsort(coordinates[selected, 1], kind="mergesort")]
+        heights = coordinates[selected, 1]
+        keep = np.concatenate([[True], np.diff(heights) > tolerance * max(1., abs(radius))])
+        values = self.component("U", component, frame)[selected]
+        return tuple([(float(y), float(value)) for y, value in zip(heights[keep], values[keep])])
+
+    # this method classifies every stored mode from U, see @mode_identification.classify_modes . the first stored
+    # frame is frame 1 of the classification
+    # input parameters:
+    # @param design : an instance of @TransducerDesign . gives the reference longitudinal shape
+    # results:
+    # an instance of @ModeClassification
+    def classify_modes(self, design=None, **thresholds):
+        return classify_modes(self.frequencies, self.field("U"), self.array("U_coordinates"), design=design,
+                              **thresholds)
+
+    # results:
+    # the frame of the odb of the longitudinal mode, for @path_data and @XYDataFromPath , or None
+    def longitudinal_frame(self, design=None, **thresholds):
+        frame = self.classify_modes(design=design, **thresholds).frame
+        if frame is None:
+            return None
+        return frame - 1 + self.metadata["first_frame"]
@@ -0,0 +1,220 @@
+import json
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# this method gives the peak resident memory of the process in bytes, None where the platform does not report it
+def peak_rss():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+
+
+def _cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+# this class is a sink that appends every event as one line of json to a file, so the events of many runs, and of
+# many processes, can be collected in one file and read back with @read_events
+class JsonLinesSink:
+
+    def __init__(self, file_name):
+        self.__file_name = os.path.abspath(file_name)
+
+    @property
+    def file_name(self):
+        return self.__file_name
+
+    def __call__(self, event):
+        with open(self.file_name, "a") as events:
+            events.write(json.dumps(event, sort_keys=True) + "\n")
+
+
+# this class is a sink that keeps the events in memory
+class ListSink:
+
+    def __init__(self):
+        self.__events = []
+
+    @property
+    def events(self):
+        return self.__events
+
+    def __call__(self, event):
+        self.__events.append(event)
+
+
+# this class is a sink that prints every event as one line of json, to the message area of abaqus cae by default
+class StreamSink:
+
+    def __init__(self, stream=None):
+        self.__stream = stream
+
+    def __call__(self, event):
+        stream = self.__stream if self.__stream is not None else sys.stdout
+        stream.write(json.dumps(event, sort_keys=True) + "\n")
+
+
+# this class measures one named stage. the wall time, the cpu time of the process and the peak resident memory are
+# recorded when the span ends, with every field given to it or to @record
+class Span:
+
+    def __init__(self, profiler, name, parent, fields):
+        self.__profiler = profiler
+        self.__name = name
+        self.__parent = parent
+        self.__fields = fields
+        self.__start = None
+        self.__cpu = None
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def fields(self):
+        return self.__fields
+
+    # this method adds fields to the event of the span, like the number of elements of a mesh
+    def record(self, **fields):
+        self.__fields.update(fields)
+        return self
+
+    def __enter__(self):
+        self.__profiler._enter(self)
+        self.__start = time.time()
+        self.__cpu = _cpu_time()
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        event = {"event": "span", "name": self.name, "parent": self.__parent, "start": self.__start,
+                 "wall": time.time() - self.__start, "cpu": _cpu_time() - self.__cpu, "peak_rss": peak_rss(),
+                 "error": None if error_type is None else error_type.__name__}
+        event.update(self.fields)
+        self.__profiler._exit(self)
+        self.__profiler.emit(event)
+        return False
+
+
+# this class sends the events of the spans of a run to its sinks. a sink is any callable of the @dict of an event,
+# like @JsonLinesSink , so the events can go to a file, a database or a message queue. a profiler without sinks
+# drops the events, so the spans of a run cost next to nothing until a sink is added
+# input parameters:
+# @param sinks : an instance of @list of callables
+# @param fields : an instance of @dict of fields added to every event, like the name of a sweep or of a host
+class Profiler:
+
+    def __init__(self, sinks=None, **fields):
+        self.__sinks = list(sinks or [])
+        self.__fields = fields
+        self.__open = []
+
+    @property
+    def sinks(self):
+        return self.__sinks
+
+    def add_sink(self, sink):
+        self.__sinks.append(sink)
+        return sink
+
+    def remove_sink(self, sink):
+        self.__sinks.remove(sink)
+
+    # this method opens a span, nested in the innermost open span of this profiler
+    # input parameters:
+    # @param name : an instance of @str . the stage, like "mesh"
+    # @param fields : the fields of its event, like the key of the model
+    # results:
+    # an instance of @Span to use in a with statement
+    def span(self, name, **fields):
+        return Span(self, name, self.__open[-1].name if self.__open else None, dict(fields))
+
+    # this method sends an event that is not measured by a span, like the end of a job that solves in another process
+    def event(self, name, **fields):
+        event = {"event": "event", "name": name, "start": time.time(),
+                 "parent": self.__open[-1].name if self.__open else None}
+        event.update(fields)
+        self.emit(event)
+
+    def emit(self, event):
+        if not self.__sinks:
+            return
+        for key, value in self.__fields.items():
+            event.setdefault(key, value)
+        for sink in self.__sinks:
+            sink(event)
+
+    def _enter(self, span):
+        self.__open.append(span)
+        _active.append(self)
+
+    def _exit(self, span):
+        self.__open.remove(span)
+        _active.remove(self)
+
+
+# the profiler of the spans that are not opened inside the span of another profiler
+PROFILER = Profiler()
+
+_active = []
+
+
+# this method opens a span in the profiler of the innermost open span, or in @PROFILER , so helpers like
+# @creat_section are measured by the profiler of the run that calls them
+def span(name, **fields):
+    return (_active[-1] if _active else PROFILER).span(name, **fields)
+
+
+# this method reads the events of a @JsonLinesSink , skipping lines cut by a process that was killed while writing
+def read_events(file_name):
+    events = []
+    with open(file_name) as lines:
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+def _percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * (len(values) - 1) + 0.5))]
+
+
+# this method aggregates the spans and the measured events, like the solve, of many runs by name
+# input parameters:
+# @param events : an instance of @list of events, like @read_events
+# @param key : the field of the measure, "wall" , "cpu" or "peak_rss"
+# results:
+# an instance of @dict of name to a @dict of @count , @total , @mean , @median , @p95 and @max
+def summarize(events, key="wall"):
+    values = {}
+    for event in events:
+        if event.get(key) is not None:
+            values.setdefault(event["name"], []).append(event[key])
+    return dict([(name, {"count": len(measures), "total": sum(measures),
+                         "mean": sum(measures) / float(len(measures)), "median": _percentile(measures, 0.5),
+                         "p95": _percentile(measures, 0.95), "max": max(measures)})
+                 for name, measures in values.items()])
+
+
+# this method finds the stages whose median grew by more than @tolerance between two summaries of @summarize
+# results:
+# an instance of @dict of name to the ratio of the medians
+def regressions(summary, baseline, tolerance=0.2, statistic="median"):
+    ratios = {}
+    for name, measures in summary.items():
+        if name in baseline and baseline[name][statistic] > 0:
+            ratio = measures[statistic] / float(baseline[name][statistic])
+            if ratio > 1. + tolerance:
+                ratios[name] = ratio
+    return ratios
@@ -0,0 +1,259 @@
+import numpy as np
+
+from transducer_design import TransducerDesign
+from transfer_matrix import longitudinal_mode_shape, longitudinal_resonances
+
+# the arguments of @ModelTransducer that are kept fixed while the lengths are tuned
+_FIXED_KEYS = ("number_of_piezoelectrics", "piezoelectric_outer_diameter", "piezoelectric_inner_diameter",
+               "piezoelectric_thickness", "thickness_of_electrode", "material_of_piezoelectric",
+               "material_of_electrode", "material_of_screw", "material_of_matching", "material_of_backing")
+
+
+# this method finds the heights where the axial displacement of a mode changes its sign
+# input parameters:
+# @param path_data : pairs of (height, displacement) sorted by height, like @ModelTransducer.extract_results
+# results:
+# an instance of @numpy.ndarray of the linearly interpolated heights of the nodal planes
+def nodal_planes(path_data):
+    path_data = np.asarray(path_data, dtype=float).reshape(-1, 2)
+    heights, values = path_data[:, 0], path_data[:, 1]
+    crossing = np.nonzero(np.sign(values[:-1]) * np.sign(values[1:]) < 0)[0]
+    exact = heights[values == 0]
+    interpolated = heights[crossing] - values[crossing] * (heights[crossing + 1] - heights[crossing]) / (
+            values[crossing + 1] - values[crossing])
+    return np.sort(np.concatenate([interpolated, exact]))
+
+
+def _nearest(values, target):
+    if not len(values):
+        return np.nan
+    return values[np.argmin(np.abs(values - target))]
+
+
+# this class is the built-in finite element evaluation of @tune_resonance with @AxisymmetricTransducer
+# input parameters: the arguments of @AxisymmetricTransducer except the two lengths
+# results of a call:
+# an instance of @list of (frequency, path data) of every mode
+class ModalSolverEvaluator:
+
+    def __init__(self, mesh_size=1, max_frequency=30000., **design_arguments):
+        self.__mesh_size = mesh_size
+        self.__max_frequency = max_frequency
+        self.__design_arguments = design_arguments
+
+    # the highest frequency of the modes in Hz, the maxEigen of the frequency step
+    @property
+    def max_frequency(self):
+        return self.__max_frequency
+
+    def __call__(self, length_of_matching, length_of_backing):
+        from modal_solver import AxisymmetricTransducer
+        transducer = AxisymmetricTransducer(length_of_matching=length_of_matching, length_of_backing=length_of_backing,
+                                            mesh_size=self.__mesh_size, max_frequency=self.__max_frequency,
+                                            **self.__design_arguments)
+        return [(frequency, transducer.path_data(frame=frame + 1))
+                for frame, frequency in enumerate(transducer.eigenfrequencies) if frequency > 1.]
+
+
+# this class is the abaqus evaluation of @tune_resonance with @ModelTransducer , through a @ResultCache when given.
+# only the mode of the path data of the results has a path, so it is the only candidate
+# input parameters: @cache and the arguments of @ModelTransducer except the two lengths
+class AbaqusEvaluator:
+
+    def __init__(self, cache=None, **design_arguments):
+        self.__cache = cache
+        self.__design_arguments = design_arguments
+
+    def __call__(self, length_of_matching, length_of_backing):
+        from automated_transducer_disigner import cached_transducer_results, transducer_results
+        arguments = dict(self.__design_arguments)
+        arguments.update(length_of_matching=length_of_matching, length_of_backing=length_of_backing)
+        if self.__cache is not None:
+            results = cached_transducer_results(self.__cache, **arguments)
+        else:
+            results = transducer_results(arguments)
+        return [(results["eigenfrequencies"][results.get("frame", 2) - 1], results["path_data"])]
+
+
+class TuningResult:
+
+    def __init__(self, length_of_matching, length_of_backing, frequency, nodal_plane, converged, solver_calls,
+                 history):
+        self.__length_of_matching = length_of_matching
+        self.__length_of_backing = length_of_backing
+        self.__frequency = frequency
+        self.__nodal_plane = nodal_plane
+        self.__converged = converged
+        self.__solver_calls = solver_calls
+        self.__history = history
+
+    @property
+    def length_of_matching(self):
+        return self.__length_of_matching
+
+    @property
+    def length_of_backing(self):
+        return self.__length_of_backing
+
+    @property
+    def frequency(self):
+        return self.__frequency
+
+    # the height of the nodal plane nearest to the flange, from the bottom of the matching
+    @property
+    def nodal_plane(self):
+        return self.__nodal_plane
+
+    @property
+    def converged(self):
+        return self.__converged
+
+    # the number of finite element solves, the surrogate evaluations are not counted
+    @property
+    def solver_calls(self):
+        return self.__solver_calls
+
+    # an instance of @list of (length of matching, length of backing, frequency, nodal plane) of every solve
+    @property
+    def history(self):
+        return self.__history
+
+    def __repr__(self):
+        return ("TuningResult(length_of_matching={0:.3f}, length_of_backing={1:.3f}, frequency={2:.1f}, "
+                "nodal_plane={3:.3f}, converged={4}, solver_calls={5})").format(
+            self.length_of_matching, self.length_of_backing, self.frequency, self.nodal_plane, self.converged,
+            self.solver_calls)
+
+
+class _Problem:
+
+    def __init__(self, target_frequency, flange_offset, fixed_backing, fixed):
+        self.target_frequency = float(target_frequency)
+        self.flange_offset = flange_offset
+        self.fixed_backing = float(fixed_backing)
+        self.fixed = fixed
+
+    def lengths(self, x):
+        if self.flange_offset is None:
+            return float(x[0]), self.fixed_backing
+        return float(x[0]), float(x[1])
+
+    def residual(self, x, frequency, nodal_plane):
+        residual = [(frequency - self.target_frequency) / self.target_frequency]
+        if self.flange_offset is not None:
+            residual.append((nodal_plane - (x[0] - self.flange_offset)) / x[0])
+        return np.array(residual)
+
+    def surrogate(self, x):
+        length_of_matching, length_of_backing = self.lengths(x)
+        design = TransducerDesign(length_of_matching=length_of_matching, length_of_backing=length_of_backing,
+                                  **self.fixed)
+        resonances = longitudinal_resonances(design, max_frequency=3 * self.target_frequency)[0]
+        resonances = resonances[~np.isnan(resonances)]
+        if not len(resonances):
+            return np.nan, np.nan
+        frequency = resonances[0]
+        heights = np.linspace(0., design.total_length, 600)
+        planes = nodal_planes(np.stack([heights, longitudinal_mode_shape(design, frequency, heights)], axis=1))
+        return frequency, _nearest(planes, length_of_matching - (self.flange_offset or 0.))
+
+
+def _jacobian(function, x, residual, step):
+    jacobian = np.zeros((len(residual), len(x)))
+    for i in range(len(x)):
+        shifted = np.array(x, dtype=float)
+        shifted[i] += step
+        jacobian[:, i] = (function(shifted) - residual) / step
+    return jacobian
+
+
+def _newton_step(jacobian, residual, x, max_step):
+    step = -np.linalg.lstsq(jacobian, residual, rcond=None)[0]
+    scale = max_step * np.max(np.abs(x)) / max(np.max(np.abs(step)), 1e-12)
+    return step * min(1., scale)
+
+
+# this method tunes the length of the matching and of the backing so the longitudinal mode lands on a target
+# frequency with its nodal plane at the flange. the one dimensional model of @transfer_matrix gives the starting
+# lengths and the first jacobian without any solve, then broyden updates of that jacobian drive the finite element
+# solves. every solve is memoized, so a length pair is never solved twice
+# input parameters:
+# @param target_frequency : an instance of @int or @float . the frequency of the longitudinal mode in Hz
+# @param flange_offset : an instance of @int or @float . the depth of the flange under the top of the matching. None
+# tunes the frequency only, with the length of the matching and a fixed @length_of_backing
+# @param evaluator : a callable of (length of matching, length of backing) that returns (frequency, path data) of
+# the candidate modes, @ModalSolverEvaluator by default
+# @param length_of_matching, length_of_backing : the starting lengths of the search on the one dimensional model
+# @param frequency_tolerance : an instance of @int or @float . the allowed error of the frequency in Hz
+# @param position_tolerance : an instance of @int or @float . the allowed error of the nodal plane in mm
+# @param max_solves : an instance of @int . the limit of finite element solves
+# @param design_arguments : the other arguments of @ModelTransducer , fixed during the search. the default evaluator
+# finds the modes up to @max_frequency , 1.5 times @target_frequency when not given
+# results:
+# an instance of @TuningResult
+def tune_resonance(target_frequency, flange_offset=0., evaluator=None, length_of_matching=None,
+                   length_of_backing=None, frequency_tolerance=10., position_tolerance=0.2, max_solves=8,
+                   max_step=0.25, **design_arguments):
+    fixed = dict([(key, value) for key, value in design_arguments.items() if key in _FIXED_KEYS])
+    if evaluator is None:
+        evaluator_arguments = dict(design_arguments)
+        evaluator_arguments.setdefault("max_frequency", 1.5 * target_frequency)
+        evaluator = ModalSolverEvaluator(**evaluator_arguments)
+    material = fixed.get("material_of_matching") or TransducerDesign(60, 40).material_of_matching
+    quarter_wave = np.sqrt(material["elastic_module"] / material["density"]) / (4. * target_frequency)
+    if length_of_matching is None:
+        length_of_matching = quarter_wave
+    if length_of_backing is None:
+        length_of_backing = quarter_wave / 2.
+    problem = _Problem(target_frequency, flange_offset, length_of_backing, fixed)
+    x = np.array([length_of_matching] if flange_offset is None else [length_of_matching, length_of_backing],
+                 dtype=float)
+
+    def surrogate_residual(point):
+        return problem.residual(point, *problem.surrogate(point))
+
+    residual = surrogate_residual(x)
+    for iteration in range(30):
+        jacobian = _jacobian(surrogate_residual, x, residual, 0.25)
+        x = x + _newton_step(jacobian, residual, x, max_step)
+        residual = surrogate_residual(x)
+        if np.all(np.abs(residual) < 1e-4):
+            break
+    jacobian = _jacobian(surrogate_residual, x, residual, 0.25)
+    prediction = problem.surrogate(x)[0]
+    solves = {}
+    history = []
+
+    def solve(point):
+        lengths = problem.lengths(np.round(point, 6))
+        if lengths not in solves:
+            candidates = evaluator(*lengths)
+            if not candidates:
+                raise ValueError("no mode of lengths " + str(lengths) + " is below the frequency cap of the evaluator, "
+                                 "max_frequency=" + str(getattr(evaluator, "max_frequency", None)) +
+                                 ", raise it above the target frequency of " + str(target_frequency) + " Hz")
+            frequency, path_data = min(candidates, key=lambda candidate: abs(candidate[0] - prediction))
+            nodal_plane = _nearest(nodal_planes(path_data), lengths[0] - (flange_offset or 0.))
+            solves[lengths] = (float(frequency), float(nodal_plane))
+            history.append(lengths + solves[lengths])
+        return solves[lengths]
+
+    frequency, nodal_plane = solve(x)
+    residual = problem.residual(x, frequency, nodal_plane)
+    converged = False
+    while True:
+        converged = abs(frequency - target_frequency) <= frequency_tolerance and (
+                flange_offset is None or abs(nodal_plane - (x[0] - flange_offset)) <= position_tolerance)
+        if converged or len(solves) >= max_solves:
+            break
+        step = _newton_step(jacobian, residual, x, max_step)
+        prediction = frequency + target_frequency * np.dot(jacobian[0], step)
+        frequency, nodal_plane = solve(x + step)
+        new_residual = problem.residual(x + step, frequency, nodal_plane)
+        jacobian += np.outer(new_residual - residual - np.dot(jacobian, step), step) / np.dot(step, step)
+        x = x + step
+        residual = new_residual
+    length_of_matching, length_of_backing = problem.lengths(x)
+    return TuningResult(length_of_matching=length_of_matching, length_of_backing=length_of_backing,
+                        frequency=frequency, nodal_plane=nodal_plane, converged=converged, solver_calls=len(solves),
+                        history=history)
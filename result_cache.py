@@ -0,0 +1,243 @@
+import errno
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+import transducer_design
+
+# the arguments of @ModelTransducer that change the results, with their default values
+DESIGN_DEFAULTS = {"number_of_piezoelectrics": 2, "piezoelectric_outer_diameter": 45, "piezoelectric_inner_diameter": 15,
+                   "piezoelectric_thickness": 5, "thickness_of_electrode": 0.3, "mesh_size": 1, "min_elements": 1,
+                   "merged_stack": False}
+
+# the standard material of every part, used when the material argument is None
+MATERIAL_DEFAULTS = {"material_of_piezoelectric": transducer_design.PZT4,
+                     "material_of_electrode": transducer_design.COPPER,
+                     "material_of_screw": transducer_design.SCREW_12_9,
+                     "material_of_matching": transducer_design.ALUMINIUM_6061_T6,
+                     "material_of_backing": transducer_design.ST37}
+
+# the settings of the frequency step and of the extraction. a change of any of them makes every old entry a miss
+SOLVER_SETTINGS = {"solver": "abaqus", "max_eigen": 30000.0, "element_type": "CAX4R", "path_frame": 2,
+                   "path_variable": "U2", "version": 1}
+
+
+# this method turns a value into plain json, every number a @float and every material its property table
+def canonical_value(value):
+    if isinstance(value, dict):
+        return dict([(str(key), canonical_value(item)) for key, item in value.items()])
+    if isinstance(value, (list, tuple)):
+        return [canonical_value(item) for item in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if hasattr(value, "material_name") and hasattr(value, "elastic_module"):
+        return canonical_value({"material_name": value.material_name, "density": value.density,
+                                "elastic_module": value.elastic_module, "poisson_ratio": value.poisson_ratio})
+    if type(value).__module__ == "numpy":
+        return canonical_value(value.tolist())
+    return str(value)
+
+
+# this method fills the defaults of the arguments of @ModelTransducer, so the same design always gives the same key
+# input parameters:
+# @param arguments : an instance of @dict of the arguments of @ModelTransducer
+# @param solver_settings : an instance of @dict . updates of @SOLVER_SETTINGS
+# results:
+# an instance of @dict with @design , @materials and @solver
+def canonical_parameters(arguments, solver_settings=None):
+    design = dict(DESIGN_DEFAULTS)
+    materials = dict(MATERIAL_DEFAULTS)
+    for key, value in arguments.items():
+        if key in MATERIAL_DEFAULTS:
+            if value is not None:
+                materials[key] = value
+        elif key not in ("num_cpus", "memory", "submit", "materials_from", "dependent_rings", "profiler"):
+            design[key] = value
+    solver = dict(SOLVER_SETTINGS)
+    solver.update(solver_settings or {})
+    return canonical_value({"design": design, "materials": materials, "solver": solver})
+
+
+# this method hashes the canonical parameters of a run
+# results:
+# an instance of @str . the sha256 of the sorted json of @canonical_parameters
+def parameters_key(parameters):
+    text = json.dumps(parameters, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _replace(source, destination):
+    if hasattr(os, "replace"):
+        os.replace(source, destination)
+    else:
+        os.rename(source, destination)
+
+
+# this class keeps the results of finished runs on disk, one json file per content key, in front of
+# @ModelTransducer . entries are written to a temporary file and renamed, so a reader never sees a partial entry and
+# several worker processes can share the directory. a hit touches the entry, and the least recently used entries are
+# evicted when the directory grows over @max_bytes
+# input parameters:
+# @param directory : an instance of @str . the directory of the entries, created if needed
+# @param max_bytes : an instance of @int . the size limit of the entries
+# @param memory_entries : an instance of @int . the number of entries also kept in memory by this process
+class ResultCache:
+
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024, memory_entries=1024):
+        self.__directory = os.path.abspath(directory)
+        self.__max_bytes = max_bytes
+        self.__memory_entries = memory_entries
+        self.__memory = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__estimated_bytes = None
+        self.__writes_since_scan = 0
+        try:
+            os.makedirs(self.directory)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    @property
+    def max_bytes(self):
+        return self.__max_bytes
+
+    @property
+    def hits(self):
+        return self.__hits
+
+    @property
+    def misses(self):
+        return self.__misses
+
+    def entry_file(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def __remember(self, key, entry):
+        if len(self.__memory) >= self.__memory_entries:
+            self.__memory.pop(min(self.__memory, key=lambda i: self.__memory[i][0]))
+        self.__memory[key] = (time.time(), entry)
+
+    # this method reads an entry
+    # results:
+    # the stored @dict with @parameters and @result , or None on a miss
+    def get(self, key):
+        if key in self.__memory:
+            self.__hits += 1
+            self.__memory[key] = (time.time(), self.__memory[key][1])
+            return self.__memory[key][1]
+        try:
+            with open(self.entry_file(key)) as entry_file:
+                entry = json.load(entry_file)
+            os.utime(self.entry_file(key), None)
+        except (IOError, OSError, ValueError):
+            self.__misses += 1
+            return None
+        self.__hits += 1
+        self.__remember(key, entry)
+        return entry
+
+    # this method writes an entry and evicts old entries when the cache is too big
+    # input parameters:
+    # @param key : an instance of @str . the key of @parameters_key
+    # @param parameters : an instance of @dict . the canonical parameters, kept next to the result for inspection
+    # @param result : an instance of @dict . json serializable results of the run
+    def put(self, key, parameters, result):
+        entry = {"key": key, "parameters": parameters, "result": canonical_value(result)}
+        directory = os.path.dirname(self.entry_file(key))
+        try:
+            os.makedirs(directory)
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+        handle, temporary_file = tempfile.mkstemp(suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(handle, "w") as entry_file:
+                json.dump(entry, entry_file, sort_keys=True)
+            _replace(temporary_file, self.entry_file(key))
+        except BaseException:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise
+        self.__remember(key, entry)
+        self.__writes_since_scan += 1
+        if self.__estimated_bytes is not None:
+            self.__estimated_bytes += os.path.getsize(self.entry_file(key))
+        if self.__estimated_bytes is None or self.__estimated_bytes > self.max_bytes or self.__writes_since_scan >= 64:
+            self.evict()
+        return entry
+
+    def entries(self):
+        items = []
+        for root, directories, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    try:
+                        status = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    items.append((status.st_mtime, status.st_size, os.path.join(root, name)))
+        return items
+
+    # this method removes the least recently used entries until the cache fits in @max_bytes . only one process
+    # evicts at a time, the others skip while the lock file exists. a lock older than @stale_lock seconds is broken.
+    # @put scans the directory only when its estimate of the size, which misses the writes of other processes, is
+    # over the limit, or after 64 writes
+    # results:
+    # the number of removed entries
+    def evict(self, stale_lock=60.):
+        lock_file = os.path.join(self.directory, "evict.lock")
+        try:
+            os.close(os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except OSError as error:
+            if error.errno != errno.EEXIST:
+                raise
+            try:
+                if time.time() - os.stat(lock_file).st_mtime > stale_lock:
+                    os.remove(lock_file)
+            except OSError:
+                pass
+            return 0
+        removed = 0
+        try:
+            items = sorted(self.entries())
+            size = sum([item[1] for item in items])
+            for mtime, entry_size, entry_file in items:
+                if size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(entry_file)
+                except OSError:
+                    pass
+                size -= entry_size
+                removed += 1
+                key = os.path.basename(entry_file)[:-len(".json")]
+                self.__memory.pop(key, None)
+            self.__estimated_bytes = size
+            self.__writes_since_scan = 0
+        finally:
+            os.remove(lock_file)
+        return removed
+
+    # this method returns the cached results of a run, or runs it and stores its results
+    # input parameters:
+    # @param arguments : an instance of @dict of the arguments of @ModelTransducer
+    # @param run : a callable . called with @arguments on a miss, returns the json serializable results
+    # @param solver_settings : an instance of @dict . updates of @SOLVER_SETTINGS
+    # results:
+    # an instance of @dict of the results
+    def fetch(self, arguments, run, solver_settings=None):
+        parameters = canonical_parameters(arguments, solver_settings)
+        key = parameters_key(parameters)
+        entry = self.get(key)
+        if entry is None:
+            entry = self.put(key, parameters, run(arguments))
+        return entry["result"]
@@ -0,0 +1,52 @@
+# coding=utf-8
+# a stand-in for "abaqus job=... input=... interactive" used to exercise the job scheduler without a solver license.
+# it accepts the same key=value arguments, holds the .lck file while running, writes .sta/.msg progress like the
+# real solver and finishes with the same completion line. two extra arguments are understood:
+# duration=<seconds> : how long the fake analysis runs (1 second by default)
+# fail=1 : finish with the "not been completed" status line and a non zero exit code
+import os
+import sys
+import time
+
+
+def parse_arguments(arguments):
+    options = {}
+    for argument in arguments:
+        if "=" in argument:
+            key, value = argument.split("=", 1)
+            options[key.strip()] = value.strip()
+        else:
+            options[argument.strip()] = ""
+    return options
+
+
+def main(arguments):
+    options = parse_arguments(arguments)
+    job_name = options["job"]
+    duration = float(options.get("duration", 1))
+    failed = options.get("fail", "0") not in ("", "0")
+    increments = 5
+    with open(job_name + ".lck", "w") as lock_file:
+        lock_file.write(str(os.getpid()))
+    with open(job_name + ".msg", "w") as message_file:
+        message_file.write(" stand-in solver for input {0} on {1} cpus\n".format(options.get("input", ""),
+                                                                               options.get("cpus", "1")))
+    with open(job_name + ".sta", "w") as status_file:
+        status_file.write(" SUMMARY OF JOB INFORMATION:\n")
+        status_file.write(" STEP  INC ATT SEVERE EQUIL TOTAL  TOTAL      STEP       INC OF       DOF    IF\n")
+        status_file.flush()
+        for increment in range(1, increments + 1):
+            time.sleep(duration / increments)
+            status_file.write("   1 {0:4d}   1     0     0     0  {1:.3e}  {1:.3e}  {2:.3e}\n".format(
+                increment, float(increment) / increments, 1. / increments))
+            status_file.flush()
+        if failed:
+            status_file.write(" THE ANALYSIS HAS NOT BEEN COMPLETED\n")
+        else:
+            status_file.write(" THE ANALYSIS HAS COMPLETED SUCCESSFULLY\n")
+    os.remove(job_name + ".lck")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,275 @@
+import json
+
+import numpy as np
+import scipy.linalg
+
+from result_cache import DESIGN_DEFAULTS, canonical_parameters
+
+# the arguments of @ModelTransducer the surrogate is a function of
+FEATURES = ("length_of_matching", "length_of_backing", "number_of_piezoelectrics", "piezoelectric_outer_diameter",
+            "piezoelectric_inner_diameter", "piezoelectric_thickness", "thickness_of_electrode")
+
+# the predicted values of a design, see @design_targets
+TARGETS = ("frequency", "gain")
+
+# the length scales of the gaussian kernel that are tried for every feature, in units of the range of the feature
+LENGTH_SCALES = (0.05, 0.1, 0.2, 0.4, 0.8, 1.6, 3.2)
+
+
+# this method reads the targets of one run
+# input parameters:
+# @param results : an instance of @dict like @ModelTransducer.extract_results
+# results:
+# an instance of @dict with @frequency , the frequency of the mode of the path data, and @gain , the ratio of the
+# axial amplitude at the face of the matching to the one at the top of the backing. None when the results have no
+# longitudinal mode
+def design_targets(results):
+    frame = results.get("frame", 2)
+    path_data = results.get("path_data") or ()
+    if frame is None or len(path_data) < 2 or path_data[-1][1] == 0:
+        return None
+    return {"frequency": float(results["eigenfrequencies"][int(frame) - 1]),
+            "gain": abs(float(path_data[0][1]) / float(path_data[-1][1]))}
+
+
+# this method reads the solved designs of a @ResultCache
+# input parameters:
+# @param cache : an instance of @ResultCache
+# @param base_arguments : an instance of @dict of the arguments of @ModelTransducer that are not features, like the
+# materials and the mesh size. only the entries with the same arguments, and the same @solver_settings , are read
+# @param features : the keys of the design of every sample
+# results:
+# an instance of @tuple of (designs, values) . @numpy.ndarray of shape (samples, features) and (samples, targets)
+def cached_samples(cache, base_arguments=None, solver_settings=None, features=FEATURES):
+    base = canonical_parameters(base_arguments or {}, solver_settings)
+    for key in features:
+        base["design"].pop(key, None)
+    designs = []
+    values = []
+    for mtime, size, entry_file in cache.entries():
+        try:
+            with open(entry_file) as opened:
+                entry = json.load(opened)
+        except (IOError, OSError, ValueError):
+            continue
+        parameters = entry.get("parameters", {})
+        design = dict(parameters.get("design", {}))
+        if any([key not in design for key in features]):
+            continue
+        point = [design.pop(key) for key in features]
+        if design != base["design"] or parameters.get("materials") != base["materials"] or \
+                parameters.get("solver") != base["solver"]:
+            continue
+        targets = design_targets(entry["result"])
+        if targets is None:
+            continue
+        designs.append(point)
+        values.append([targets[key] for key in TARGETS])
+    return np.array(designs, dtype=float).reshape(-1, len(features)), np.array(values).reshape(-1, len(TARGETS))
+
+
+# this class is a gaussian process regression of the targets of @ModelTransducer over its design arguments. the
+# features are scaled by their range and the targets by their standard deviation, then one gaussian kernel with a
+# length scale per feature is shared by all targets, the length scales are picked from @LENGTH_SCALES by the
+# marginal likelihood and the amplitude of every target is its maximum likelihood estimate. a prediction of a batch
+# of designs is two matrix products, so thousands of designs are answered in milliseconds
+# input parameters:
+# @param features : an instance of @tuple of the arguments of @ModelTransducer , @FEATURES by default
+# @param noise : an instance of @float . the variance of the noise of the scaled targets, mostly for the
+# conditioning of nearly repeated designs
+class DesignSurrogate:
+
+    def __init__(self, features=FEATURES, noise=1e-6):
+        self.__features = tuple(features)
+        self.__noise = noise
+        self.__designs = None
+        self.__values = None
+        self.__low = None
+        self.__scale = None
+        self.__mean = None
+        self.__deviation = None
+        self.__length_scales = None
+        self.__factor = None
+        self.__weights = None
+        self.__amplitudes = None
+
+    @property
+    def features(self):
+        return self.__features
+
+    @property
+    def targets(self):
+        return TARGETS
+
+    @property
+    def samples(self):
+        return 0 if self.__designs is None else len(self.__designs)
+
+    # an instance of @numpy.ndarray of the length scale of every feature, in units of its range
+    @property
+    def length_scales(self):
+        return self.__length_scales
+
+    def __points(self, designs):
+        if isinstance(designs, dict):
+            designs = [designs]
+        designs = [[design[key] if key in design else DESIGN_DEFAULTS[key] for key in self.features]
+                   if isinstance(design, dict) else design
+                   for design in designs]
+        return np.array(designs, dtype=float).reshape(-1, len(self.features))
+
+    def __kernel(self, first, second, length_scales):
+        first = first / length_scales
+        second = second / length_scales
+        distances = (np.sum(first ** 2, axis=1)[:, np.newaxis] + np.sum(second ** 2, axis=1)[np.newaxis, :] -
+                     2. * np.dot(first, second.T))
+        return np.exp(-0.5 * np.maximum(distances, 0.))
+
+    def __factorize(self, points, values, length_scales):
+        covariance = self.__kernel(points, points, length_scales)
+        covariance[np.diag_indices_from(covariance)] += self.__noise
+        try:
+            factor = scipy.linalg.cho_factor(covariance, lower=True)
+        except np.linalg.LinAlgError:
+            return None, None, -np.inf, None
+        weights = scipy.linalg.cho_solve(factor, values)
+        amplitudes = np.maximum(np.sum(values * weights, axis=0) / len(values), 1e-300)
+        log_likelihood = (-0.5 * len(values) * np.sum(np.log(amplitudes)) -
+                          values.shape[1] * np.sum(np.log(np.diag(factor[0]))))
+        return factor, weights, log_likelihood, np.sqrt(amplitudes)
+
+    # this method trains the surrogate
+    # input parameters:
+    # @param designs : an instance of @list of @dict of the arguments of @ModelTransducer , or an array of shape
+    # (samples, features)
+    # @param values : an array of shape (samples, targets) in the order of @TARGETS
+    def fit(self, designs, values):
+        self.__designs = self.__points(designs)
+        self.__values = np.array(values, dtype=float).reshape(len(self.__designs), len(TARGETS))
+        if not len(self.__designs):
+            raise ValueError("the surrogate needs at least one sample")
+        self.__low = self.__designs.min(axis=0)
+        self.__scale = self.__designs.max(axis=0) - self.__low
+        self.__scale[self.__scale == 0] = 1.
+        self.__mean = self.__values.mean(axis=0)
+        self.__deviation = self.__values.std(axis=0)
+        self.__deviation[self.__deviation == 0] = 1.
+        points = (self.__designs - self.__low) / self.__scale
+        values = (self.__values - self.__mean) / self.__deviation
+        best = max([(self.__factorize(points, values, np.full(len(self.features), scale))[2], scale)
+                    for scale in LENGTH_SCALES])
+        length_scales = np.full(len(self.features), best[1])
+        log_likelihood = best[0]
+        for sweep in range(2):
+            for index in range(len(self.features)):
+                for scale in LENGTH_SCALES:
+                    trial = length_scales.copy()
+                    trial[index] = scale
+                    trial_likelihood = self.__factorize(points, values, trial)[2]
+                    if trial_likelihood > log_likelihood:
+                        length_scales, log_likelihood = trial, trial_likelihood
+        self.__length_scales = length_scales
+        self.__factor, self.__weights, log_likelihood, self.__amplitudes = self.__factorize(points, values,
+                                                                                            length_scales)
+        return self
+
+    # this method trains the surrogate on the solved designs of a @ResultCache , see @cached_samples
+    def fit_cache(self, cache, base_arguments=None, solver_settings=None):
+        designs, values = cached_samples(cache, base_arguments=base_arguments, solver_settings=solver_settings,
+                                         features=self.features)
+        return self.fit(designs, values)
+
+    # this method predicts a batch of designs
+    # input parameters:
+    # @param designs : an instance of @list of @dict of the arguments of @ModelTransducer , with the defaults of
+    # @DESIGN_DEFAULTS , or an array of shape (designs, features)
+    # results:
+    # an instance of @tuple of (mean, standard deviation) . @numpy.ndarray of shape (designs, targets)
+    def predict(self, designs):
+        points = (self.__points(designs) - self.__low) / self.__scale
+        cross = self.__kernel(points, (self.__designs - self.__low) / self.__scale, self.__length_scales)
+        mean = self.__mean + np.dot(cross, self.__weights) * self.__deviation
+        projection = scipy.linalg.solve_triangular(self.__factor[0], cross.T, lower=True)
+        variance = np.maximum(1. - np.sum(projection ** 2, axis=0), 0.)
+        return mean, np.sqrt(variance)[:, np.newaxis] * self.__amplitudes * self.__deviation
+
+    # this method proposes the designs to solve next. candidates are drawn uniformly in @bounds , then the candidate
+    # with the largest predicted variance is taken, the variance of the others is conditioned on it, and so on, so a
+    # batch spreads over the uncertain region instead of piling up at its peak
+    # input parameters:
+    # @param bounds : an instance of @dict of feature to (low, high) . the other features keep their value when the
+    # training designs all share it, and are drawn in the range of the training designs otherwise
+    # @param batch_size : an instance of @int . the number of proposed designs
+    # @param candidates : an instance of @int . the number of candidates drawn
+    # @param integer_features : the features rounded to integers
+    # results:
+    # an instance of @list of @dict of the features of every proposed design
+    def propose(self, bounds, batch_size=8, candidates=2048, seed=None,
+                integer_features=("number_of_piezoelectrics",)):
+        generator = np.random.RandomState(seed)
+        low = np.array([bounds[key][0] if key in bounds else self.__designs[:, index].min()
+                        for index, key in enumerate(self.features)], dtype=float)
+        high = np.array([bounds[key][1] if key in bounds else self.__designs[:, index].max()
+                         for index, key in enumerate(self.features)], dtype=float)
+        designs = low + (high - low) * generator.random_sample((candidates, len(self.features)))
+        for index, key in enumerate(self.features):
+            if key in integer_features:
+                designs[:, index] = np.round(designs[:, index])
+        points = (designs - self.__low) / self.__scale
+        cross = self.__kernel(points, (self.__designs - self.__low) / self.__scale, self.__length_scales)
+        projection = scipy.linalg.solve_triangular(self.__factor[0], cross.T, lower=True)
+        covariance = self.__kernel(points, points, self.__length_scales) - np.dot(projection.T, projection)
+        proposed = []
+        for i in range(min(batch_size, candidates)):
+            index = int(np.argmax(np.diag(covariance)))
+            proposed.append(dict([(key, int(value) if key in integer_features else float(value))
+                                  for key, value in zip(self.features, designs[index])]))
+            column = covariance[:, index].copy()
+            covariance -= np.outer(column, column) / (column[index] + self.__noise)
+            covariance[index, index] = -np.inf
+        return proposed
+
+
+# this method spends a solver budget where the surrogate is least certain. every round trains the surrogate on the
+# cache, solves the proposed batch through the cache and starts again
+# input parameters:
+# @param cache : an instance of @ResultCache
+# @param bounds : an instance of @dict of feature to (low, high)
+# @param budget : an instance of @int . the number of new solves, designs found in the cache are not counted. the
+# refinement stops early when a whole batch is already in the cache
+# @param run : a callable . called with the arguments of a design, returns its results like
+# @ModelTransducer.extract_results . solves with @ModelTransducer by default
+# @param base_arguments : an instance of @dict of the other arguments of every design
+# results:
+# an instance of @DesignSurrogate trained on every solve
+def refine_surrogate(cache, bounds, budget, batch_size=4, run=None, base_arguments=None, solver_settings=None,
+                     surrogate=None, seed=None):
+    if run is None:
+        from automated_transducer_disigner import transducer_results as run
+    if surrogate is None:
+        surrogate = DesignSurrogate()
+    generator = np.random.RandomState(seed)
+    solved = []
+
+    def counted_run(arguments):
+        solved.append(arguments)
+        return run(arguments)
+
+    solves = 0
+    while solves < budget:
+        designs, values = cached_samples(cache, base_arguments, solver_settings, features=surrogate.features)
+        if len(designs) < 2:
+            batch = [dict([(key, int(round(generator.uniform(*bounds[key]))) if key == "number_of_piezoelectrics"
+                            else float(generator.uniform(*bounds[key]))) for key in bounds])
+                     for i in range(min(batch_size, budget - solves))]
+        else:
+            batch = surrogate.fit(designs, values).propose(bounds, batch_size=min(batch_size, budget - solves),
+                                                           seed=generator.randint(2 ** 31))
+        for design in batch:
+            arguments = dict(base_arguments or {})
+            arguments.update(design)
+            cache.fetch(arguments, counted_run, solver_settings)
+        if len(solved) == solves:
+            break
+        solves = len(solved)
+    return surrogate.fit_cache(cache, base_arguments, solver_settings)
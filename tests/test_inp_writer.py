@@ -0,0 +1,40 @@
+# the deck of @inp_writer is compared byte for byte with a golden file. after an intended change of the deck, write
+# the golden file again with:
+#   python -c "from inp_writer import write_input_deck; write_input_deck('tests/data/transducer_mesh_4.inp', 60, 40,
+#              mesh_size=4, model_key='Transducer')"
+import os
+
+from inp_writer import write_input_deck
+from transducer_design import PZT4
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def _read(file_path):
+    with open(file_path, "rb") as deck:
+        return deck.read()
+
+
+def test_deck_matches_golden_file(tmpdir):
+    deck = write_input_deck(str(tmpdir.join("transducer.inp")), 60, 40, mesh_size=4, model_key="Transducer")
+    assert _read(deck) == _read(os.path.join(DATA_DIRECTORY, "transducer_mesh_4.inp"))
+
+
+def test_deck_is_deterministic(tmpdir):
+    arguments = {"length_of_matching": 60, "length_of_backing": 40, "number_of_piezoelectrics": 4,
+                 "mesh_size": {"default": 3., "Electrode": 0.15}, "min_elements": 2, "merged_stack": True}
+    first = write_input_deck(str(tmpdir.join("first.inp")), **arguments)
+    second = write_input_deck(str(tmpdir.join("second.inp")), **arguments)
+    assert _read(first) == _read(second)
+
+
+def test_tables_with_the_same_name_are_written_apart(tmpdir):
+    electrode = dict(PZT4, density=8.93e-9, elastic_module=110000)
+    for merged_stack in (False, True):
+        deck = write_input_deck(str(tmpdir.join("deck.inp")), 60, 40, mesh_size=4, material_of_electrode=electrode,
+                                merged_stack=merged_stack)
+        lines = _read(deck).decode("ascii").splitlines()
+        names = [line.split("=", 1)[1] for line in lines if line.startswith("*Material, name=")]
+        assert len(names) == len(set(names)) == 5
+        index = lines.index("*Material, name=" + names[2])
+        assert lines[index:index + 5] == [lines[index], "*Density", "8.93e-09,", "*Elastic", "110000.0, 0.3"]
@@ -0,0 +1,28 @@
+# the completed, failed and timeout paths of @JobMonitor , with @stand_in_solver in place of abaqus
+from job_monitor import COMPLETED, FAILED, PROGRESS, STARTED, TIMEOUT, monitor_jobs
+from job_scheduler import STAND_IN_SOLVER_COMMAND
+
+
+def _command(*options):
+    return [STAND_IN_SOLVER_COMMAND[0], STAND_IN_SOLVER_COMMAND[1], "job={job}", "input={job}.inp"] + list(options)
+
+
+def test_completed_failed_and_timeout_jobs(tmpdir):
+    directory = str(tmpdir)
+    events = []
+    final = monitor_jobs([("completed", _command("duration=0.3"), directory),
+                          ("failed", _command("duration=0.3", "fail=1"), directory),
+                          ("slow", _command("duration=60"), directory)],
+                         timeout=2., on_event=events.append, poll_interval=0.05)
+    assert final["completed"].kind == COMPLETED
+    assert final["completed"].return_code == 0
+    assert final["completed"].progress == 1.
+    assert "COMPLETED SUCCESSFULLY" in final["completed"].message
+    assert final["failed"].kind == FAILED
+    assert final["failed"].return_code != 0
+    assert "NOT BEEN COMPLETED" in final["failed"].message
+    assert final["slow"].kind == TIMEOUT
+    assert final["slow"].elapsed < 30.
+    kinds = [event.kind for event in events if event.job_name == "completed"]
+    assert kinds[0] == STARTED and PROGRESS in kinds and kinds[-1] == COMPLETED
+    assert [event.job_name for event in events if event.final].count("slow") == 1
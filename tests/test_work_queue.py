@@ -0,0 +1,65 @@
+# the work queue shared by several local worker processes in a temporary directory
+import json
+import os
+import subprocess
+import sys
+import time
+
+from work_queue import WorkQueue, run_worker
+
+WORK_QUEUE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "work_queue.py")
+
+
+def _designs(count):
+    return [{"length_of_matching": 50 + i, "length_of_backing": 40, "mesh_size": 8} for i in range(count)]
+
+
+def test_local_workers_drain_the_queue(tmpdir):
+    directory = str(tmpdir.join("queue"))
+    queue = WorkQueue(directory, solver_settings={"solver": "modal"})
+    keys = queue.enqueue(_designs(9))
+    assert len(keys) == 9
+    assert queue.enqueue(_designs(9)) == []
+    workers = [subprocess.Popen([sys.executable, WORK_QUEUE, "worker", directory, "--solver", "modal"],
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT) for i in range(3)]
+    for worker in workers:
+        output = worker.communicate()[0]
+        assert worker.returncode == 0, output
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 9, "failed": 0}
+    assert queue.drained
+    entries = list(queue.entries("done"))
+    assert sorted([entry["key"] for entry in entries]) == sorted(keys)
+    assert all([entry["result"]["eigenfrequencies"] for entry in entries])
+    collected = subprocess.check_output([sys.executable, WORK_QUEUE, "collect", directory])
+    assert len([json.loads(line) for line in collected.decode("utf-8").splitlines()]) == 9
+
+
+def test_expired_lease_is_reclaimed(tmpdir):
+    queue = WorkQueue(str(tmpdir), lease_seconds=0.2)
+    queue.enqueue(_designs(1))
+    lost = queue.lease("lost-worker")
+    assert lost is not None and lost.attempts == 0
+    assert queue.lease("other-worker") is None
+    time.sleep(0.3)
+    lease = queue.lease("other-worker")
+    assert lease is not None and lease.key == lost.key and lease.attempts == 1
+    assert "lost-worker" in lease.entry["error"]
+    assert not lost.renew()
+    queue.complete(lease, {"eigenfrequencies": []})
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 1, "failed": 0}
+
+
+def test_design_fails_after_max_attempts(tmpdir):
+    queue = WorkQueue(str(tmpdir), max_attempts=2)
+    key = queue.enqueue(_designs(1))[0]
+    runs = []
+
+    def run(design):
+        runs.append(design)
+        raise RuntimeError("no license")
+
+    assert run_worker(queue, run=run, worker="worker", poll=0.01) == 0
+    assert len(runs) == 2
+    assert queue.counts() == {"pending": 0, "leased": 0, "done": 0, "failed": 1}
+    failed = list(queue.entries("failed"))
+    assert failed[0]["key"] == key and failed[0]["attempts"] == 2 and "no license" in failed[0]["error"]
@@ -0,0 +1,276 @@
+import numpy as np
+
+# material property tables, in the units of the model (mm, tonne, MPa)
+ALUMINIUM_6061_T6 = {"material_name": "AL6061T6", "density": 2.7e-9, "elastic_module": 68900, "poisson_ratio": 0.33}
+PZT4 = {"material_name": "PZT4", "density": 2.517e-9, "elastic_module": 67400, "poisson_ratio": 0.3}
+ST37 = {"material_name": "ST37", "density": 7.7e-9, "elastic_module": 200000, "poisson_ratio": 0.29}
+SCREW_12_9 = {"material_name": "SCREW_12_9", "density": 7.85e-9, "elastic_module": 206000, "poisson_ratio": 0.29}
+COPPER = {"material_name": "COPPER", "density": 8.93e-9, "elastic_module": 110000, "poisson_ratio": 0.343}
+
+# catalog of standard screws
+SCREW_DIAMETERS = [1.6, 2, 2.5, 3, 4, 5, 6, 8, 10, 12, 14, 16, 20, 24, 30, 36, 42, 48, 56, 64]
+SCREW_LENGTH = [2.5, 3, 4, 5, 6, 8, 10, 12, 16, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 80, 90, 100, 110, 120,
+                130, 140, 150, 160, 180, 200, 220, 240, 260, 280, 300]
+SCREW_LENGTH_LIMIT = {"1.6": (2.5, 16), "2": (3, 20), "2.5": (4, 25), "3": (5, 30), "4": (6, 40), "5": (8, 50),
+                      "6": (10, 60), "8": (12, 80), "10": (16, 100), "12": (20, 120), "14": (25, 140),
+                      "16": (25, 160), "20": (30, 200), "24": (40, 200), "30": (45, 200), "36": (55, 200),
+                      "42": (60, 300), "48": (70, 300), "56": (80, 300), "64": (90, 300)}
+SCREW_STEP_LENGTH = {"1.6": 0.35, "2": 0.4, "2.5": 0.45, "3": 0.5, "4": 0.7, "5": 0.8, "6": 1, "8": 1.25, "10": 1.5,
+                     "12": 1.75, "14": 2, "16": 2, "20": 2.5, "24": 3, "30": 3.5, "36": 4, "42": 4.5, "48": 5,
+                     "56": 5.5, "64": 6}
+SCREWDRIVER_DIAMETER = {"1.6": 3, "2": 3.8, "2.5": 4.5, "3": 5.5, "4": 7, "5": 8.5, "6": 10, "8": 13, "10": 16,
+                        "12": 18, "14": 21, "16": 24, "20": 30, "24": 36, "30": 45, "36": 54, "42": 63, "48": 72,
+                        "56": 84, "64": 96}
+SCREWDRIVER_LENGTH = {"1.6": 1.6, "2": 2, "2.5": 2.5, "3": 3, "4": 4, "5": 5, "6": 6, "8": 8, "10": 10, "12": 12,
+                      "14": 14, "16": 16, "20": 20, "24": 24, "30": 30, "36": 36, "42": 42, "48": 48, "56": 56,
+                      "64": 64}
+
+
+# this method chooses the biggest standard screw that passes through the piezoelectric rings with 1 mm of clearance
+# input parameters:
+# @param piezoelectric_inner_diameter : an instance of @int or @float . the inner diameter of the piezoelectric rings
+# results:
+# the chosen item of @SCREW_DIAMETERS
+def select_screw_diameter(piezoelectric_inner_diameter):
+    screw_diameter = None
+    for i in SCREW_DIAMETERS:
+        if i <= piezoelectric_inner_diameter - 2:
+            screw_diameter = i
+        else:
+            break
+    if screw_diameter is None:
+        raise ValueError("no standard screw fits in a piezoelectric inner diameter of " +
+                         str(piezoelectric_inner_diameter))
+    return screw_diameter
+
+
+# this method chooses the standard length of a screw that is the nearest to the required length
+# input parameters:
+# @param screw_diameter : an item of @SCREW_DIAMETERS
+# @param screw_criterion_length : an instance of @int or @float . the required length of the screw
+# results:
+# the chosen item of @SCREW_LENGTH, the shorter one when two lengths are equally near
+def select_screw_length(screw_diameter, screw_criterion_length):
+    screw_length = None
+    lower_limit, upper_limit = SCREW_LENGTH_LIMIT[str(screw_diameter)]
+    for i in SCREW_LENGTH:
+        if upper_limit >= i >= lower_limit:
+            if screw_length is None:
+                screw_length = i
+            else:
+                if abs(i - screw_criterion_length) < abs(screw_length - screw_criterion_length):
+                    screw_length = i
+    return screw_length
+
+
+# this class derives the screw and the stack geometry of a transducer without any abaqus object
+# input parameters: the geometric arguments of @ModelTransducer and the property tables of the materials
+class TransducerDesign:
+
+    def __init__(self, length_of_matching, length_of_backing, number_of_piezoelectrics=2,
+                 piezoelectric_outer_diameter=45, piezoelectric_inner_diameter=15, piezoelectric_thickness=5,
+                 thickness_of_electrode=0.3, material_of_piezoelectric=None, material_of_electrode=None,
+                 material_of_screw=None, material_of_matching=None, material_of_backing=None):
+        self.__length_of_matching = length_of_matching
+        self.__length_of_backing = length_of_backing
+        self.__number_of_piezoelectrics = number_of_piezoelectrics
+        self.__piezoelectric_outer_diameter = piezoelectric_outer_diameter
+        self.__piezoelectric_inner_diameter = piezoelectric_inner_diameter
+        self.__piezoelectric_thickness = piezoelectric_thickness
+        self.__thickness_of_electrode = thickness_of_electrode
+        self.__material_of_piezoelectric = PZT4 if material_of_piezoelectric is None else material_of_piezoelectric
+        self.__material_of_electrode = COPPER if material_of_electrode is None else material_of_electrode
+        self.__material_of_screw = SCREW_12_9 if material_of_screw is None else material_of_screw
+        self.__material_of_matching = ALUMINIUM_6061_T6 if material_of_matching is None else material_of_matching
+        self.__material_of_backing = ST37 if material_of_backing is None else material_of_backing
+        self.__screw_diameter = select_screw_diameter(piezoelectric_inner_diameter)
+        self.__screw_criterion_length = length_of_backing + number_of_piezoelectrics * (
+                piezoelectric_thickness + thickness_of_electrode) + 5 * SCREW_STEP_LENGTH[
+                                            str(self.screw_diameter)] - SCREWDRIVER_LENGTH[str(self.screw_diameter)]
+        self.__screw_length = select_screw_length(self.screw_diameter, self.screw_criterion_length)
+
+    @property
+    def length_of_matching(self):
+        return self.__length_of_matching
+
+    @property
+    def length_of_backing(self):
+        return self.__length_of_backing
+
+    @property
+    def number_of_piezoelectrics(self):
+        return self.__number_of_piezoelectrics
+
+    @property
+    def piezoelectric_outer_diameter(self):
+        return self.__piezoelectric_outer_diameter
+
+    @property
+    def piezoelectric_inner_diameter(self):
+        return self.__piezoelectric_inner_diameter
+
+    @property
+    def piezoelectric_thickness(self):
+        return self.__piezoelectric_thickness
+
+    @property
+    def thickness_of_electrode(self):
+        return self.__thickness_of_electrode
+
+    @property
+    def material_of_piezoelectric(self):
+        return self.__material_of_piezoelectric
+
+    @property
+    def material_of_electrode(self):
+        return self.__material_of_electrode
+
+    @property
+    def material_of_screw(self):
+        return self.__material_of_screw
+
+    @property
+    def material_of_matching(self):
+        return self.__material_of_matching
+
+    @property
+    def material_of_backing(self):
+        return self.__material_of_backing
+
+    @property
+    def screw_diameter(self):
+        return self.__screw_diameter
+
+    @property
+    def screw_criterion_length(self):
+        return self.__screw_criterion_length
+
+    @property
+    def screw_length(self):
+        return self.__screw_length
+
+    @property
+    def screw_step_length(self):
+        return SCREW_STEP_LENGTH[str(self.screw_diameter)]
+
+    @property
+    def screwdriver_diameter(self):
+        return SCREWDRIVER_DIAMETER[str(self.screw_diameter)]
+
+    @property
+    def screwdriver_length(self):
+        return SCREWDRIVER_LENGTH[str(self.screw_diameter)]
+
+    @property
+    def screw_hole_length(self):
+        return 6 * self.screw_step_length + 1
+
+    @property
+    def screw_box_length(self):
+        return self.screwdriver_length + (self.screw_criterion_length - self.screw_length)
+
+    @property
+    def stack_height(self):
+        return self.number_of_piezoelectrics * (self.piezoelectric_thickness + self.thickness_of_electrode)
+
+    @property
+    def piezoelectric_offsets(self):
+        return [self.length_of_matching + i * (self.piezoelectric_thickness + self.thickness_of_electrode)
+                for i in range(self.number_of_piezoelectrics)]
+
+    @property
+    def electrode_offsets(self):
+        return [self.length_of_matching + self.piezoelectric_thickness + i * (
+                self.piezoelectric_thickness + self.thickness_of_electrode) for i in range(self.number_of_piezoelectrics)]
+
+    @property
+    def backing_offset(self):
+        return self.length_of_matching + self.stack_height
+
+    @property
+    def screw_offset(self):
+        return self.backing_offset + self.length_of_backing - (self.screw_length + self.screw_box_length)
+
+    @property
+    def total_length(self):
+        return self.backing_offset + self.length_of_backing
+
+
+def _screw_catalog_arrays():
+    diameters = np.array(SCREW_DIAMETERS, dtype=float)
+    lengths = np.array(SCREW_LENGTH, dtype=float)
+    keys = [str(i) for i in SCREW_DIAMETERS]
+    lower = np.array([SCREW_LENGTH_LIMIT[k][0] for k in keys], dtype=float)
+    upper = np.array([SCREW_LENGTH_LIMIT[k][1] for k in keys], dtype=float)
+    return {"diameters": diameters, "lengths": lengths,
+            "lowest_length_index": np.searchsorted(lengths, lower, side="left"),
+            "highest_length_index": np.searchsorted(lengths, upper, side="right") - 1,
+            "step_length": np.array([SCREW_STEP_LENGTH[k] for k in keys], dtype=float),
+            "screwdriver_diameter": np.array([SCREWDRIVER_DIAMETER[k] for k in keys], dtype=float),
+            "screwdriver_length": np.array([SCREWDRIVER_LENGTH[k] for k in keys], dtype=float)}
+
+
+# this method is the vectorized form of @TransducerDesign . the arguments are broadcast against each other, so any of
+# them may be a scalar or an array of candidate values
+# results:
+# an instance of @dict of flat @numpy.ndarray . @valid is False where no standard screw fits the piezoelectric rings,
+# and the screw dependent values of those designs are nan
+def derive_designs(length_of_matching, length_of_backing, number_of_piezoelectrics=2, piezoelectric_outer_diameter=45,
+                   piezoelectric_inner_diameter=15, piezoelectric_thickness=5, thickness_of_electrode=0.3):
+    length_of_matching, length_of_backing, number_of_piezoelectrics, piezoelectric_outer_diameter, \
+        piezoelectric_inner_diameter, piezoelectric_thickness, thickness_of_electrode = [
+            np.ravel(i) for i in np.broadcast_arrays(
+                np.asarray(length_of_matching, dtype=float), np.asarray(length_of_backing, dtype=float),
+                np.asarray(number_of_piezoelectrics, dtype=int), np.asarray(piezoelectric_outer_diameter, dtype=float),
+                np.asarray(piezoelectric_inner_diameter, dtype=float), np.asarray(piezoelectric_thickness, dtype=float),
+                np.asarray(thickness_of_electrode, dtype=float))]
+    catalog = _screw_catalog_arrays()
+    screw_index = np.searchsorted(catalog["diameters"], piezoelectric_inner_diameter - 2, side="right") - 1
+    valid = screw_index >= 0
+    screw_index = np.maximum(screw_index, 0)
+    step_length = catalog["step_length"][screw_index]
+    screwdriver_length = catalog["screwdriver_length"][screw_index]
+    stack_height = number_of_piezoelectrics * (piezoelectric_thickness + thickness_of_electrode)
+    screw_criterion_length = length_of_backing + stack_height + 5 * step_length - screwdriver_length
+    lowest = catalog["lowest_length_index"][screw_index]
+    highest = catalog["highest_length_index"][screw_index]
+    nearest = np.searchsorted(catalog["lengths"], screw_criterion_length, side="left")
+    shorter = catalog["lengths"][np.clip(nearest - 1, lowest, highest)]
+    longer = catalog["lengths"][np.clip(nearest, lowest, highest)]
+    screw_length = np.where(np.abs(shorter - screw_criterion_length) <= np.abs(longer - screw_criterion_length),
+                            shorter, longer)
+    screw_box_length = screwdriver_length + (screw_criterion_length - screw_length)
+    backing_offset = length_of_matching + stack_height
+    designs = {"length_of_matching": length_of_matching, "length_of_backing": length_of_backing,
+               "number_of_piezoelectrics": number_of_piezoelectrics,
+               "piezoelectric_outer_diameter": piezoelectric_outer_diameter,
+               "piezoelectric_inner_diameter": piezoelectric_inner_diameter,
+               "piezoelectric_thickness": piezoelectric_thickness, "thickness_of_electrode": thickness_of_electrode,
+               "valid": valid,
+               "screw_diameter": catalog["diameters"][screw_index],
+               "screw_criterion_length": screw_criterion_length,
+               "screw_length": screw_length,
+               "screw_step_length": step_length,
+               "screwdriver_diameter": catalog["screwdriver_diameter"][screw_index],
+               "screwdriver_length": screwdriver_length,
+               "screw_hole_length": 6 * step_length + 1,
+               "screw_box_length": screw_box_length,
+               "stack_height": stack_height,
+               "backing_offset": backing_offset,
+               "screw_offset": backing_offset + length_of_backing - (screw_length + screw_box_length),
+               "total_length": backing_offset + length_of_backing}
+    for key in ("screw_diameter", "screw_criterion_length", "screw_length", "screw_step_length",
+                "screwdriver_diameter", "screwdriver_length", "screw_hole_length", "screw_box_length",
+                "screw_offset"):
+        designs[key] = np.where(valid, designs[key], np.nan)
+    return designs
+
+
+# this method enumerates the full factorial design space of the given candidate values
+# input parameters: any argument of @derive_designs as a scalar or a sequence of candidate values
+# results:
+# the output of @derive_designs for every combination of the candidate values
+def design_space(**candidates):
+    keys = sorted(candidates.keys())
+    grids = np.meshgrid(*[np.ravel(candidates[k]) for k in keys], indexing="ij")
+    return derive_designs(**dict([(k, np.ravel(grid)) for k, grid in zip(keys, grids)]))
@@ -0,0 +1,311 @@
+# the axisymmetric geometry of the transducer as plain data, so the stack can be meshed and solved without abaqus.
+# every part is a union of rectangular cells of the grid made by its outline and by the partition lines of
+# @creat_section, in the local coordinates of the part (r horizontal, y along the axis). every surface is a list of
+# element faces of one side of the part: S1 bottom, S2 outer, S3 top and S4 inner, like the faces of a CAX4 element.
+
+
+# a part of several materials, like the merged stack of @stack_geometry , lists the material and the region key of
+# its cells in @cell_materials and @cell_regions . the other cells are of @material and of the region of the part
+class PartGeometry:
+
+    def __init__(self, part_key, material, r_lines, y_lines, cells, surfaces, cell_materials=None, cell_regions=None):
+        self.__part_key = part_key
+        self.__material = material
+        self.__r_lines = list(r_lines)
+        self.__y_lines = list(y_lines)
+        self.__cells = list(cells)
+        self.__surfaces = dict(surfaces)
+        self.__cell_materials = dict(cell_materials or {})
+        self.__cell_regions = dict(cell_regions or {})
+
+    @property
+    def part_key(self):
+        return self.__part_key
+
+    @property
+    def material(self):
+        return self.__material
+
+    # the radii of the vertical lines of the grid
+    @property
+    def r_lines(self):
+        return self.__r_lines
+
+    # the heights of the horizontal lines of the grid
+    @property
+    def y_lines(self):
+        return self.__y_lines
+
+    # the (radial index, axial index) of every cell of the grid that belongs to the part
+    @property
+    def cells(self):
+        return self.__cells
+
+    # @dict of surface key to (face, coordinate of the face line, lower and upper bound along the line)
+    @property
+    def surfaces(self):
+        return self.__surfaces
+
+    @property
+    def cell_regions(self):
+        return self.__cell_regions
+
+    def cell_material(self, cell):
+        return self.__cell_materials.get(tuple(cell), self.material)
+
+    def cell_region(self, cell):
+        return self.__cell_regions.get(tuple(cell), self.part_key)
+
+    # the material of the cells on a surface, the material of the first of them
+    def surface_material(self, surface_key):
+        face, coordinate, lower, upper = self.surfaces[surface_key]
+        for cell in self.cells:
+            if face in ("S1", "S3"):
+                line = self.y_lines[cell[1] + (1 if face == "S3" else 0)]
+                start, end = self.r_lines[cell[0]], self.r_lines[cell[0] + 1]
+            else:
+                line = self.r_lines[cell[0] + (1 if face == "S2" else 0)]
+                start, end = self.y_lines[cell[1]], self.y_lines[cell[1] + 1]
+            if abs(line - coordinate) <= 1e-9 * max(1., abs(coordinate)) and start < upper and end > lower:
+                return self.cell_material(cell)
+        return self.material
+
+    # the distinct materials of the cells, the material of the part first
+    @property
+    def materials(self):
+        materials = [self.material]
+        for cell in self.cells:
+            if self.cell_material(cell) not in materials:
+                materials.append(self.cell_material(cell))
+        return materials
+
+
+class InstanceGeometry:
+
+    def __init__(self, name, part, offset):
+        self.__name = name
+        self.__part = part
+        self.__offset = offset
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def part(self):
+        return self.__part
+
+    # the axial translation of the instance in the assembly
+    @property
+    def offset(self):
+        return self.__offset
+
+
+class TieGeometry:
+
+    def __init__(self, name, master_instance, master_surface, slave_instance, slave_surface):
+        self.__name = name
+        self.__master_instance = master_instance
+        self.__master_surface = master_surface
+        self.__slave_instance = slave_instance
+        self.__slave_surface = slave_surface
+
+    @property
+    def name(self):
+        return self.__name
+
+    @property
+    def master_instance(self):
+        return self.__master_instance
+
+    @property
+    def master_surface(self):
+        return self.__master_surface
+
+    @property
+    def slave_instance(self):
+        return self.__slave_instance
+
+    @property
+    def slave_surface(self):
+        return self.__slave_surface
+
+
+def disk_geometry(part_key, material, inner_diameter, outer_diameter, thickness):
+    return PartGeometry(part_key=part_key, material=material,
+                        r_lines=[inner_diameter / 2., outer_diameter / 2.], y_lines=[0., thickness], cells=[(0, 0)],
+                        surfaces={"surface_top": ("S3", thickness, inner_diameter / 2., outer_diameter / 2.),
+                                  "surface_bottom": ("S1", 0., inner_diameter / 2., outer_diameter / 2.)})
+
+
+# this method builds the piezoelectric rings and the electrodes as one part, one cell per layer from the bottom ring
+# up to the last electrode, so the layers share their nodes and need no ties
+def stack_geometry(design):
+    y_lines = [0.]
+    cell_materials = {}
+    cell_regions = {}
+    for i in range(design.number_of_piezoelectrics):
+        y_lines += [y_lines[-1] + design.piezoelectric_thickness,
+                    y_lines[-1] + design.piezoelectric_thickness + design.thickness_of_electrode]
+        cell_regions[(0, 2 * i)] = "Piezoelectric"
+        cell_materials[(0, 2 * i + 1)] = design.material_of_electrode
+        cell_regions[(0, 2 * i + 1)] = "Electrode"
+    inner_radius = design.piezoelectric_inner_diameter / 2.
+    outer_radius = design.piezoelectric_outer_diameter / 2.
+    return PartGeometry(part_key="Stack", material=design.material_of_piezoelectric,
+                        r_lines=[inner_radius, outer_radius], y_lines=y_lines,
+                        cells=[(0, i) for i in range(2 * design.number_of_piezoelectrics)],
+                        surfaces={"surface_top": ("S3", y_lines[-1], inner_radius, outer_radius),
+                                  "surface_bottom": ("S1", 0., inner_radius, outer_radius)},
+                        cell_materials=cell_materials, cell_regions=cell_regions)
+
+
+def matching_geometry(design):
+    length = design.length_of_matching
+    radius = design.piezoelectric_outer_diameter / 2.
+    screw_radius = design.screw_diameter / 2.
+    return PartGeometry(part_key="Matching", material=design.material_of_matching,
+                        r_lines=[0., screw_radius, radius], y_lines=[0., length - design.screw_hole_length, length],
+                        cells=[(0, 0), (1, 0), (1, 1)],
+                        surfaces={"surface_matching_screw": ("S4", screw_radius,
+                                                             length - 5 * design.screw_step_length, length),
+                                  "surface_matching_piezoelectric": ("S3", length,
+                                                                     design.piezoelectric_inner_diameter / 2.,
+                                                                     radius)})
+
+
+def backing_geometry(design):
+    length = design.length_of_backing
+    bore_radius = design.screw_diameter / 2. + 0.1
+    box_radius = design.screwdriver_diameter / 2. + 0.1
+    return PartGeometry(part_key="Backing", material=design.material_of_backing,
+                        r_lines=[bore_radius, box_radius, design.piezoelectric_outer_diameter / 2.],
+                        y_lines=[0., length - design.screw_box_length, length], cells=[(0, 0), (1, 0), (1, 1)],
+                        surfaces={"surface_backing_piezoelectric": ("S1", 0., design.piezoelectric_inner_diameter / 2.,
+                                                                    design.piezoelectric_outer_diameter / 2.),
+                                  "surface_backing_screw": ("S3", length - design.screw_box_length, bore_radius,
+                                                            design.screwdriver_diameter / 2.)})
+
+
+def screw_geometry(design):
+    length = design.screw_length
+    return PartGeometry(part_key="Screw", material=design.material_of_screw,
+                        r_lines=[0., design.screw_diameter / 2., design.screwdriver_diameter / 2.],
+                        y_lines=[0., length, length + design.screwdriver_length], cells=[(0, 0), (0, 1), (1, 1)],
+                        surfaces={"surface_screw_backing": ("S1", length, design.screw_diameter / 2. + 0.1,
+                                                            design.screwdriver_diameter / 2.),
+                                  "surface_screw_matching": ("S2", design.screw_diameter / 2., 0.,
+                                                             5 * design.screw_step_length)})
+
+
+# this class places the parts of a @TransducerDesign like @ModelTransducer does and lists the same tie constraints.
+# of every tied pair the part with the higher elastic module is the master
+# input parameters:
+# @param design : an instance of @TransducerDesign
+# @param merged_stack : an instance of @bool . build the rings and the electrodes as the one part of @stack_geometry ,
+# tied only to the matching and the backing
+class TransducerGeometry:
+
+    def __init__(self, design, merged_stack=False):
+        self.__design = design
+        self.__merged_stack = merged_stack
+        self.__matching = matching_geometry(design)
+        self.__piezoelectric = None
+        self.__electrode = None
+        self.__stack = None
+        self.__backing = backing_geometry(design)
+        self.__screw = screw_geometry(design)
+        matching = InstanceGeometry("instance_of_Matching", self.matching, 0.)
+        backing = InstanceGeometry("instance_of_Backing", self.backing, design.backing_offset)
+        screw = InstanceGeometry("instance_of_Screw", self.screw, design.screw_offset)
+        self.__ties = [self.__tie("screw_backing", screw, "surface_screw_backing", backing, "surface_backing_screw"),
+                       self.__tie("screw_matching", screw, "surface_screw_matching", matching,
+                                  "surface_matching_screw")]
+        if merged_stack:
+            self.__stack = stack_geometry(design)
+            stack = InstanceGeometry("instance_of_Stack", self.stack, design.length_of_matching)
+            self.__instances = [matching, stack, backing, screw]
+            self.__ties += [self.__tie("backing_stack", backing, "surface_backing_piezoelectric", stack,
+                                       "surface_top"),
+                            self.__tie("matching_stack", matching, "surface_matching_piezoelectric", stack,
+                                       "surface_bottom")]
+            return
+        self.__piezoelectric = disk_geometry("Piezoelectric", design.material_of_piezoelectric,
+                                             design.piezoelectric_inner_diameter, design.piezoelectric_outer_diameter,
+                                             design.piezoelectric_thickness)
+        self.__electrode = disk_geometry("Electrode", design.material_of_electrode,
+                                         design.piezoelectric_inner_diameter, design.piezoelectric_outer_diameter,
+                                         design.thickness_of_electrode)
+        piezoelectrics = [InstanceGeometry("instance" + str(i) + "_of_Piezoelectric", self.piezoelectric, offset)
+                          for i, offset in enumerate(design.piezoelectric_offsets)]
+        electrodes = [InstanceGeometry("instance" + str(i) + "_of_Electrode", self.electrode, offset)
+                      for i, offset in enumerate(design.electrode_offsets)]
+        self.__instances = [matching]
+        for piezoelectric, electrode in zip(piezoelectrics, electrodes):
+            self.__instances += [piezoelectric, electrode]
+        self.__instances += [backing, screw]
+        self.__ties += [self.__tie("backing_electrode", backing, "surface_backing_piezoelectric", electrodes[-1],
+                                   "surface_top"),
+                        self.__tie("matching_piezoelectric", matching, "surface_matching_piezoelectric",
+                                   piezoelectrics[0], "surface_bottom")]
+        for i in range(design.number_of_piezoelectrics - 1):
+            self.__ties.append(self.__tie("top_piezoelectric_bottom_electrode_" + str(i), electrodes[i],
+                                          "surface_bottom", piezoelectrics[i], "surface_top"))
+            self.__ties.append(self.__tie("bottom_piezoelectric_top_electrode_" + str(i), electrodes[i],
+                                          "surface_top", piezoelectrics[i + 1], "surface_bottom"))
+        self.__ties.append(self.__tie("last_electrode_piezoelectric", electrodes[-1], "surface_bottom",
+                                      piezoelectrics[-1], "surface_top"))
+
+    @staticmethod
+    def __tie(name, first, first_surface, second, second_surface):
+        if first.part.surface_material(first_surface)["elastic_module"] < \
+                second.part.surface_material(second_surface)["elastic_module"]:
+            return TieGeometry(name, second.name, second_surface, first.name, first_surface)
+        return TieGeometry(name, first.name, first_surface, second.name, second_surface)
+
+    @property
+    def design(self):
+        return self.__design
+
+    @property
+    def merged_stack(self):
+        return self.__merged_stack
+
+    @property
+    def matching(self):
+        return self.__matching
+
+    @property
+    def piezoelectric(self):
+        return self.__piezoelectric
+
+    @property
+    def electrode(self):
+        return self.__electrode
+
+    # the merged part of the rings and the electrodes, None unless @merged_stack
+    @property
+    def stack(self):
+        return self.__stack
+
+    @property
+    def backing(self):
+        return self.__backing
+
+    @property
+    def screw(self):
+        return self.__screw
+
+    @property
+    def parts(self):
+        if self.merged_stack:
+            return [self.matching, self.stack, self.backing, self.screw]
+        return [self.matching, self.piezoelectric, self.electrode, self.backing, self.screw]
+
+    @property
+    def instances(self):
+        return self.__instances
+
+    @property
+    def ties(self):
+        return self.__ties
@@ -0,0 +1,270 @@
+import numpy as np
+
+# the local nodes of the faces S1, S2, S3 and S4 of a four node quadrilateral
+FACE_NODES = {"S1": (0, 1), "S2": (1, 2), "S3": (2, 3), "S4": (3, 0)}
+
+
+def _region_size(mesh_size, cell):
+    if isinstance(mesh_size, dict):
+        return mesh_size.get(cell, mesh_size.get("default", 1.))
+    return mesh_size
+
+
+# this method adds the end points of the surfaces of a part to its grid lines, like the edge partitions of the cae
+# parts, unless a new line would cut a sliver thinner than @sliver times the local element size
+def _partition_lines(part, mesh_size, sliver=0.25):
+    r_lines = list(part.r_lines)
+    y_lines = list(part.y_lines)
+    size = min([_region_size(mesh_size, cell) for cell in part.cells])
+    for face, coordinate, lower, upper in part.surfaces.values():
+        lines = r_lines if face in ("S1", "S3") else y_lines
+        for line in (lower, upper):
+            if lines[0] < line < lines[-1] and min([abs(line - i) for i in lines]) > sliver * size:
+                lines.append(line)
+    return sorted(r_lines), sorted(y_lines)
+
+
+def _divisions(lines, original_lines, cells, axis, mesh_size, min_elements=1):
+    lines = np.asarray(lines, dtype=float)
+    lengths = np.diff(lines)
+    original_lines = np.asarray(original_lines, dtype=float)
+    owner = np.searchsorted(original_lines, lines[:-1], side="right") - 1
+    divisions = np.ones(len(lengths), dtype=int)
+    for cell in cells:
+        span = original_lines[cell[axis] + 1] - original_lines[cell[axis]]
+        size = min(float(_region_size(mesh_size, cell)), span / float(min_elements))
+        selected = owner == cell[axis]
+        divisions[selected] = np.maximum(divisions[selected], np.ceil(lengths[selected] / size - 1e-9).astype(int))
+    return divisions, owner
+
+
+def _grid(lines, divisions):
+    starts = np.repeat(np.asarray(lines[:-1], dtype=float), divisions)
+    steps = np.repeat(np.diff(lines) / divisions, divisions)
+    offsets = np.arange(divisions.sum()) - np.repeat(np.cumsum(divisions) - divisions, divisions)
+    return np.append(starts + steps * offsets, lines[-1])
+
+
+def _roots(numbers):
+    while (numbers[numbers] != numbers).any():
+        numbers = numbers[numbers]
+    return numbers
+
+
+class PartMesh:
+
+    def __init__(self, part, nodes, elements, element_cells):
+        self.__part = part
+        self.__nodes = nodes
+        self.__elements = elements
+        self.__element_cells = element_cells
+
+    @property
+    def part(self):
+        return self.__part
+
+    # local coordinates (r, y) of the nodes
+    @property
+    def nodes(self):
+        return self.__nodes
+
+    # the four nodes of every element, counterclockwise from the bottom inner corner
+    @property
+    def elements(self):
+        return self.__elements
+
+    # the (radial index, axial index) of the cell of @PartGeometry.cells of every element
+    @property
+    def element_cells(self):
+        return self.__element_cells
+
+    # this method finds the element faces of a surface of the part
+    # results:
+    # an instance of @numpy.ndarray of the elements and an instance of @list of the face of each of them
+    def surface_faces(self, surface_key):
+        face, coordinate, lower, upper = self.part.surfaces[surface_key]
+        first, second = FACE_NODES[face]
+        start = self.nodes[self.elements[:, first]]
+        end = self.nodes[self.elements[:, second]]
+        normal_axis, tangent_axis = (1, 0) if face in ("S1", "S3") else (0, 1)
+        tolerance = 1e-6 * max(1., abs(coordinate))
+        middle = (start[:, tangent_axis] + end[:, tangent_axis]) / 2.
+        selected = np.nonzero((np.abs(start[:, normal_axis] - coordinate) < tolerance) &
+                              (np.abs(end[:, normal_axis] - coordinate) < tolerance) &
+                              (middle > lower - tolerance) & (middle < upper + tolerance))[0]
+        return selected, [face] * len(selected)
+
+
+# this method meshes a part with structured quadrilaterals as array operations on the grid of its cells
+# input parameters:
+# @param part : an instance of @PartGeometry
+# @param mesh_size : an instance of @int or @float , or a @dict of cell to element size with an optional "default"
+# @param conforming : an instance of @bool . split the grid at the end points of the surfaces, so tied surfaces of
+# neighbouring parts get coincident nodes
+# @param min_elements : an instance of @int . the smallest number of elements across every cell in both directions,
+# like the thickness of a layer, whatever the element size
+# results:
+# an instance of @PartMesh
+def mesh_part(part, mesh_size, conforming=False, min_elements=1):
+    r_lines, y_lines = part.r_lines, part.y_lines
+    if conforming:
+        r_lines, y_lines = _partition_lines(part, mesh_size)
+    r_divisions, r_owner = _divisions(r_lines, part.r_lines, part.cells, 0, mesh_size, min_elements)
+    y_divisions, y_owner = _divisions(y_lines, part.y_lines, part.cells, 1, mesh_size, min_elements)
+    r = _grid(r_lines, r_divisions)
+    y = _grid(y_lines, y_divisions)
+    included = np.zeros((len(part.r_lines) - 1, len(part.y_lines) - 1), dtype=bool)
+    for cell in part.cells:
+        included[cell] = True
+    cell_r = np.repeat(r_owner, r_divisions)
+    cell_y = np.repeat(y_owner, y_divisions)
+    element_y, element_r = np.nonzero(included[cell_r[np.newaxis, :], cell_y[:, np.newaxis]])
+    corners = np.stack([element_r * len(y) + element_y, (element_r + 1) * len(y) + element_y,
+                        (element_r + 1) * len(y) + element_y + 1, element_r * len(y) + element_y + 1], axis=1)
+    used = np.zeros(len(r) * len(y), dtype=bool)
+    used[corners] = True
+    numbers = np.cumsum(used) - 1
+    grid_r, grid_y = np.meshgrid(r, y, indexing="ij")
+    nodes = np.stack([grid_r.ravel()[used], grid_y.ravel()[used]], axis=1)
+    return PartMesh(part=part, nodes=nodes, elements=numbers[corners],
+                    element_cells=np.stack([cell_r[element_r], cell_y[element_y]], axis=1))
+
+
+def part_mesh_size(mesh_size, part_key):
+    if isinstance(mesh_size, dict):
+        return mesh_size.get(part_key, mesh_size.get("default", 1.))
+    return mesh_size
+
+
+# this method gives the @mesh_size of @mesh_part of a part from the @mesh_size of @AssemblyMesh . the cells of a part
+# with regions, like the layers of the merged stack, take the size of their region key
+def cell_mesh_size(mesh_size, part):
+    size = part_mesh_size(mesh_size, part.part_key)
+    if not isinstance(mesh_size, dict) or not part.cell_regions or isinstance(size, dict):
+        return size
+    sizes = dict([(cell, mesh_size.get(region, size)) for cell, region in part.cell_regions.items()])
+    sizes["default"] = size
+    return sizes
+
+
+# this class places the meshes of the parts of a @TransducerGeometry like the instances of the assembly
+# input parameters:
+# @param geometry : an instance of @TransducerGeometry
+# @param mesh_size : an instance of @int or @float , or a @dict of part key to the @mesh_size of @mesh_part with an
+# optional "default"
+# @param conforming : an instance of @bool . mesh with @mesh_part conforming and merge the coincident nodes of the tied
+# surfaces. the remaining slave nodes are still tied by @tie_constraints
+# @param min_elements : an instance of @int . the @min_elements of @mesh_part
+# @param part_meshes : an instance of @dict of part key to @PartMesh . parts already meshed, like the reduced
+# components of @component_synthesis , are placed as they are
+class AssemblyMesh:
+
+    def __init__(self, geometry, mesh_size, conforming=False, min_elements=1, part_meshes=None):
+        self.__geometry = geometry
+        self.__mesh_size = mesh_size
+        self.__conforming = conforming
+        self.__min_elements = min_elements
+        self.__part_meshes = dict(part_meshes or {})
+        for part in geometry.parts:
+            if part.part_key not in self.__part_meshes:
+                self.__part_meshes[part.part_key] = mesh_part(part, cell_mesh_size(mesh_size, part),
+                                                              conforming=conforming, min_elements=min_elements)
+        nodes = []
+        elements = []
+        materials = []
+        self.__element_offsets = {}
+        node_count = 0
+        element_count = 0
+        for instance in geometry.instances:
+            part_mesh = self.part_meshes[instance.part.part_key]
+            self.__element_offsets[instance.name] = element_count
+            nodes.append(part_mesh.nodes + np.array([0., instance.offset]))
+            elements.append(part_mesh.elements + node_count)
+            if len(instance.part.materials) > 1:
+                materials += [instance.part.cell_material(cell) for cell in part_mesh.element_cells]
+            else:
+                materials += [instance.part.material] * len(part_mesh.elements)
+            node_count += len(part_mesh.nodes)
+            element_count += len(part_mesh.elements)
+        self.__nodes = np.concatenate(nodes)
+        self.__elements = np.concatenate(elements)
+        self.__element_materials = materials
+        if conforming:
+            self.__merge_tied_nodes()
+
+    def __merge_tied_nodes(self):
+        numbers = np.arange(len(self.nodes))
+        for tie in self.geometry.ties:
+            master = np.unique(self.surface_nodes(tie.master_instance, tie.master_surface))
+            slave = np.unique(self.surface_nodes(tie.slave_instance, tie.slave_surface))
+            if not len(master) or not len(slave):
+                continue
+            distance = np.abs(self.nodes[slave][:, np.newaxis, :] - self.nodes[master][np.newaxis, :, :]).max(axis=2)
+            nearest = np.argmin(distance, axis=1)
+            coincident = distance[np.arange(len(slave)), nearest] < 1e-6 * max(1., np.abs(self.nodes).max())
+            roots = _roots(numbers)
+            slave_roots = roots[slave[coincident]]
+            master_roots = roots[master[nearest[coincident]]]
+            linked = slave_roots != master_roots
+            numbers[slave_roots[linked]] = master_roots[linked]
+        numbers = _roots(numbers)
+        kept, numbers = np.unique(numbers, return_inverse=True)
+        self.__nodes = self.__nodes[kept]
+        self.__elements = numbers[self.__elements]
+
+    @property
+    def geometry(self):
+        return self.__geometry
+
+    @property
+    def mesh_size(self):
+        return self.__mesh_size
+
+    @property
+    def conforming(self):
+        return self.__conforming
+
+    @property
+    def min_elements(self):
+        return self.__min_elements
+
+    @property
+    def part_meshes(self):
+        return self.__part_meshes
+
+    @property
+    def nodes(self):
+        return self.__nodes
+
+    @property
+    def elements(self):
+        return self.__elements
+
+    @property
+    def element_materials(self):
+        return self.__element_materials
+
+    def part_mesh_size(self, part_key):
+        return part_mesh_size(self.mesh_size, part_key)
+
+    def instance(self, instance_name):
+        for instance in self.geometry.instances:
+            if instance.name == instance_name:
+                return instance
+        raise KeyError(instance_name)
+
+    # this method finds the faces of a surface of an instance in the numbering of the assembly
+    # results:
+    # the global element numbers and an instance of @list of the face of each of them
+    def surface_faces(self, instance_name, surface_key):
+        part_mesh = self.part_meshes[self.instance(instance_name).part.part_key]
+        elements, faces = part_mesh.surface_faces(surface_key)
+        return elements + self.__element_offsets[instance_name], faces
+
+    # this method lists the two nodes of every face of a surface of an instance
+    # results:
+    # an instance of @numpy.ndarray of shape (faces, 2)
+    def surface_nodes(self, instance_name, surface_key):
+        elements, faces = self.surface_faces(instance_name, surface_key)
+        return np.array([(self.elements[element, FACE_NODES[face][0]], self.elements[element, FACE_NODES[face][1]])
+                         for element, face in zip(elements, faces)], dtype=int).reshape(-1, 2)
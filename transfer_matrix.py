@@ -0,0 +1,237 @@
+import numpy as np
+
+from transducer_design import (ALUMINIUM_6061_T6, COPPER, PZT4, SCREW_12_9, ST37, TransducerDesign,
+                               derive_designs)
+
+# the one dimensional model of the transducer is a network of rods between the planes where the screw meets the rest
+# of the stack. every branch is a chain of uniform rods, described by the wave transfer matrix of (u, N):
+#     u(L) =  cos(kL) u(0) + sin(kL) / (E A k) N(0)
+#     N(L) = -E A k sin(kL) u(0) + cos(kL) N(0)
+# nodes : 0 bottom of the matching, 1 bottom of the screw, 2 top of the matching, 3 floor of the screw box,
+#         4 top of the backing, 5 top of the screw head
+# branches : (from node, to node)
+BRANCHES = ((0, 1),  # matching below the engaged screw thread, full disk then the annulus around the screw hole
+            (1, 2),  # matching annulus around the engaged thread
+            (1, 2),  # engaged thread of the screw
+            (2, 3),  # piezoelectric and electrode rings, then the backing below the screw box
+            (2, 3),  # free shank of the screw
+            (3, 4),  # backing wall around the screw box
+            (3, 5))  # head of the screw
+
+_DESIGN_KEYS = ("length_of_matching", "length_of_backing", "number_of_piezoelectrics", "piezoelectric_outer_diameter",
+                "piezoelectric_inner_diameter", "piezoelectric_thickness", "thickness_of_electrode")
+
+
+def _design_arrays(designs):
+    if isinstance(designs, TransducerDesign):
+        return derive_designs(**dict([(key, getattr(designs, key)) for key in _DESIGN_KEYS]))
+    return dict([(key, np.ravel(value)) for key, value in designs.items()])
+
+
+def _material_arrays(material):
+    return float(material["elastic_module"]), float(material["density"])
+
+
+def _disk_area(outer_diameter, inner_diameter=0.):
+    return np.pi * (outer_diameter ** 2 - inner_diameter ** 2) / 4.
+
+
+# this method multiplies the transfer matrices of a chain of uniform rods
+# input parameters:
+# @param rods : an instance of @list of (length, area, elastic_module, density)
+# @param omega : an instance of @numpy.ndarray . the angular frequency of every row
+# @param impedance : an instance of @numpy.ndarray . the force scale of every row, keeps the matrices well conditioned
+# results:
+# an instance of @numpy.ndarray of shape (rows, 2, 2)
+def chain_transfer_matrix(rods, omega, impedance):
+    transfer = np.zeros(omega.shape + (2, 2))
+    transfer[:, 0, 0] = transfer[:, 1, 1] = 1.
+    for length, area, elastic_module, density in rods:
+        wave_number = omega * np.sqrt(density / elastic_module)
+        stiffness = elastic_module * area * wave_number / impedance
+        cosine = np.cos(wave_number * length)
+        sine = np.sin(wave_number * length)
+        rod = np.empty(omega.shape + (2, 2))
+        rod[:, 0, 0] = cosine
+        rod[:, 0, 1] = sine / stiffness
+        rod[:, 1, 0] = -stiffness * sine
+        rod[:, 1, 1] = cosine
+        transfer = np.matmul(rod, transfer)
+    return transfer
+
+
+# this method builds the rods of every branch of @BRANCHES for rows of designs
+# results:
+# an instance of @list with one @list of (length, area, elastic_module, density) per branch
+def branch_rods(designs, materials):
+    matching = _material_arrays(materials["matching"])
+    piezoelectric = _material_arrays(materials["piezoelectric"])
+    electrode = _material_arrays(materials["electrode"])
+    backing = _material_arrays(materials["backing"])
+    screw = _material_arrays(materials["screw"])
+    diameter = designs["piezoelectric_outer_diameter"]
+    screw_diameter = designs["screw_diameter"]
+    engaged_length = 5 * designs["screw_step_length"]
+    stack = []
+    for i in range(int(np.max(designs["number_of_piezoelectrics"]))):
+        present = designs["number_of_piezoelectrics"] > i
+        ring = _disk_area(diameter, designs["piezoelectric_inner_diameter"])
+        stack.append((np.where(present, designs["piezoelectric_thickness"], 0.), ring) + piezoelectric)
+        stack.append((np.where(present, designs["thickness_of_electrode"], 0.), ring) + electrode)
+    return [[(designs["length_of_matching"] - designs["screw_hole_length"], _disk_area(diameter)) + matching,
+             (designs["screw_hole_length"] - engaged_length, _disk_area(diameter, screw_diameter)) + matching],
+            [(engaged_length, _disk_area(diameter, screw_diameter)) + matching],
+            [(engaged_length, _disk_area(screw_diameter)) + screw],
+            stack + [(designs["length_of_backing"] - designs["screw_box_length"],
+                      _disk_area(diameter, screw_diameter + 0.2)) + backing],
+            [(designs["screw_length"] - engaged_length, _disk_area(screw_diameter)) + screw],
+            [(designs["screw_box_length"], _disk_area(diameter, designs["screwdriver_diameter"] + 0.2)) + backing],
+            [(designs["screwdriver_length"], _disk_area(designs["screwdriver_diameter"])) + screw]]
+
+
+# this method evaluates the characteristic determinant of the free-free rod network. its roots are the longitudinal
+# resonance frequencies
+# input parameters:
+# @param designs : an instance of @dict of @numpy.ndarray . one row per evaluation, as returned by @derive_designs
+# @param frequencies : an instance of @numpy.ndarray . the frequency of every row in Hz
+# @param materials : an instance of @dict of the material tables of every part
+def characteristic_determinant(designs, frequencies, materials):
+    return np.linalg.det(_system_matrix(designs, frequencies, materials)[0])
+
+
+def _impedance(designs, materials):
+    elastic_module, density = _material_arrays(materials["matching"])
+    return elastic_module * _disk_area(designs["piezoelectric_outer_diameter"]) / designs["total_length"]
+
+
+# the unknowns of the system are the displacement and the scaled force at the start of every branch of @BRANCHES
+def _system_matrix(designs, frequencies, materials):
+    omega = 2 * np.pi * np.asarray(frequencies, dtype=float)
+    rods = branch_rods(designs, materials)
+    impedance = _impedance(designs, materials)
+    transfers = [chain_transfer_matrix(branch, omega, impedance) for branch in rods]
+    size = 2 * len(BRANCHES)
+    system = np.zeros(omega.shape + (size, size))
+    identity = np.broadcast_to(np.eye(2), omega.shape + (2, 2))
+    ends = {}
+    for branch, (start, end) in enumerate(BRANCHES):
+        ends.setdefault(start, []).append((branch, identity[:, 0, :], identity[:, 1, :]))
+        ends.setdefault(end, []).append((branch, transfers[branch][:, 0, :], -transfers[branch][:, 1, :]))
+    row = 0
+    for node in sorted(ends.keys()):
+        reference, reference_displacement, reference_force = ends[node][0]
+        for branch, displacement, force in ends[node][1:]:
+            system[:, row, 2 * branch:2 * branch + 2] += displacement
+            system[:, row, 2 * reference:2 * reference + 2] -= reference_displacement
+            row += 1
+        for branch, displacement, force in ends[node]:
+            system[:, row, 2 * branch:2 * branch + 2] += force
+        row += 1
+    return system, rods
+
+
+def _determinants(designs, rows, frequencies, materials, chunk_size):
+    values = np.empty(len(rows))
+    for start in range(0, len(rows), chunk_size):
+        selection = rows[start:start + chunk_size]
+        values[start:start + chunk_size] = characteristic_determinant(
+            dict([(key, value[selection]) for key, value in designs.items()]),
+            frequencies[start:start + chunk_size], materials)
+    return values
+
+
+def _materials(designs):
+    if isinstance(designs, TransducerDesign):
+        return {"piezoelectric": designs.material_of_piezoelectric, "electrode": designs.material_of_electrode,
+                "screw": designs.material_of_screw, "matching": designs.material_of_matching,
+                "backing": designs.material_of_backing}
+    return {"piezoelectric": PZT4, "electrode": COPPER, "screw": SCREW_12_9, "matching": ALUMINIUM_6061_T6,
+            "backing": ST37}
+
+
+# this method finds the longitudinal resonance frequencies of the free transducer with the one dimensional model
+# input parameters:
+# @param designs : an instance of @TransducerDesign or the @dict returned by @derive_designs
+# @param material_of_piezoelectric, material_of_electrode, material_of_screw, material_of_matching,
+# material_of_backing : material tables, the ones of the @TransducerDesign or the standard tables by default
+# @param max_frequency : an instance of @int or @float . the upper limit of the search in Hz, like maxEigen
+# @param grid_points : an instance of @int . the number of frequencies scanned for sign changes
+# @param iterations : an instance of @int . the bisection steps that refine every bracketed root
+# results:
+# an instance of @numpy.ndarray of shape (designs, modes) in Hz, padded with nan. invalid designs have no modes
+def longitudinal_resonances(designs, material_of_piezoelectric=None, material_of_electrode=None,
+                            material_of_screw=None, material_of_matching=None, material_of_backing=None,
+                            max_frequency=30000., grid_points=300, iterations=40, chunk_size=20000):
+    materials = _materials(designs)
+    for key, material in (("piezoelectric", material_of_piezoelectric), ("electrode", material_of_electrode),
+                          ("screw", material_of_screw), ("matching", material_of_matching),
+                          ("backing", material_of_backing)):
+        if material is not None:
+            materials[key] = material
+    designs = _design_arrays(designs)
+    count = len(designs["length_of_matching"])
+    valid = designs["valid"] & (designs["length_of_matching"] > designs["screw_hole_length"]) & (
+            designs["length_of_backing"] > designs["screw_box_length"])
+    indices = np.nonzero(valid)[0]
+    designs = dict([(key, value[indices]) for key, value in designs.items()])
+    grid = np.linspace(max_frequency / grid_points, max_frequency, grid_points)
+    rows = np.repeat(np.arange(len(indices)), grid_points)
+    values = _determinants(designs, rows, np.tile(grid, len(indices)), materials, chunk_size).reshape(
+        len(indices), grid_points)
+    design_index, grid_index = np.nonzero(np.sign(values[:, :-1]) * np.sign(values[:, 1:]) < 0)
+    lower, upper = grid[grid_index], grid[grid_index + 1]
+    lower_sign = np.sign(values[design_index, grid_index])
+    for iteration in range(iterations):
+        middle = (lower + upper) / 2.
+        middle_sign = np.sign(_determinants(designs, design_index, middle, materials, chunk_size))
+        same = middle_sign == lower_sign
+        lower = np.where(same, middle, lower)
+        upper = np.where(same, upper, middle)
+    roots = (lower + upper) / 2.
+    modes = np.bincount(design_index, minlength=len(indices)).max() if len(design_index) else 0
+    resonances = np.full((count, modes), np.nan)
+    order = np.argsort(design_index, kind="mergesort")
+    rank = np.arange(len(order)) - np.searchsorted(design_index[order], design_index[order], side="left")
+    resonances[indices[design_index[order]], rank] = roots[order]
+    return resonances
+
+
+# the branches of @BRANCHES along the outer surface of the stack, from the bottom of the matching to the top of the
+# backing
+OUTER_BRANCHES = (0, 1, 3, 5)
+
+
+# this method finds the axial displacement of the outer surface of the stack in a resonance of the one dimensional
+# model, from the null vector of the network at that frequency
+# input parameters:
+# @param design : an instance of @TransducerDesign , or a @dict of one row returned by @derive_designs
+# @param frequency : an instance of @float . a resonance frequency of the design in Hz
+# @param positions : an instance of @numpy.ndarray . heights from the bottom of the matching
+# @param materials : an instance of @dict of the material tables, the ones of @longitudinal_resonances by default
+# results:
+# an instance of @numpy.ndarray of the displacement at @positions , scaled to a largest absolute value of 1
+def longitudinal_mode_shape(design, frequency, positions, materials=None):
+    if materials is None:
+        materials = _materials(design)
+    designs = _design_arrays(design)
+    designs = dict([(key, value[:1]) for key, value in designs.items()])
+    omega = 2 * np.pi * np.array([float(frequency)])
+    system, rods = _system_matrix(designs, np.array([float(frequency)]), materials)
+    null_vector = np.linalg.svd(system[0])[2][-1]
+    impedance = _impedance(designs, materials)
+    positions = np.asarray(positions, dtype=float)
+    displacements = np.zeros(len(positions))
+    start = 0.
+    for branch in OUTER_BRANCHES:
+        state = null_vector[2 * branch:2 * branch + 2]
+        for length, area, elastic_module, density in rods[branch]:
+            length = float(np.ravel(length)[0])
+            inside = (positions >= start) & (positions <= start + length)
+            if inside.any():
+                rod = [(np.full(1, distance), area, elastic_module, density) for distance in positions[inside] - start]
+                displacements[inside] = [np.matmul(chain_transfer_matrix([item], omega, impedance)[0], state)[0]
+                                         for item in rod]
+            state = np.matmul(chain_transfer_matrix([(np.full(1, length), area, elastic_module, density)], omega,
+                                                    impedance)[0], state)
+            start += length
+    return displacements / np.abs(displacements).max()
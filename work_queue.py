@@ -0,0 +1,396 @@
+# a work queue of transducer designs in a directory shared by every host of a sweep, without any broker. every state
+# of a design is a directory, and a design moves between them by renaming its file, which is atomic on one file
+# system, so only one worker wins a design:
+#   pending/<key>.json                        waiting for a worker
+#   leased/<key>__<worker>__<deadline>.json   solving. the worker renews the deadline while it runs
+#   done/<key>.json                           the result, written to a temporary file and renamed
+#   failed/<key>.json                         the last error of a design that failed @max_attempts times
+# a lease whose deadline has passed, because its worker died, is put back in pending by the next worker that looks
+# for work. the deadlines are compared with the clock of every host, so the clocks should agree to a small part of
+# the lease time
+#   python work_queue.py enqueue QUEUE designs.csv
+#   abaqus cae noGUI=work_queue.py -- worker QUEUE          or   python work_queue.py worker QUEUE --solver modal
+#   python work_queue.py status QUEUE
+#   python work_queue.py collect QUEUE -o results.jsonl
+import argparse
+import errno
+import json
+import os
+import re
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+from result_cache import canonical_parameters, parameters_key
+
+STATES = ("pending", "leased", "done", "failed")
+
+
+def _replace(source, destination):
+    if hasattr(os, "replace"):
+        os.replace(source, destination)
+    else:
+        os.rename(source, destination)
+
+
+def _read_json(file_name):
+    with open(file_name) as opened:
+        return json.load(opened)
+
+
+# this method gives the name of this process in the leases, its host and its process id
+def worker_name():
+    return re.sub(r"[^A-Za-z0-9.-]", "-", socket.gethostname()) + "-" + str(os.getpid())
+
+
+# this class is a design leased by a worker, until @deadline
+class Lease:
+
+    def __init__(self, queue, key, worker, deadline, entry):
+        self.__queue = queue
+        self.__key = key
+        self.__worker = worker
+        self.__deadline = deadline
+        self.__entry = entry
+
+    @property
+    def key(self):
+        return self.__key
+
+    @property
+    def worker(self):
+        return self.__worker
+
+    @property
+    def deadline(self):
+        return self.__deadline
+
+    @property
+    def design(self):
+        return self.__entry["design"]
+
+    # the number of earlier leases of the design that failed or expired
+    @property
+    def attempts(self):
+        return self.__entry.get("attempts", 0)
+
+    @property
+    def entry(self):
+        return self.__entry
+
+    @property
+    def file_name(self):
+        return self.__queue.lease_file(self.key, self.worker, self.deadline)
+
+    # this method moves the deadline @lease_seconds ahead of now
+    # results:
+    # an instance of @bool . False when the lease expired and was taken back, the result of the design is then still
+    # accepted, but the design may be solved again by another worker
+    def renew(self):
+        deadline = self.__queue.deadline()
+        try:
+            os.rename(self.file_name, self.__queue.lease_file(self.key, self.worker, deadline))
+        except OSError:
+            return False
+        self.__deadline = deadline
+        return True
+
+
+# this class is the queue in a shared directory
+# input parameters:
+# @param directory : an instance of @str . the directory of the queue, created if needed
+# @param lease_seconds : an instance of @int or @float . the time a worker has to renew its lease
+# @param max_attempts : an instance of @int . a design that failed or whose lease expired that many times is failed
+# @param solver_settings : an instance of @dict . updates of @SOLVER_SETTINGS of the keys of the designs
+class WorkQueue:
+
+    def __init__(self, directory, lease_seconds=600., max_attempts=3, solver_settings=None):
+        self.__directory = os.path.abspath(directory)
+        self.__lease_seconds = lease_seconds
+        self.__max_attempts = max_attempts
+        self.__solver_settings = solver_settings
+        for state in STATES + ("tmp",):
+            try:
+                os.makedirs(os.path.join(self.directory, state))
+            except OSError as error:
+                if error.errno != errno.EEXIST:
+                    raise
+
+    @property
+    def directory(self):
+        return self.__directory
+
+    @property
+    def lease_seconds(self):
+        return self.__lease_seconds
+
+    @property
+    def max_attempts(self):
+        return self.__max_attempts
+
+    def deadline(self):
+        return int(1000 * (time.time() + self.lease_seconds))
+
+    def state_file(self, state, key):
+        return os.path.join(self.directory, state, key + ".json")
+
+    def lease_file(self, key, worker, deadline):
+        return os.path.join(self.directory, "leased", "__".join([key, worker, str(deadline)]) + ".json")
+
+    def __write(self, file_name, entry):
+        handle, temporary_file = tempfile.mkstemp(suffix=".tmp", dir=os.path.join(self.directory, "tmp"))
+        try:
+            with os.fdopen(handle, "w") as opened:
+                json.dump(entry, opened, sort_keys=True)
+                opened.flush()
+                os.fsync(opened.fileno())
+            _replace(temporary_file, file_name)
+        except BaseException:
+            if os.path.exists(temporary_file):
+                os.remove(temporary_file)
+            raise
+
+    def __keys(self, state):
+        return [name[:-len(".json")].split("__")[0] for name in os.listdir(os.path.join(self.directory, state))
+                if name.endswith(".json")]
+
+    # this method gives the key of a design, like @ResultCache
+    def key(self, design):
+        return parameters_key(canonical_parameters(design, self.__solver_settings))
+
+    # this method adds designs to the queue. a design that is already in the queue, in any state, is not added again
+    # input parameters:
+    # @param designs : an iterable of @dict of the arguments of @ModelTransducer
+    # results:
+    # an instance of @list of the keys of the added designs
+    def enqueue(self, designs):
+        known = set([key for state in STATES for key in self.__keys(state)])
+        added = []
+        for design in designs:
+            key = self.key(design)
+            if key in known:
+                continue
+            known.add(key)
+            self.__write(self.state_file("pending", key), {"key": key, "design": design, "attempts": 0})
+            added.append(key)
+        return added
+
+    # this method puts the designs of the expired leases back in pending, or in failed after @max_attempts . the
+    # lease is first renamed to a name of this process, so only one process takes it back
+    # results:
+    # an instance of @int . the number of expired leases
+    def reclaim_expired(self):
+        now = time.time()
+        expired = 0
+        for name in os.listdir(os.path.join(self.directory, "leased")):
+            parts = name[:-len(".json")].split("__")
+            if not name.endswith(".json") or len(parts) != 3 or int(parts[2]) / 1000. > now:
+                continue
+            claimed = os.path.join(self.directory, "tmp", name + "." + worker_name() + ".expired")
+            try:
+                os.rename(os.path.join(self.directory, "leased", name), claimed)
+            except OSError:
+                continue
+            entry = _read_json(claimed)
+            entry["attempts"] = entry.get("attempts", 0) + 1
+            entry["error"] = "the lease of " + parts[1] + " expired"
+            self.__requeue(entry)
+            os.remove(claimed)
+            expired += 1
+        return expired
+
+    def __requeue(self, entry):
+        if entry["attempts"] >= self.max_attempts:
+            self.__write(self.state_file("failed", entry["key"]), entry)
+        else:
+            self.__write(self.state_file("pending", entry["key"]), entry)
+
+    # this method leases the next pending design. a design that was put back after an expired lease but whose
+    # result came in after all is dropped
+    # input parameters:
+    # @param worker : an instance of @str . the name of the worker, @worker_name by default
+    # results:
+    # an instance of @Lease , None when no design is pending
+    def lease(self, worker=None):
+        worker = worker or worker_name()
+        self.reclaim_expired()
+        for name in sorted(os.listdir(os.path.join(self.directory, "pending"))):
+            if not name.endswith(".json"):
+                continue
+            key = name[:-len(".json")]
+            deadline = self.deadline()
+            lease_file = self.lease_file(key, worker, deadline)
+            try:
+                os.rename(os.path.join(self.directory, "pending", name), lease_file)
+            except OSError:
+                continue
+            if os.path.exists(self.state_file("done", key)):
+                os.remove(lease_file)
+                continue
+            return Lease(self, key, worker, deadline, _read_json(lease_file))
+        return None
+
+    # this method stores the result of a leased design and ends the lease
+    def complete(self, lease, result, elapsed=None):
+        self.__write(self.state_file("done", lease.key),
+                     {"key": lease.key, "design": lease.design, "result": result, "worker": lease.worker,
+                      "attempts": lease.attempts + 1, "elapsed": elapsed})
+        self.__end(lease)
+
+    # this method ends a lease whose run failed, the design goes back to pending or to failed after @max_attempts
+    def fail(self, lease, error):
+        entry = dict(lease.entry)
+        entry["attempts"] = lease.attempts + 1
+        entry["error"] = error
+        if os.path.exists(lease.file_name):
+            self.__requeue(entry)
+        self.__end(lease)
+
+    def __end(self, lease):
+        try:
+            os.remove(lease.file_name)
+        except OSError:
+            pass
+
+    # results:
+    # an instance of @dict of every state to its number of designs
+    def counts(self):
+        return dict([(state, len(self.__keys(state))) for state in STATES])
+
+    # whether every design is done or failed
+    @property
+    def drained(self):
+        counts = self.counts()
+        return counts["pending"] == 0 and counts["leased"] == 0
+
+    # this method yields the entries of a state, like the results of the done designs
+    def entries(self, state="done"):
+        for key in sorted(self.__keys(state)):
+            try:
+                yield _read_json(self.state_file(state, key))
+            except (IOError, OSError, ValueError):
+                continue
+
+
+# this class renews a lease in the background while its design is solved
+class _Heartbeat(threading.Thread):
+
+    def __init__(self, lease, interval):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.__lease = lease
+        self.__interval = interval
+        self.__stopped = threading.Event()
+
+    def run(self):
+        while not self.__stopped.wait(self.__interval):
+            if not self.__lease.renew():
+                return
+
+    def stop(self):
+        self.__stopped.set()
+        self.join()
+
+
+# this method solves one design with @ModelTransducer and releases it
+def abaqus_run(design):
+    from automated_transducer_disigner import transducer_results
+    return transducer_results(design)
+
+
+# this method solves one design with @AxisymmetricTransducer
+def modal_run(design):
+    from modal_solver import AxisymmetricTransducer
+    return AxisymmetricTransducer(**design).extract_results()
+
+
+# this method solves one design with @SynthesizedTransducer , reusing the reduced parts of the designs this worker
+# solved before
+def synthesis_run(design):
+    from component_synthesis import SynthesizedTransducer
+    return SynthesizedTransducer(**design).extract_results()
+
+
+# this method leases and solves designs until the queue is drained
+# input parameters:
+# @param queue : an instance of @WorkQueue
+# @param run : a callable of a design that returns its results, @abaqus_run by default
+# @param worker : an instance of @str . the name of the worker in the leases
+# @param poll : an instance of @int or @float . the seconds between two looks for work while other workers hold
+# leases, which may still expire
+# @param max_jobs : an instance of @int . the number of designs this worker solves at most
+# results:
+# an instance of @int . the number of designs this worker solved
+def run_worker(queue, run=None, worker=None, poll=5., max_jobs=None):
+    run = run or abaqus_run
+    worker = worker or worker_name()
+    solved = 0
+    while max_jobs is None or solved < max_jobs:
+        lease = queue.lease(worker)
+        if lease is None:
+            if queue.drained:
+                break
+            time.sleep(poll)
+            continue
+        heartbeat = _Heartbeat(lease, queue.lease_seconds / 3.)
+        heartbeat.start()
+        start = time.time()
+        try:
+            result = run(lease.design)
+        except Exception as error:
+            heartbeat.stop()
+            queue.fail(lease, repr(error))
+            continue
+        heartbeat.stop()
+        if result is None:
+            queue.fail(lease, "the run gave no result")
+            continue
+        queue.complete(lease, result, elapsed=time.time() - start)
+        solved += 1
+    return solved
+
+
+# the runs of the workers by solver, like the @SOLVERS of @main
+RUNS = {"abaqus": abaqus_run, "modal": modal_run, "synthesis": synthesis_run}
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="a work queue of transducer designs in a shared directory")
+    parser.add_argument("command", choices=("enqueue", "worker", "status", "collect"))
+    parser.add_argument("queue", help="the directory of the queue")
+    parser.add_argument("designs", nargs="?", help="the csv or jsonl file of the designs to enqueue")
+    parser.add_argument("-s", "--solver", choices=sorted(RUNS), default="abaqus")
+    parser.add_argument("--lease-seconds", type=float, default=600.)
+    parser.add_argument("--max-attempts", type=int, default=3)
+    parser.add_argument("--max-jobs", type=int)
+    parser.add_argument("-o", "--output", help="the jsonl file of the collected results, standard output by default")
+    arguments = parser.parse_args(arguments)
+    queue = WorkQueue(arguments.queue, lease_seconds=arguments.lease_seconds, max_attempts=arguments.max_attempts,
+                      solver_settings={"solver": arguments.solver} if arguments.solver != "abaqus" else None)
+    if arguments.command == "enqueue":
+        from main import read_designs
+        if arguments.designs is None:
+            parser.error("enqueue needs a designs file")
+        print("{0} designs added".format(len(queue.enqueue(read_designs(arguments.designs)))))
+    elif arguments.command == "worker":
+        solved = run_worker(queue, run=RUNS[arguments.solver], max_jobs=arguments.max_jobs)
+        print("{0} designs solved by {1}".format(solved, worker_name()))
+    elif arguments.command == "status":
+        queue.reclaim_expired()
+        print(json.dumps(queue.counts(), sort_keys=True))
+    else:
+        output = open(arguments.output, "w") if arguments.output else sys.stdout
+        try:
+            for entry in queue.entries("done"):
+                output.write(json.dumps(entry, sort_keys=True) + "\n")
+        finally:
+            if output is not sys.stdout:
+                output.close()
+    return 0
+
+
+# abaqus cae passes the arguments of a script after "--"
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]))